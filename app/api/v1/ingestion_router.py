@@ -1,37 +1,159 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.database import get_db
+import asyncio
+import os
+from fastapi import APIRouter, Query, HTTPException, Request
+from app.core.config import settings
+from app.core.job_scheduler import expand_sources, is_pattern, job_scheduler
 from app.core.orchestrator import DataOrchestrator
+from app.core.reprocessor import ReprocessFilter
+from app.ingestors.block_reader import AsyncByteReader
+from app.models.database import async_session_factory
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/ingest")
+orchestrator = DataOrchestrator()
+
+
+class UploadSlots:
+    """At most `limit` uploads at once; `try_acquire` never waits, the caller answers 429 instead."""
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+
+    def try_acquire(self) -> bool:
+        # check and take with no await in between, so two requests cannot both pass
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+
+
+# uploads hold their request open for the whole ingestion, so they are capped apart from the job queue
+upload_slots = UploadSlots(settings.UPLOAD_CONCURRENCY)
+
+@router.post("/ingest", status_code=202)
 async def ingest_file(
     file_path: str,
     # Use Query to restrict input to only supported types
     source_type: str = Query("csv", enum=["csv", "json"]),
-    db: AsyncSession = Depends(get_db),
+    # Opt-in: shard the file across INGEST_WORKERS processes (csv only)
+    parallel: bool = Query(False),
+    # Continue a partly ingested file from its last checkpoint (false = start over)
+    resume: bool = Query(True),
+    # Directory / glob jobs: files ingested at once (default INGEST_FILE_FAN_OUT)
+    fan_out: int | None = Query(None, ge=1),
+):
+    """
+    Queues the file for background ingestion and returns a job id.
+    Poll GET /api/v1/jobs/{job_id} for progress and the final summary.
+
+    `file_path` may also be a directory (its files with the source type's
+    extensions) or a glob such as /data/hourly/*.csv: one job ingests them
+    concurrently, skips files already ingested and reports per-file stats.
+    """
+    if parallel and source_type != "csv":
+        raise HTTPException(status_code=400, detail="Parallel ingestion is only supported for csv sources")
+
+    paths = None
+    if is_pattern(file_path):
+        paths = await asyncio.to_thread(expand_sources, file_path, source_type)
+        if not paths:
+            raise HTTPException(status_code=400, detail=f"No {source_type} files match: {file_path}")
+    elif not os.path.isfile(file_path):
+        raise HTTPException(status_code=400, detail=f"File not found: {file_path}")
+
+    try:
+        job = job_scheduler.submit(source_type, file_path, parallel, resume, paths=paths, fan_out=fan_out)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=429, detail="Ingestion queue is full, retry later")
+
+    queued = f"{len(paths)} files from {file_path}" if paths else file_path
+    return {
+        "status": "queued",
+        "message": f"Queued {queued} as {source_type}",
+        "job_id": job.id,
+    }
+
+
+@router.post("/upload")
+async def upload_file(
+    request: Request,
+    source_type: str = Query("csv", enum=["csv", "json"]),
+    # recorded as source_path of the upload's error rows
+    name: str = Query("upload", description="Name of the uploaded data, e.g. the client's file name"),
+):
+    """
+    Ingests the request body itself: raw CSV (header first) or NDJSON,
+    optionally gzip / bzip2 / zstd compressed (detected from its first bytes),
+    e.g. curl --data-binary @hour-00.csv.gz.
+
+    The body is parsed incrementally as it arrives and never buffered whole,
+    in memory or on disk; while the database writer is behind, the socket is
+    not read. Responds once everything is committed, with the same summary as
+    an ingestion job. Nothing is checkpointed: re-send a failed upload, its
+    already stored records are skipped as duplicates.
+    """
+    if not upload_slots.try_acquire():
+        raise HTTPException(status_code=429, detail="Too many uploads in progress, retry later")
+
+    body = AsyncByteReader(
+        request.stream(), asyncio.get_running_loop(), timeout=settings.UPLOAD_READ_TIMEOUT_SECONDS
+    )
+    try:
+        async with async_session_factory() as db:
+            stats = await orchestrator.execute_stream(db, source_type, body, name)
+    except TimeoutError as exc:
+        raise HTTPException(status_code=408, detail=f"Upload {name} stalled: {exc}") from exc
+    except (ValueError, OSError, EOFError) as exc:
+        # e.g. a truncated or corrupt compressed body; earlier chunks stay committed
+        raise HTTPException(status_code=400, detail=f"Upload {name} failed: {exc}") from exc
+    finally:
+        # releases the parser thread if it is still waiting for the body (client gone, cancelled)
+        body.close()
+        upload_slots.release()
+
+    logger.info("Ingested upload %s: %d rows", name, stats.rows)
+    return {"status": "completed", "progress": stats.as_dict()}
+
+
+@router.post("/reprocess", status_code=202)
+async def reprocess_errors(
+    source: str | None = Query(None, description="Source type: csv, json, kafka"),
+    currency: str | None = Query(None, description="Only records in this currency, e.g. JPY"),
+    field: str | None = Query(None, description="Only errors on this field, e.g. currency"),
+    code: str | None = Query(None, description="Only errors of this type, e.g. value_error"),
+    after_id: int = Query(0, ge=0, description="Resume after this error id (a job's last_id)"),
 ):
-    orchestrator = DataOrchestrator()
+    """
+    Queues a re-validation of stored error rows after a rule change (e.g. a
+    currency added to ALLOWED_CURRENCIES); rows that now pass are moved to
+    processed_data. Poll GET /api/v1/jobs/{job_id} for progress.
+    """
+    if currency and currency.upper() not in settings.ALLOWED_CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"Currency {currency} is not in ALLOWED_CURRENCIES")
 
     try:
-        summary = await orchestrator.execute(
-            db=db,
-            source_type=source_type,
-            source_path=file_path,
-        )
-        
-        return {
-            "status": "success",
-            "message": f"Processed {file_path} as {source_type}",
-            "summary": summary  # High-value info for the user
-        }
-
-    except ValueError as ve:
-        raise HTTPException(status_code=400, detail=str(ve))
-
-    except Exception as e:
-        logger.exception("Unexpected error during ingestion")
-        raise HTTPException(status_code=500, detail="Internal server error during ingestion")
\ No newline at end of file
+        job = job_scheduler.submit_reprocess(ReprocessFilter(source, currency, field, code, after_id))
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=429, detail="Ingestion queue is full, retry later")
+
+    return {"status": "queued", "message": "Queued reprocessing of error rows", "job_id": job.id}
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """Recent ingestion jobs, oldest first."""
+    return [job.as_dict() for job in job_scheduler.jobs()]
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and live progress (rows/sec, valid/error counts, byte offset) of a job."""
+    job = job_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.as_dict()
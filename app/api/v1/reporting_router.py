@@ -1,38 +1,147 @@
-from fastapi import APIRouter, Depends, Response
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.database import get_db
-from app.reporting.exporter import ReportExporter
-from sqlalchemy import func, select
-from app.models.models import ProcessedData, IngestionError
+from app.models.database import get_read_db
+from app.reporting.exporter import ReportExporter, ReportFilters
+from app.reporting.report_cache import ReportKey, report_cache
+from app.reporting.aggregates import AggregateQuery, aggregate
+from app.core.config import settings
+from app.crud.rollups import read_rollups
+from app.crud.raw_store import load_payloads
 
 router = APIRouter()
 
+# report kind -> (query, streaming export, buffered export)
+_EXPORTS = {
+    "report": (ReportExporter.report_query, ReportExporter.stream_report, ReportExporter.export),
+    "errors": (ReportExporter.error_query, ReportExporter.stream_errors, ReportExporter.export_errors),
+}
+
+
+def report_filters(
+    currency: str | None = Query(None, description="e.g. USD"),
+    source: str | None = Query(None, description="Source type: csv, json, kafka"),
+    status: str | None = Query(None, description="e.g. PROCESSED"),
+    since: datetime | None = Query(None, description="processed_at >= since"),
+    until: datetime | None = Query(None, description="processed_at < until"),
+    after_id: int | None = Query(None, ge=0, description="Keyset cursor: only ids greater than this"),
+    limit: int | None = Query(None, ge=1, description="Page size"),
+) -> ReportFilters:
+    return ReportFilters(currency, source, status, since, until, after_id, limit)
+
+
+def error_filters(
+    source: str | None = Query(None, description="Source type: csv, json, kafka"),
+    since: datetime | None = Query(None, description="created_at >= since"),
+    until: datetime | None = Query(None, description="created_at < until"),
+    after_id: int | None = Query(None, ge=0, description="Keyset cursor: only ids greater than this"),
+    limit: int | None = Query(None, ge=1, description="Page size"),
+) -> ReportFilters:
+    return ReportFilters(source=source, since=since, until=until, after_id=after_id, limit=limit)
+
+
+def _attachment(filename: str) -> dict:
+    return {"Content-Disposition": f"attachment; filename={filename}"}
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def _cached_export(
+    request: Request,
+    db: AsyncSession,
+    kind: str,
+    fmt: str,
+    filters: ReportFilters,
+    filename: str,
+    empty_message: str,
+):
+    """
+    Serves a report through the watermark-keyed cache: 304 when the client
+    already holds the current version, the cached body when there is one,
+    otherwise a fresh export (bounded by the watermark) that fills the cache.
+    Paged requests (limit) get the next cursor in X-Next-After-Id.
+    """
+    max_id, count = await ReportExporter.watermark(db, kind)
+    if max_id is None:
+        return {"message": empty_message}
+
+    key = ReportKey(kind, fmt, filters.key(), (max_id, count))
+    etag = report_cache.etag(key)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    query, stream, export = _EXPORTS[kind]
+    headers = {**_attachment(filename), "ETag": etag}
+    if filters.limit is not None:
+        next_id = await ReportExporter.next_cursor(db, query(max_id, filters))
+        if next_id is not None:
+            headers["X-Next-After-Id"] = str(next_id)
+    media_type = settings.REPORT_FORMATS[fmt]
+    cached = await report_cache.get(key)
+    if isinstance(cached, bytes):
+        return Response(content=cached, media_type=media_type, headers=headers)
+    if cached is not None:
+        return StreamingResponse(cached, media_type=media_type, headers=headers)
+
+    if ReportExporter.is_streamable(fmt):
+        return StreamingResponse(
+            report_cache.tee(key, stream(fmt, upto=max_id, filters=filters)),
+            media_type=media_type,
+            headers=headers,
+        )
+
+    content, media_type = await export(db, fmt, upto=max_id, filters=filters)
+    if content is None:
+        return {"message": empty_message}
+    await report_cache.put(key, content)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
 @router.get("/errors/{format}")
-async def get_error_report(format: str, db: AsyncSession = Depends(get_db)):
+async def get_error_report(
+    format: str,
+    request: Request,
+    filters: ReportFilters = Depends(error_filters),
+    db: AsyncSession = Depends(get_read_db),
+):
     """
     Download a report of all rows that failed validation.
+    CSV / JSON / NDJSON are streamed straight from the database cursor.
+    Responses carry an ETag; unchanged reports are served from cache or as 304.
+    Filter by source / created_at range and page with after_id + limit.
     """
-    content, mime_type = await ReportExporter.export_errors(db, format)
+    fmt = format.lower()
+    if fmt not in settings.REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format {fmt} not supported.")
 
-    if content is None:
-        return {"message": "No errors found! Great job."}
-    return Response(
-        content=content, 
-        media_type=mime_type,
-        headers={"Content-Disposition": f"attachment; filename=error_report.{format}"}
+    return await _cached_export(
+        request, db, "errors", fmt, filters, f"error_report.{fmt}", "No errors found! Great job."
     )
 
 @router.get("/summary")
-async def get_ingestion_summary(db: AsyncSession = Depends(get_db)):
-    """Quick stats on system health"""
+async def get_ingestion_summary(db: AsyncSession = Depends(get_read_db)):
+    """
+    Quick stats on system health, served from the incrementally
+    maintained rollup table (no scan of the base tables).
+    """
+    by_source: dict[str, dict[str, int]] = {}
+    by_currency: dict[str, int] = {}
+    success_count = error_count = 0
 
-    # Run both counts concurrently
-    # pylint: disable=not-callable
-    success_stmt = select(func.count(ProcessedData.id))
-    error_stmt = select(func.count(IngestionError.id))
-    
-    success_count = (await db.execute(success_stmt)).scalar() or 0
-    error_count = (await db.execute(error_stmt)).scalar() or 0
+    for row in await read_rollups(db):
+        source = by_source.setdefault(row.source_type, {"successful_records": 0, "validation_failures": 0})
+        source["successful_records"] += row.success_count
+        source["validation_failures"] += row.failure_count
+        if row.success_count:
+            by_currency[row.currency] = by_currency.get(row.currency, 0) + row.success_count
+        success_count += row.success_count
+        error_count += row.failure_count
 
     total = success_count + error_count
     success_rate = (success_count / total * 100) if total > 0 else 0
@@ -41,23 +150,68 @@ async def get_ingestion_summary(db: AsyncSession = Depends(get_db)):
         "total_processed": total,
         "successful_records": success_count,
         "validation_failures": error_count,
-        "success_rate": f"{success_rate:.2f}%"
+        "success_rate": f"{success_rate:.2f}%",
+        "by_source": by_source,
+        "by_currency": by_currency,
     }
 
 
+@router.get("/aggregate")
+async def get_aggregate(
+    group_by: str = Query("", description="Comma separated: currency, channel, source, hour | day"),
+    currency: str | None = Query(None, description="e.g. USD"),
+    channel: str | None = Query(None, description="source_channel, e.g. CHANNEL3"),
+    source: str | None = Query(None, description="Source type: csv, json, kafka"),
+    since: datetime | None = Query(None, description="record timestamp >= since"),
+    until: datetime | None = Query(None, description="record timestamp < until"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    sum / count / min / max / avg of amount per group, computed in SQL.
+    Hour-aligned queries are served from the hourly rollups.
+    """
+    try:
+        query = AggregateQuery(
+            tuple(name.strip().lower() for name in group_by.split(",") if name.strip()),
+            currency, channel, source, since, until,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows, origin = await aggregate(db, query)
+    return {"group_by": list(query.group_by), "from": origin, "rows": rows}
+
+
 @router.get("/report/{format}")
-async def download_report(format: str, db: AsyncSession = Depends(get_db)):
+async def download_report(
+    format: str,
+    request: Request,
+    filters: ReportFilters = Depends(report_filters),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Download validated records. Filter by currency / source / status /
+    processed_at range and page with after_id + limit (see X-Next-After-Id).
+    """
+    fmt = format.lower()
+    if fmt not in settings.REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format {fmt} not supported.")
+
     try:
-        content, media_type = await ReportExporter.export(db, format.lower())
-        
-        if content is None:
-            return {"message": "Database is empty. Ingest some data first!"}
-
-        # Return the file as a downloadable attachment
-        return Response(
-            content=content,
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename=report.{format}"}
+        return await _cached_export(
+            request, db, "report", fmt, filters, f"report.{fmt}", "Database is empty. Ingest some data first!"
         )
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/raw/{raw_id}")
+async def get_raw_record(raw_id: int, db: AsyncSession = Depends(get_read_db)):
+    """
+    Audit view of one raw record exactly as received, decoded from its
+    compressed block when it was stored in compact mode.
+    """
+    payloads = await load_payloads(db, [raw_id])
+    if raw_id not in payloads:
+        raise HTTPException(status_code=404, detail=f"Raw record {raw_id} not found.")
+    return {"id": raw_id, "payload": payloads[raw_id]}
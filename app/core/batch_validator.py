@@ -0,0 +1,354 @@
+"""
+Batch Validator
+---------------
+Column-wise validation of record chunks.
+
+`DataRecord` remains the source of truth for the validation rules. The batch
+engine only short-circuits the rows it can prove valid with vectorised
+NumPy/pandas checks (plain strings, finite positive amounts, allowed currencies,
+naive ISO timestamps in the past). Every other row is handed to `DataRecord`
+itself, so rejected rows carry exactly the same error message as the
+per-row path and ambiguous inputs are coerced exactly as Pydantic would.
+
+Example usage:
+    validator = BatchValidator()
+    result = validator.validate(rows, source_type="csv", source_path="data.csv")
+    result.valid_mask      # numpy bool array, one entry per input row
+    result.columns         # validated values of the valid rows, column-wise
+    result.errors          # IngestionError-shaped dicts for the rejected rows
+    result = validator.validate_batch(batch, "csv", "data.csv")   # same, over a ColumnBatch
+    BatchValidator(allowed_currencies=["USD", "JPY"])   # instead of settings.ALLOWED_CURRENCIES
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.ingestors.base_ingestor import MISSING, ColumnBatch
+from app.schemas.data_schema import DataRecord
+
+VALIDATED_FIELDS = ("external_id", "amount", "currency", "source_channel", "timestamp")
+
+# Only literals that Pydantic and NumPy parse identically take the fast path
+# (ASCII digits only: float() takes other Unicode digits, Pydantic does not).
+_DECIMAL = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?", re.ASCII)
+_NAIVE_ISO = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?", re.ASCII)
+_COLUMN_PATTERNS = {
+    pattern: re.compile(rf"(?:(?:{pattern.pattern})\n)*(?:{pattern.pattern})", re.ASCII)
+    for pattern in (_DECIMAL, _NAIVE_ISO)
+}
+
+
+@dataclass
+class BatchResult:
+    """
+    Outcome of validating one chunk of rows.
+    - valid_mask: bool array aligned with the input rows
+    - columns: validated values for the valid rows (in input order), keyed by field
+    - errors: one IngestionError-shaped dict per rejected row
+    """
+    valid_mask: np.ndarray
+    columns: dict[str, list] = field(default_factory=dict)
+    errors: list[dict] = field(default_factory=list)
+
+    @property
+    def valid_count(self) -> int:
+        return int(self.valid_mask.sum())
+
+    @property
+    def error_count(self) -> int:
+        return len(self.errors)
+
+    def validated_rows(self) -> list[dict]:
+        """Row-wise view of `columns`, one dict per valid row."""
+        names = list(self.columns)
+        return [dict(zip(names, values)) for values in zip(*self.columns.values())]
+
+
+class BatchValidator:
+    """
+    Validates chunks of raw rows column-wise, falling back to `DataRecord`
+    for every row the vectorised checks cannot accept on their own.
+    `allowed_currencies` overrides settings.ALLOWED_CURRENCIES, read per
+    chunk otherwise, on both paths.
+    """
+    def __init__(self, allowed_currencies: list[str] | None = None):
+        self.allowed_currencies = None if allowed_currencies is None else frozenset(allowed_currencies)
+
+    def validate(self, rows: list[dict], source_type: str, source_path: str | None) -> BatchResult:
+        """
+        Vectorised validation of a chunk. Allowed currencies and 'now' are
+        resolved once per chunk instead of once per row.
+        """
+        columns = {name: _objects([row.get(name, MISSING) for row in rows]) for name in VALIDATED_FIELDS}
+        return self._validate_columns(columns, len(rows), rows.__getitem__, source_type, source_path)
+
+    def validate_batch(self, batch: ColumnBatch, source_type: str, source_path: str | None) -> BatchResult:
+        """`validate` over a ColumnBatch, whose columns are taken as they are."""
+        columns = {name: _objects(batch.column(name)) for name in VALIDATED_FIELDS}
+        return self._validate_columns(columns, batch.size, batch.record, source_type, source_path)
+
+    def _validate_columns(
+        self,
+        columns: dict[str, np.ndarray],
+        n: int,
+        record_at,
+        source_type: str,
+        source_path: str | None,
+    ) -> BatchResult:
+        """
+        `columns`: object arrays of the VALIDATED_FIELDS (MISSING where absent);
+        `record_at(i)` returns record i as a dict for the DataRecord fallback.
+        """
+        if n == 0:
+            return self._empty()
+
+        now = datetime.now()
+        allowed = self._allowed()
+
+        external_ids = columns["external_id"]
+        channels = columns["source_channel"]
+        ok = _is_str(external_ids) & _is_str(channels)
+
+        amount_ok, amounts = _parse_amounts(columns["amount"])
+        ok &= amount_ok
+
+        currencies = columns["currency"]
+        if not _all_str(currencies):
+            currencies = _objects(["USD" if c is MISSING else c for c in currencies])
+        currencies = _upper(currencies)
+        ok &= pd.Series(currencies, dtype=object).isin(allowed).to_numpy()
+
+        ts_ok, timestamps = _parse_timestamps(columns["timestamp"], now)
+        ok &= ts_ok
+
+        out = {
+            "external_id": external_ids,
+            "amount": amounts.astype(object),
+            "currency": currencies,
+            "source_channel": channels,
+            "timestamp": timestamps,
+        }
+        valid_mask = ok.copy()
+        errors = []
+
+        # Rows the fast path could not prove valid go through DataRecord itself.
+        for i in np.flatnonzero(~ok):
+            record, error = self._validate_one(record_at(i), source_type, source_path)
+            if record is None:
+                errors.append(error)
+                continue
+            valid_mask[i] = True
+            for name in VALIDATED_FIELDS:
+                out[name][i] = getattr(record, name)
+
+        return BatchResult(
+            valid_mask=valid_mask,
+            columns={name: values[valid_mask].tolist() for name, values in out.items()},
+            errors=errors,
+        )
+
+    def validate_rows(self, rows: list[dict], source_type: str, source_path: str | None) -> BatchResult:
+        """
+        Reference path: one `DataRecord` per row. Same output shape as `validate`.
+        """
+        valid_mask = np.zeros(len(rows), dtype=bool)
+        columns = {name: [] for name in VALIDATED_FIELDS}
+        errors = []
+
+        for i, raw_data in enumerate(rows):
+            record, error = self._validate_one(raw_data, source_type, source_path)
+            if record is None:
+                errors.append(error)
+                continue
+            valid_mask[i] = True
+            for name in VALIDATED_FIELDS:
+                columns[name].append(getattr(record, name))
+
+        return BatchResult(valid_mask=valid_mask, columns=columns, errors=errors)
+
+    def parity_mismatches(self, rows: list[dict]) -> list[int]:
+        """
+        Indices of rows where the vectorised engine and `DataRecord` disagree,
+        either on validity or on a validated value. Defaulted timestamps are
+        ignored since both paths take 'now' at slightly different instants.
+        """
+        fast = self.validate(rows, "parity", None)
+        reference = self.validate_rows(rows, "parity", None)
+        mismatches = np.flatnonzero(fast.valid_mask != reference.valid_mask).tolist()
+
+        compared = [name for name in VALIDATED_FIELDS if name != "timestamp"]
+        positions = np.flatnonzero(fast.valid_mask & reference.valid_mask)
+        fast_pos = np.cumsum(fast.valid_mask) - 1
+        ref_pos = np.cumsum(reference.valid_mask) - 1
+        for i in positions:
+            if "timestamp" in rows[i] and (
+                fast.columns["timestamp"][fast_pos[i]] != reference.columns["timestamp"][ref_pos[i]]
+            ):
+                mismatches.append(int(i))
+                continue
+            for name in compared:
+                if fast.columns[name][fast_pos[i]] != reference.columns[name][ref_pos[i]]:
+                    mismatches.append(int(i))
+                    break
+
+        return sorted(mismatches)
+
+    def _allowed(self) -> frozenset:
+        if self.allowed_currencies is None:
+            return frozenset(settings.ALLOWED_CURRENCIES)
+        return self.allowed_currencies
+
+    def _validate_one(self, raw_data: dict, source_type: str, source_path: str | None):
+        try:
+            if self.allowed_currencies is None:
+                return DataRecord(**raw_data), None
+            return DataRecord.model_validate(raw_data, context={"allowed_currencies": self.allowed_currencies}), None
+        except ValidationError as ve:
+            return None, {
+                "source_type": source_type,
+                "source_path": source_path,
+                "raw_content": str(raw_data),
+                "error_message": str(ve),
+                **error_details(ve),
+            }
+
+    @staticmethod
+    def _empty() -> BatchResult:
+        return BatchResult(
+            valid_mask=np.zeros(0, dtype=bool),
+            columns={name: [] for name in VALIDATED_FIELDS},
+        )
+
+
+# error_code of records the ingestor could not parse; their error_message is always kept
+MALFORMED_RECORD = "malformed_record"
+
+
+def malformed_errors(malformed: list[tuple[str, str]], source_type: str, source_path: str | None) -> list[dict]:
+    """IngestionError-shaped entries for records the ingestor could not parse."""
+    return [
+        {
+            "source_type": source_type,
+            "source_path": source_path,
+            "raw_content": raw_content,
+            "error_message": error_message,
+            "error_code": MALFORMED_RECORD,
+            "error_fields": "",
+        } for raw_content, error_message in malformed
+    ]
+
+
+def error_details(ve: ValidationError) -> dict:
+    """
+    Structured form of a validation failure: the Pydantic error types and
+    the fields they apply to, as aligned comma separated lists.
+    """
+    errors = ve.errors(include_url=False)
+    return {
+        "error_code": ",".join(error["type"] for error in errors),
+        "error_fields": ",".join(".".join(str(part) for part in error["loc"]) for error in errors),
+    }
+
+
+def _objects(values: list) -> np.ndarray:
+    """1-D object array, even when cells are themselves sequences."""
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+def _all_str(values: np.ndarray) -> bool:
+    return pd.api.types.infer_dtype(values, skipna=False) == "string"
+
+
+def _is_str(values: np.ndarray) -> np.ndarray:
+    if _all_str(values):
+        return np.ones(len(values), dtype=bool)
+    return np.fromiter((type(v) is str for v in values), dtype=bool, count=len(values))
+
+
+def _fullmatch(values: np.ndarray, pattern: re.Pattern) -> np.ndarray:
+    """
+    Regex fullmatch per cell; non-string cells never match. A column made only
+    of strings is first checked with one match over the newline-joined column.
+    """
+    n = len(values)
+    if _all_str(values):
+        joined = "\n".join(values)
+        column = _COLUMN_PATTERNS[pattern]
+        if joined.count("\n") == n - 1 and column.fullmatch(joined):
+            return np.ones(n, dtype=bool)
+    return np.fromiter(
+        (type(v) is str and pattern.fullmatch(v) is not None for v in values),
+        dtype=bool,
+        count=n,
+    )
+
+
+def _upper(values: np.ndarray) -> np.ndarray:
+    """Upper-cases string cells; non-string cells become None."""
+    if _all_str(values):
+        upper = "\n".join(values).upper().split("\n")
+        if len(upper) == len(values):
+            return _objects(upper)
+    return _objects([v.upper() if type(v) is str else None for v in values])
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (OverflowError, TypeError, ValueError):
+        return np.nan
+
+
+def _parse_amounts(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (ok, amounts). `ok` is only set for finite, positive amounts given
+    as int/float values or plain decimal strings.
+    """
+    kind = pd.api.types.infer_dtype(values, skipna=False)
+
+    if kind in ("integer", "floating", "mixed-integer-float"):
+        parseable = np.ones(len(values), dtype=bool)
+    else:
+        parseable = _fullmatch(values, _DECIMAL)
+        if not parseable.all():
+            parseable |= np.fromiter(
+                (type(v) in (int, float) for v in values), dtype=bool, count=len(values)
+            )
+
+    amounts = np.full(len(values), np.nan)
+    try:
+        amounts[parseable] = values[parseable].astype(float)
+    except OverflowError:
+        amounts[parseable] = [_to_float(v) for v in values[parseable]]
+
+    with np.errstate(invalid="ignore"):
+        ok = np.isfinite(amounts) & (amounts > 0)
+    return ok, amounts
+
+
+def _parse_timestamps(values: np.ndarray, now: datetime) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (ok, timestamps). Missing timestamps default to `now`; naive ISO
+    strings are parsed in bulk; anything else is left to DataRecord.
+    """
+    timestamps = np.empty(len(values), dtype=object)
+    missing = np.fromiter((v is MISSING for v in values), dtype=bool, count=len(values))
+    timestamps[missing] = now
+    if missing.all():
+        return missing, timestamps
+
+    present = np.flatnonzero(~missing)
+    iso = present[_fullmatch(values[present], _NAIVE_ISO)]
+    parsed = pd.to_datetime(pd.Series(values[iso], dtype=object), format="ISO8601", errors="coerce")
+    in_range = (parsed.notna() & (parsed <= pd.Timestamp(now))).to_numpy(dtype=bool)
+
+    accepted = iso[in_range]
+    timestamps[accepted] = pd.DatetimeIndex(parsed[in_range]).to_pydatetime()
+    ok = missing.copy()
+    ok[accepted] = True
+    return ok, timestamps
@@ -24,21 +24,76 @@ class Settings(BaseSettings):
     ALLOWED_CURRENCIES: List[str] = ["USD", "EUR", "GBP", "AUD"]
 
     BATCH_SIZE :int = 10000
+    # "batch" validates whole chunks column-wise, "row" runs DataRecord per row (reference path)
+    VALIDATION_MODE: str = "batch"
+    # parallel CSV ingestion: worker processes (0 = one per CPU) and bytes per shard
+    INGEST_WORKERS: int = 0
+    PARALLEL_RANGE_BYTES: int = 4 * 1024 * 1024
+    # sequential ingestion: validated chunks queued ahead of the writer while it commits
+    INGEST_PIPELINE_DEPTH: int = 2
+    # queue validated chunks in compact staging buffers (False: as parsed batches + row dicts, reference path)
+    INGEST_STAGING: bool = True
+    # rows per insert statement when the writer stores a staged chunk (bounds its parameter lists)
+    INSERT_CHUNK_ROWS: int = 10000
+    # background ingestion jobs: files ingested at once, and queued jobs before POST /ingest answers 429
+    INGEST_CONCURRENCY: int = 2
+    INGEST_QUEUE_SIZE: int = 100
+    # directory / glob jobs: files of one job ingested at once (default for POST /ingest fan_out)
+    INGEST_FILE_FAN_OUT: int = 4
+    # error rows re-validated per page (and per worker process) by app.core.reprocessor
+    REPROCESS_BATCH_SIZE: int = 5000
+    # POST /upload: request bodies ingested at once before it answers 429
+    UPLOAD_CONCURRENCY: int = 4
+    # POST /upload: longest wait for the next piece of the request body before the upload fails
+    UPLOAD_READ_TIMEOUT_SECONDS: float = 60.0
+    # skip already-ingested external_ids in memory before the unique index has to
+    DEDUP_ENABLED: bool = True
+    # maintain hourly_rollups (amount aggregates per hour/source/currency/channel) with every batch
+    HOURLY_ROLLUPS_ENABLED: bool = True
+    # batch-level stage timers and counters served at GET /metrics
+    METRICS_ENABLED: bool = True
+    # "json" keeps one payload document per RawData row; "compact" stores each batch's payloads as one
+    # compressed block (RAW_CODEC zlib, or zstd if zstandard is installed) and drops the text of
+    # field-level validation errors in favour of their error codes
+    RAW_STORAGE_MODE: str = "json"
+    RAW_CODEC: str = "zlib"
     DATABASE_URL: str = "sqlite+aiosqlite:///./reporting.db?timeout=30"
+    # single-writer coordinator: batches queued for the writer, and batches committed per transaction
+    WRITE_QUEUE_SIZE: int = 32
+    WRITE_GROUP_SIZE: int = 8
+    # the writer runs PRAGMA wal_checkpoint(PASSIVE) this often (and when idle); WAL file size kept after it
+    WAL_CHECKPOINT_SECONDS: float = 5.0
+    WAL_SIZE_LIMIT_BYTES: int = 64 * 1024 * 1024
+    # SQLite read-only pool for reporting (mode=ro, query_only): connections, page cache and mmap per connection
+    READ_POOL_SIZE: int = 5
+    READ_CACHE_KB: int = 64 * 1024
+    READ_MMAP_BYTES: int = 256 * 1024 * 1024
     APP_NAME: str = "Reporting System API"
     FILE_CSV: str = "csv"
     FILE_JSON: str = "json"
+    FILE_NDJSON: str = "ndjson"
     FILE_XLSX: str = "xlsx"
     REPORT_FORMATS: dict[str,str] = {
         "csv": "text/csv",
         "json": "application/json",
+        "ndjson": "application/x-ndjson",
         "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     }
+    # rows fetched per server-side cursor partition when streaming exports
+    EXPORT_CHUNK_SIZE: int = 10000
+    # rendered report cache: in-memory LRU budget, optional spill directory ("" = off) and its budget
+    REPORT_CACHE_BYTES: int = 256 * 1024 * 1024
+    REPORT_CACHE_DIR: str = ""
+    REPORT_CACHE_DISK_BYTES: int = 2 * 1024 * 1024 * 1024
 
-    # kafka 
+    # kafka: KAFKA_ENABLED runs the consumer (KafkaWorker) in the API process; needs a reachable broker
+    KAFKA_ENABLED: bool = False
     KAFKA_TOPIC: str = "topic"
     KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
     KAFKA_GROUP_ID: str = "reporting-consumer-group"
+    # micro-batching: a batch is flushed at KAFKA_BATCH_SIZE records or after KAFKA_BATCH_LATENCY_MS
+    KAFKA_BATCH_SIZE: int = 1000
+    KAFKA_BATCH_LATENCY_MS: int = 200
 
     class Config:
         """
@@ -0,0 +1,76 @@
+"""
+External ID De-duplication
+--------------------------
+In-memory set of every external_id already persisted, warmed from
+processed_data at startup. The orchestrator drops records whose id is
+already known before they reach the database, so re-ingesting a file or a
+Kafka redelivery costs a set lookup per record rather than a DB round trip.
+
+The set is a fast pre-filter only: ids are added after their batch
+commits, and the unique index on processed_data.external_id (inserts use
+ON CONFLICT DO NOTHING) stays the authoritative check, e.g. for two jobs
+racing on the same id. Memory grows with the table (roughly 60-80 bytes per
+id); set DEDUP_ENABLED=false to rely on the index alone.
+
+Example usage:
+    keep = seen_external_ids.new_mask(["TXN-1", "TXN-1", "TXN-2"])  # [True, False, True] on a fresh set
+"""
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.models import ProcessedData
+
+logger = logging.getLogger(__name__)
+
+WARM_PARTITION_SIZE = 100_000
+
+
+class ExternalIdFilter:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._seen: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __contains__(self, external_id: str) -> bool:
+        return self.enabled and external_id in self._seen
+
+    def new_mask(self, external_ids: list[str]) -> list[bool]:
+        """
+        True for ids neither persisted nor repeated earlier in `external_ids`.
+        Does not record them: call `add` once the batch has committed.
+        """
+        if not self.enabled:
+            return [True] * len(external_ids)
+        seen = self._seen
+        batch: set[str] = set()
+        mask = []
+        for external_id in external_ids:
+            mask.append(external_id not in seen and external_id not in batch)
+            batch.add(external_id)
+        return mask
+
+    def add(self, external_ids) -> None:
+        if self.enabled:
+            self._seen.update(external_ids)
+
+    async def warm(self, db: AsyncSession) -> None:
+        """Loads every persisted external_id, streamed in partitions."""
+        if not self.enabled:
+            return
+        result = await db.stream(
+            select(ProcessedData.external_id).execution_options(yield_per=WARM_PARTITION_SIZE)
+        )
+        async for rows in result.partitions():
+            self._seen.update(row[0] for row in rows)
+        logger.info("Dedup filter warmed with %d external ids", len(self._seen))
+
+    def clear(self) -> None:
+        self._seen.clear()
+
+
+seen_external_ids = ExternalIdFilter(settings.DEDUP_ENABLED)
@@ -0,0 +1,326 @@
+"""
+Ingestion Job Scheduler
+-----------------------
+Runs file ingestions in the background so POST /ingest returns a job id
+immediately. A fixed pool of INGEST_CONCURRENCY worker tasks pulls jobs
+from a queue bounded by INGEST_QUEUE_SIZE; `submit` raises QueueFull when
+it is at capacity so callers can push back instead of piling up work.
+Each running job holds one DB session, so the connection pool never sees
+more than INGEST_CONCURRENCY ingestion sessions.
+
+A job can also cover many files (a directory or glob, see `expand_sources`):
+it ingests up to `fan_out` of them at once, each on its own session, while
+their batches share the write coordinator's single writer and group
+commits. Parallel files of one job share one process pool, so a job never
+runs more than INGEST_WORKERS worker processes. Files already ingested are
+skipped through the checkpoint manifest, and the job reports
+IngestionStats per file.
+
+Reprocessing runs (see app.core.reprocessor) are queued as ReprocessJobs
+on the same workers and polled the same way.
+
+Example usage:
+    job = job_scheduler.submit("csv", "large_data.csv")
+    job_scheduler.get(job.id).as_dict()   # status + live IngestionStats
+    job_scheduler.submit("csv", "/data/hourly/*.csv", paths=expand_sources("/data/hourly/*.csv", "csv"))
+    job_scheduler.submit_reprocess(ReprocessFilter(currency="JPY"))
+"""
+import asyncio
+import glob
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from contextlib import nullcontext
+from enum import Enum
+
+from app.core import parallel_ingest
+from app.core.config import settings
+from app.core.orchestrator import DataOrchestrator, IngestionStats
+from app.core.reprocessor import ReprocessFilter, Reprocessor, ReprocessStats
+from app.ingestors.block_reader import strip_compression_suffix
+from app.models.database import async_session_factory
+
+logger = logging.getLogger(__name__)
+
+# files picked up from a directory, per source type
+SOURCE_EXTENSIONS = {
+    "csv": (".csv",),
+    "json": (".json", ".ndjson", ".jsonl"),
+}
+
+
+def is_pattern(path: str) -> bool:
+    """A directory, or a glob; an existing file whose name has glob characters (report[1].csv) is neither."""
+    return os.path.isdir(path) or (not os.path.isfile(path) and glob.has_magic(path))
+
+
+def expand_sources(path: str, source_type: str) -> list[str]:
+    """
+    Files to ingest for `path`: the files of a directory that carry one of
+    the source type's extensions (optionally compressed, e.g. .csv.gz), or
+    every file a glob matches (** recurses).
+    Sorted, so files are started in name (usually time) order.
+    """
+    if os.path.isdir(path):
+        extensions = SOURCE_EXTENSIONS.get(source_type, ())
+        matches = (
+            os.path.join(path, name) for name in os.listdir(path)
+            if strip_compression_suffix(name.lower()).endswith(extensions)
+        )
+    else:
+        matches = glob.iglob(path, recursive=True)
+    return sorted(match for match in matches if os.path.isfile(match))
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    source_type: str
+    source_path: str
+    parallel: bool = False
+    resume: bool = True
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.QUEUED
+    error: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    stats: IngestionStats | None = None
+    # multi-file jobs: source_path is the directory / glob, one IngestionStats per file
+    paths: list[str] | None = None
+    fan_out: int = 1
+    files: list[IngestionStats] = field(default_factory=list)
+    file_errors: dict[str, str] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        result = {
+            "job_id": self.id,
+            "status": self.status.value,
+            "source_type": self.source_type,
+            "source_path": self.source_path,
+            "parallel": self.parallel,
+            "resume": self.resume,
+            "error": self.error,
+            "progress": self.stats.as_dict() if self.stats else None,
+        }
+        if self.paths is not None:
+            result["progress"] = self._totals()
+            result["files"] = [
+                {**stats.as_dict(), "error": self.file_errors.get(stats.source_path)} for stats in self.files
+            ]
+        return result
+
+    def _totals(self) -> dict:
+        rows = sum(stats.rows for stats in self.files)
+        elapsed = 0.0
+        if self.files:
+            finished = [stats.finished_at for stats in self.files]
+            end = max(finished) if None not in finished and len(self.files) == len(self.paths) else time.monotonic()
+            elapsed = end - min(stats.started_at for stats in self.files)
+        return {
+            "files": len(self.paths),
+            "started": len(self.files),
+            "finished": sum(1 for stats in self.files if stats.finished_at is not None),
+            "skipped": sum(1 for stats in self.files if stats.skipped),
+            "failed": len(self.file_errors),
+            "rows": rows,
+            "valid_count": sum(stats.valid_count for stats in self.files),
+            "error_count": sum(stats.error_count for stats in self.files),
+            "duplicate_count": sum(stats.duplicate_count for stats in self.files),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+@dataclass
+class ReprocessJob:
+    filters: ReprocessFilter
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.QUEUED
+    error: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    stats: ReprocessStats | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": "reprocess",
+            "status": self.status.value,
+            "error": self.error,
+            "progress": self.stats.as_dict() if self.stats else None,
+        }
+
+
+class JobScheduler:
+    """
+    Bounded background queue of ingestion jobs. Finished jobs are kept for
+    polling, trimmed to the most recent `history` of them.
+    """
+    def __init__(
+        self,
+        concurrency: int,
+        queue_size: int,
+        history: int = 1000,
+        orchestrator: DataOrchestrator | None = None,
+        session_factory=async_session_factory,
+    ):
+        self.concurrency = max(concurrency, 1)
+        self.history = history
+        self._queue: asyncio.Queue[IngestionJob | ReprocessJob] = asyncio.Queue(maxsize=queue_size)
+        self._jobs: OrderedDict[str, IngestionJob | ReprocessJob] = OrderedDict()
+        self._orchestrator = orchestrator or DataOrchestrator()
+        self._session_factory = session_factory
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self):
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        logger.info("Job scheduler started with %d workers", self.concurrency)
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Job scheduler stopped")
+
+    def submit(
+        self,
+        source_type: str,
+        source_path: str,
+        parallel: bool = False,
+        resume: bool = True,
+        paths: list[str] | None = None,
+        fan_out: int | None = None,
+    ) -> IngestionJob:
+        """
+        Queues a job; raises asyncio.QueueFull when the queue is at capacity.
+        Pass `paths` (e.g. from `expand_sources`) for a multi-file job.
+        """
+        job = IngestionJob(
+            source_type, source_path, parallel, resume,
+            paths=paths, fan_out=max(fan_out or settings.INGEST_FILE_FAN_OUT, 1),
+        )
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        self._trim()
+        return job
+
+    def submit_reprocess(self, filters: ReprocessFilter) -> ReprocessJob:
+        """Queues a reprocessing run; raises asyncio.QueueFull like `submit`."""
+        job = ReprocessJob(filters)
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        self._trim()
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | ReprocessJob | None:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[IngestionJob | ReprocessJob]:
+        return list(self._jobs.values())
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestionJob | ReprocessJob):
+        if isinstance(job, ReprocessJob):
+            await self._run_reprocess(job)
+            return
+        if job.paths is not None:
+            await self._run_many(job)
+            return
+
+        job.status = JobStatus.RUNNING
+        job.stats = IngestionStats(job.source_type, job.source_path)
+        try:
+            async with self._session_factory() as db:
+                await self._orchestrator.execute(
+                    db=db,
+                    source_type=job.source_type,
+                    source_path=job.source_path,
+                    parallel=job.parallel,
+                    resume=job.resume,
+                    stats=job.stats,
+                )
+            job.status = JobStatus.SUCCEEDED
+        except (ValueError, OSError) as exc:
+            job.status, job.error = JobStatus.FAILED, str(exc)
+            logger.warning("Ingestion job %s failed: %s", job.id, exc)
+        except Exception:
+            job.status, job.error = JobStatus.FAILED, "Internal error during ingestion"
+            logger.exception("Unexpected error in ingestion job %s", job.id)
+        finally:
+            job.stats.finished_at = job.stats.finished_at or time.monotonic()
+
+    async def _run_many(self, job: IngestionJob):
+        job.status = JobStatus.RUNNING
+        pending = iter(job.paths)
+
+        async def ingest_files(pool):
+            # `pending` is shared: each of the fan_out tasks takes the next file
+            for path in pending:
+                stats = IngestionStats(job.source_type, path)
+                job.files.append(stats)
+                try:
+                    async with self._session_factory() as db:
+                        await self._orchestrator.execute(
+                            db=db,
+                            source_type=job.source_type,
+                            source_path=path,
+                            parallel=job.parallel,
+                            resume=job.resume,
+                            stats=stats,
+                            pool=pool,
+                        )
+                except (ValueError, OSError) as exc:
+                    job.file_errors[path] = str(exc)
+                    logger.warning("Ingestion of %s in job %s failed: %s", path, job.id, exc)
+                except Exception:
+                    job.file_errors[path] = "Internal error during ingestion"
+                    logger.exception("Unexpected error ingesting %s in job %s", path, job.id)
+                finally:
+                    stats.finished_at = stats.finished_at or time.monotonic()
+
+        fan_out = min(job.fan_out, len(job.paths))
+        shared = parallel_ingest.create_pool(parallel_ingest.worker_count()) if job.parallel else nullcontext()
+        with shared as pool:
+            await asyncio.gather(*(ingest_files(pool) for _ in range(fan_out)))
+        if job.file_errors:
+            job.status = JobStatus.FAILED
+            job.error = f"{len(job.file_errors)} of {len(job.paths)} files failed"
+        else:
+            job.status = JobStatus.SUCCEEDED
+        logger.info("Job %s ingested %d files (%d failed)", job.id, len(job.paths), len(job.file_errors))
+
+    async def _run_reprocess(self, job: ReprocessJob):
+        job.status = JobStatus.RUNNING
+        job.stats = ReprocessStats(job.filters)
+        try:
+            async with self._session_factory() as db:
+                await Reprocessor().run(db, job.filters, job.stats)
+            job.status = JobStatus.SUCCEEDED
+        except Exception:
+            job.status, job.error = JobStatus.FAILED, "Internal error during reprocessing"
+            logger.exception("Unexpected error in reprocessing job %s", job.id)
+        finally:
+            job.stats.finished_at = job.stats.finished_at or time.monotonic()
+
+    def _trim(self):
+        finished = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+        excess = len(self._jobs) - self.history
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in finished][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+
+job_scheduler = JobScheduler(settings.INGEST_CONCURRENCY, settings.INGEST_QUEUE_SIZE)
@@ -1,16 +1,32 @@
+"""
+Kafka Worker
+------------
+Consumes the Kafka topic in micro-batches: records are pulled with
+getmany() until KAFKA_BATCH_SIZE records or KAFKA_BATCH_LATENCY_MS elapse,
+the batch is validated and persisted in one transaction, and offsets are
+committed once per batch after the DB commit (at-least-once delivery).
+
+Example usage (no broker needed):
+    consumer = LocalKafkaConsumer(KafkaIngestor(interval=0), limit=100_000)
+    worker = KafkaWorker(consumer=consumer)
+    await worker.start()
+"""
 import logging
 import json
 import asyncio
 from aiokafka import AIOKafkaConsumer
+from aiokafka.structs import TopicPartition
 from app.core.orchestrator import DataOrchestrator
 from app.models.database import async_session_factory
 from app.core.config import settings
+from app.core.metrics import KAFKA_LAG
 
 logger = logging.getLogger(__name__)
 
 class KafkaWorker:
-    def __init__(self):
-        self.consumer = AIOKafkaConsumer(
+    def __init__(self, consumer=None):
+        # Any object exposing start/stop/getmany/commit works, e.g. LocalKafkaConsumer
+        self.consumer = consumer or AIOKafkaConsumer(
             settings.KAFKA_TOPIC,
             bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
             group_id=settings.KAFKA_GROUP_ID,
@@ -27,22 +43,61 @@ class KafkaWorker:
         self._task = asyncio.create_task(self._consume())
         logger.info("Kafka worker started")
 
+    async def _next_batch(self) -> list:
+        """
+        Pulls messages until the size bound or the latency bound is reached.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.KAFKA_BATCH_LATENCY_MS / 1000
+        messages = []
+
+        while self._running and len(messages) < settings.KAFKA_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            fetched = await self.consumer.getmany(
+                timeout_ms=int(remaining * 1000),
+                max_records=settings.KAFKA_BATCH_SIZE - len(messages),
+            )
+            for partition_messages in fetched.values():
+                messages.extend(partition_messages)
+
+        return messages
+
     async def _consume(self):
         try:
-            async for message in self.consumer:
+            while self._running:
+                messages = await self._next_batch()
+                if not messages:
+                    continue
+
                 async with async_session_factory() as db:
-                    await self.orchestrator.process(
+                    await self.orchestrator.process_batch(
                         db=db,
-                        raw_data=message.value,
+                        records=[message.value for message in messages],
                         source_type="kafka",
-                        source_ref=message.topic,
+                        source_ref=messages[0].topic,
                     )
 
+                # Only acknowledge once the whole batch is committed to the DB
                 await self.consumer.commit()
+                self._record_lag(messages)
         except Exception as e:
             logger.exception("Kafka worker crashed: %s", e)
 
+    def _record_lag(self, messages: list):
+        """Lag per partition: high watermark minus the next offset to consume."""
+        last_offsets = {}
+        for message in messages:
+            last_offsets[TopicPartition(message.topic, message.partition)] = message.offset
+        for partition, offset in last_offsets.items():
+            highwater = self.consumer.highwater(partition)
+            if highwater is not None:
+                KAFKA_LAG.set(max(highwater - offset - 1, 0), topic=partition.topic, partition=partition.partition)
+
     async def stop(self):
         self._running = False
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
         await self.consumer.stop()
         logger.info("Kafka worker stopped")
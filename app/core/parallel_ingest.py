@@ -0,0 +1,110 @@
+"""
+Parallel CSV Ingestion
+----------------------
+Splits a CSV file into newline-aligned byte ranges that are parsed and
+validated in a ProcessPoolExecutor. Each worker returns a validated
+columnar chunk; a single writer coroutine in the orchestrator persists them
+in file order, so SQLite only ever sees one writer.
+
+Workers are spawned and import their own settings, so the validation
+rules in effect in the parent (ALLOWED_CURRENCIES, VALIDATION_MODE) are
+passed along with every range.
+
+Limitation: ranges are cut on raw newlines, so quoted fields containing
+line breaks must use the sequential ingestor.
+Example usage:
+    ranges = split_ranges("large.csv", settings.PARALLEL_RANGE_BYTES)
+    chunk = process_range("large.csv", *ranges[0], fieldnames, "csv", settings.ALLOWED_CURRENCIES)
+"""
+import csv
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.batch_validator import BatchValidator, malformed_errors
+from app.core.config import settings
+from app.crud.raw_store import encode_payload
+from app.ingestors.block_reader import parse_csv_columns
+
+
+def worker_count() -> int:
+    """INGEST_WORKERS, or one worker per CPU when left at 0."""
+    return settings.INGEST_WORKERS or os.cpu_count() or 1
+
+
+def create_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn: forking an event loop that owns DB driver threads is not safe
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def read_header(path: str) -> tuple[list[str], int]:
+    """Returns the CSV field names and the byte offset where data starts."""
+    with open(path, "rb") as f:
+        header = f.readline()
+    fieldnames = next(csv.reader([header.decode("utf-8")]), [])
+    return [name.strip() for name in fieldnames], len(header)
+
+
+def split_ranges(path: str, range_bytes: int, start: int = 0) -> list[tuple[int, int]]:
+    """
+    Cuts [start, EOF) into ranges of roughly `range_bytes`, each ending just
+    after a newline so no line straddles two ranges.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        while start < size:
+            end = min(start + range_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def process_range(
+    path: str,
+    start: int,
+    end: int,
+    fieldnames: list[str],
+    source_type: str,
+    allowed_currencies: list[str],
+    validation_mode: str = "batch",
+) -> dict:
+    """
+    Worker entry point: parse and validate one byte range against the
+    caller's `allowed_currencies` and `validation_mode` (see VALIDATION_MODE).
+    Returns the valid raw rows (as JSON text), their validated columns and
+    the error rows.
+    """
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        f.seek(start)
+        block = f.read(end - start)
+
+    records = block.split(b"\n")
+    if records and not records[-1]:
+        records.pop()
+    batch = parse_csv_columns(records, fieldnames)
+    parsed = time.perf_counter()
+    validator = BatchValidator(allowed_currencies=allowed_currencies)
+    if validation_mode == "row":
+        result = validator.validate_rows(batch.rows(), source_type, path)
+    else:
+        result = validator.validate_batch(batch, source_type, path)
+
+    return {
+        "end": end,
+        "lines": block.count(b"\n") + (1 if block and not block.endswith(b"\n") else 0),
+        "parse_seconds": parsed - started,
+        "validate_seconds": time.perf_counter() - parsed,
+        "rows": batch.size,
+        # encoded here, off the writer, exactly as the sequential path stores it
+        "raw": [encode_payload(row) for row in batch.iter_rows(result.valid_mask)],
+        "columns": result.columns,
+        "errors": malformed_errors(batch.malformed, source_type, path) + result.errors,
+    }
+
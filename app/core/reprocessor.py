@@ -0,0 +1,247 @@
+"""
+Error Reprocessing
+------------------
+Re-validates stored validation failures after a rule change (e.g. JPY added
+to ALLOWED_CURRENCIES) and promotes the records that now pass, without
+re-ingesting their source files. Only ingestion_errors can hold such
+records: RawData is written for rows that already passed.
+
+`ReprocessFilter` narrows the run to the rows the changed rule can affect,
+first in SQL (source type, error_fields / error_code, a raw_content match on
+the currency) and then exactly on the parsed record. Malformed records (the
+parser could not read them) are never retried.
+
+Error rows are read in keyset pages of REPROCESS_BATCH_SIZE from the read
+pool. Each page is parsed (raw_content holds the record's repr) and run
+through BatchValidator in a worker process, a bounded number of pages in
+flight, while this coroutine writes them back in id order. Each page is one
+transaction (see storage.promote_error_rows): RawData + ProcessedData +
+rollups for the records that now pass, and their error rows deleted.
+Records whose external_id is already stored only have their error row
+removed. Rows that still fail are left as they are.
+
+Example usage:
+    stats = await Reprocessor().run(db, ReprocessFilter(currency="JPY"))
+    python -m app.core.reprocessor --currency JPY
+"""
+import argparse
+import ast
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from itertools import compress
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import parallel_ingest
+from app.core.batch_validator import MALFORMED_RECORD, BatchValidator
+from app.core.config import settings
+from app.core.dedup import seen_external_ids
+from app.core.metrics import ROWS_TOTAL, STAGE_SECONDS
+from app.crud.storage import error_table, promote_error_rows
+from app.models.database import read_session_factory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ReprocessFilter:
+    """
+    Error rows to retry; unset fields match everything.
+    - currency: records carrying this currency (a missing currency is USD)
+    - field / code: an entry of the row's error_fields / error_code,
+      e.g. "currency" / "value_error"
+    - after_id: only error ids greater than this (resume a stopped run)
+    """
+    source: str | None = None
+    currency: str | None = None
+    field: str | None = None
+    code: str | None = None
+    after_id: int = 0
+
+    def conditions(self) -> list:
+        columns = error_table.c
+        # rows written before error_code existed carry the details in error_message only
+        conditions = [or_(columns.error_code.is_(None), columns.error_code != MALFORMED_RECORD)]
+        if self.source:
+            conditions.append(columns.source_type == self.source)
+        if self.currency:
+            conditions.append(columns.raw_content.icontains(self.currency, autoescape=True))
+        for value, detail in ((self.field, columns.error_fields), (self.code, columns.error_code)):
+            if value:
+                conditions.append(or_(
+                    detail.contains(value, autoescape=True),
+                    and_(detail.is_(None), columns.error_message.contains(value, autoescape=True)),
+                ))
+        return conditions
+
+
+@dataclass
+class ReprocessStats:
+    """Live progress of a reprocessing run, updated after every committed page."""
+    filters: ReprocessFilter
+    scanned: int = 0
+    promoted: int = 0
+    duplicate_count: int = 0
+    still_failing: int = 0
+    # matched the SQL filter only, or raw_content is not a record
+    skipped: int = 0
+    last_id: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    def as_dict(self) -> dict:
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "filters": asdict(self.filters),
+            "scanned": self.scanned,
+            "promoted": self.promoted,
+            "duplicate_count": self.duplicate_count,
+            "still_failing": self.still_failing,
+            "skipped": self.skipped,
+            "last_id": self.last_id,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.scanned / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+def revalidate_page(rows: list[tuple], currency: str | None, allowed: list[str]) -> dict:
+    """
+    Worker entry point: parse and re-validate one page of error rows
+    (id, source_type, raw_content) against the caller's `allowed` currencies.
+    Returns the ids and sources of the rows that now pass, their raw
+    records and validated columns (aligned), and per-outcome counts.
+    """
+    started = time.perf_counter()
+    ids, sources, records = [], [], []
+    skipped = 0
+    for error_id, source_type, raw_content in rows:
+        try:
+            record = ast.literal_eval(raw_content or "")
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            record = None
+        if not isinstance(record, dict) or (
+            currency and str(record.get("currency", "USD")).upper() != currency
+        ):
+            skipped += 1
+            continue
+        ids.append(error_id)
+        sources.append(source_type)
+        records.append(record)
+
+    result = BatchValidator(allowed_currencies=allowed).validate(records, "reprocess", None)
+    valid = result.valid_mask
+    return {
+        "last_id": rows[-1][0],
+        "rows": len(rows),
+        "skipped": skipped,
+        "still_failing": result.error_count,
+        "ids": list(compress(ids, valid)),
+        "sources": list(compress(sources, valid)),
+        "raw": list(compress(records, valid)),
+        "columns": result.columns,
+        "validate_seconds": time.perf_counter() - started,
+    }
+
+
+class Reprocessor:
+    """
+    Retries the validation of stored error rows matching a ReprocessFilter
+    and promotes the ones that pass. Writes go through `db` (or the write
+    coordinator while it runs); pages are read on `session_factory`.
+    """
+    def __init__(self, batch_size: int = settings.REPROCESS_BATCH_SIZE, session_factory=read_session_factory):
+        self.batch_size = batch_size
+        self._session_factory = session_factory
+
+    async def run(
+        self,
+        db: AsyncSession,
+        filters: ReprocessFilter,
+        stats: ReprocessStats | None = None,
+    ) -> ReprocessStats:
+        stats = stats or ReprocessStats(filters)
+        stats.last_id = after_id = filters.after_id
+        currency = filters.currency.upper() if filters.currency else None
+        allowed = list(settings.ALLOWED_CURRENCIES)
+        workers = parallel_ingest.worker_count()
+        loop = asyncio.get_running_loop()
+        pending = deque()
+
+        with parallel_ingest.create_pool(workers) as pool:
+            while True:
+                rows = await self._page(filters, after_id)
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                if len(pending) >= 2 * workers:
+                    await self._promote(db, await pending.popleft(), stats)
+                pending.append(loop.run_in_executor(pool, revalidate_page, rows, currency, allowed))
+
+            while pending:
+                await self._promote(db, await pending.popleft(), stats)
+
+        stats.finished_at = time.monotonic()
+        logger.info(
+            "Reprocessed %d error rows: %d promoted, %d duplicates, %d still failing",
+            stats.scanned, stats.promoted, stats.duplicate_count, stats.still_failing,
+        )
+        return stats
+
+    async def _page(self, filters: ReprocessFilter, after_id: int) -> list[tuple]:
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(error_table.c.id, error_table.c.source_type, error_table.c.raw_content)
+                .where(error_table.c.id > after_id, *filters.conditions())
+                .order_by(error_table.c.id)
+                .limit(self.batch_size)
+            )
+            return [tuple(row) for row in result]
+
+    async def _promote(self, db: AsyncSession, page: dict, stats: ReprocessStats):
+        STAGE_SECONDS.observe(page["validate_seconds"], stage="validate", source_type="reprocess")
+        promoted = duplicates = 0
+        if page["ids"]:
+            columns = page["columns"]
+            keep = seen_external_ids.new_mask(columns["external_id"])
+            raw_rows = list(compress(page["raw"], keep))
+            kept = {name: list(compress(values, keep)) for name, values in columns.items()}
+
+            rejected = await promote_error_rows(
+                db, page["ids"], page["sources"], list(compress(page["sources"], keep)), raw_rows, kept,
+            )
+            seen_external_ids.add(kept["external_id"])
+            promoted = len(raw_rows) - rejected
+            duplicates = keep.count(False) + rejected
+            ROWS_TOTAL.inc(promoted, source_type="reprocess", outcome="valid")
+            ROWS_TOTAL.inc(duplicates, source_type="reprocess", outcome="duplicate")
+
+        stats.scanned += page["rows"]
+        stats.promoted += promoted
+        stats.duplicate_count += duplicates
+        stats.still_failing += page["still_failing"]
+        stats.skipped += page["skipped"]
+        stats.last_id = page["last_id"]
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from app.models.database import async_session_factory, init_db
+
+    await init_db()
+    filters = ReprocessFilter(args.source, args.currency, args.field, args.code, args.after_id)
+    async with async_session_factory() as db:
+        stats = await Reprocessor().run(db, filters)
+    print(stats.as_dict())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-validate stored error rows and promote the ones that now pass")
+    parser.add_argument("--source", help="source type, e.g. csv")
+    parser.add_argument("--currency", help="only records in this currency, e.g. JPY")
+    parser.add_argument("--field", help="only errors on this field, e.g. currency")
+    parser.add_argument("--code", help="only errors of this type, e.g. value_error")
+    parser.add_argument("--after-id", type=int, default=0, help="resume after this error id")
+    asyncio.run(_main(parser.parse_args()))
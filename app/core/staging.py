@@ -0,0 +1,145 @@
+"""
+Staging Buffers
+---------------
+Compact holding area for validated chunks between the pipeline's
+validation thread and the writer (see DataOrchestrator._execute_sequential).
+Per valid record a staged chunk keeps:
+- amount in an array('d') and timestamp as int64 microseconds (array('q'))
+- currency and source_channel interned (a handful of distinct values)
+- external_id, and the raw record already encoded as JSON text
+  (raw_store.encode_payload), written to RawData.payload as is: no dict
+  per record survives validation
+and per rejected record a __slots__ StagedError, whose message is dropped
+up front in compact storage mode (where it would never be written).
+
+Buffers are allocated once, at BATCH_SIZE capacity, and recycled through a
+StagingPool, so staging a chunk overwrites the previous one in place; the
+pool size also caps how many chunks are staged at once. The writer inserts
+a staged chunk in INSERT_CHUNK_ROWS slices (storage.save_staged_batch), so
+row parameters exist for one slice at a time.
+
+Example usage:
+    pool = StagingPool(capacity=settings.BATCH_SIZE, buffers=4)
+    buffer = await pool.acquire()
+    buffer.stage(batch, result, errors)     # worker thread
+    await save_staged_batch(db, "csv", buffer)
+    pool.release(buffer)
+"""
+import asyncio
+import sys
+from array import array
+
+import numpy as np
+
+from app.core.batch_validator import BatchResult
+from app.crud.raw_store import compact_enabled, encode_payload
+from app.ingestors.base_ingestor import ColumnBatch
+
+
+class StagedError:
+    """One rejected record, in the IngestionError shape of `malformed_errors` / BatchValidator."""
+    __slots__ = ("source_type", "source_path", "raw_content", "error_message", "error_code", "error_fields")
+
+    def __init__(self, error: dict, keep_message: bool = True):
+        self.source_type = error["source_type"]
+        self.source_path = error["source_path"]
+        self.raw_content = error["raw_content"]
+        self.error_code = error.get("error_code")
+        self.error_fields = error.get("error_fields")
+        # compact mode stores field-level failures as codes only (see storage._insert_error_rows)
+        keep_message = keep_message or not self.error_fields
+        self.error_message = error["error_message"] if keep_message else None
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class StagingBuffer:
+    """
+    Fixed-capacity columns of one validated chunk; `size` records are valid.
+    Reused: `stage` overwrites in place, `clear` drops the references.
+    """
+    __slots__ = (
+        "capacity", "size", "external_ids", "currencies", "channels", "payloads", "amounts", "timestamps",
+        "errors", "_amounts", "_timestamps",
+    )
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0
+        self.external_ids: list = [None] * capacity
+        self.currencies: list = [None] * capacity
+        self.channels: list = [None] * capacity
+        self.payloads: list = [None] * capacity
+        self.amounts = array("d", bytes(8 * capacity))
+        self.timestamps = array("q", bytes(8 * capacity))
+        self.errors: list[StagedError] = []
+        # NumPy views over the arrays, for vectorised fills and reads
+        self._amounts = np.frombuffer(self.amounts, dtype=np.float64)
+        self._timestamps = np.frombuffer(self.timestamps, dtype="datetime64[us]")
+
+    def stage(self, batch: ColumnBatch, result: BatchResult, errors: list[dict]) -> None:
+        """
+        Replaces the buffer's contents with a validated chunk: `result` from
+        validating `batch`, `errors` every rejected record of it.
+        """
+        size = result.valid_count
+        if size > self.capacity:
+            raise ValueError(f"Chunk of {size} valid records exceeds the staging capacity {self.capacity}")
+        self.clear()
+
+        columns = result.columns
+        self.external_ids[:size] = columns["external_id"]
+        self.currencies[:size] = map(sys.intern, columns["currency"])
+        self.channels[:size] = map(sys.intern, columns["source_channel"])
+        self.payloads[:size] = map(encode_payload, batch.iter_rows(result.valid_mask))
+        self._amounts[:size] = columns["amount"]
+        # validated timestamps are naive (DataRecord compares them with datetime.now())
+        self._timestamps[:size] = np.array(columns["timestamp"], dtype="datetime64[us]")
+        keep_message = not compact_enabled()
+        self.errors = [StagedError(error, keep_message) for error in errors]
+        self.size = size
+
+    def keep(self, mask: list[bool]) -> None:
+        """Drops the staged records where `mask` is false (e.g. known duplicates), in place."""
+        index = np.flatnonzero(mask)
+        kept = len(index)
+        for values in (self.external_ids, self.currencies, self.channels, self.payloads):
+            values[:kept] = [values[i] for i in index]
+            values[kept:self.size] = [None] * (self.size - kept)
+        self._amounts[:kept] = self._amounts[index]
+        self._timestamps[:kept] = self._timestamps[index]
+        self.size = kept
+
+    def columns(self, start: int = 0, stop: int | None = None) -> dict[str, list]:
+        """Validated columns of records [start, stop), as storage takes them."""
+        stop = self.size if stop is None else min(stop, self.size)
+        return {
+            "external_id": self.external_ids[start:stop],
+            "amount": self._amounts[start:stop].tolist(),
+            "currency": self.currencies[start:stop],
+            "source_channel": self.channels[start:stop],
+            "timestamp": self._timestamps[start:stop].tolist(),
+        }
+
+    def clear(self) -> None:
+        for values in (self.external_ids, self.currencies, self.channels, self.payloads):
+            values[:self.size] = [None] * self.size
+        self.errors = []
+        self.size = 0
+
+
+class StagingPool:
+    """A fixed set of StagingBuffers; `acquire` waits while all of them are in use."""
+    def __init__(self, capacity: int, buffers: int):
+        self._free: asyncio.Queue[StagingBuffer] = asyncio.Queue()
+        for _ in range(max(buffers, 1)):
+            self._free.put_nowait(StagingBuffer(capacity))
+
+    async def acquire(self) -> StagingBuffer:
+        return await self._free.get()
+
+    def release(self, buffer: StagingBuffer) -> None:
+        buffer.clear()
+        self._free.put_nowait(buffer)
+
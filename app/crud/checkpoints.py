@@ -0,0 +1,91 @@
+"""
+Ingestion checkpoints
+---------------------
+Resume points for file ingestion (IngestionCheckpoint). Storage writes the
+checkpoint of a chunk inside that chunk's transaction, so the recorded
+offset never runs ahead of (or behind) the rows actually committed; a retry
+of the same file continues from there.
+
+Completed checkpoints also serve as the manifest of ingested files:
+`find_completed` matches path, size and mtime, so re-scanning a directory
+of already ingested files costs one stat and one index lookup per file.
+
+Example usage:
+    identity = file_identity("large.csv")
+    checkpoint = await load_checkpoint(db, "csv", identity)
+"""
+import hashlib
+import os
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.rollups import upsert_insert
+from app.models.models import IngestionCheckpoint
+
+checkpoint_table = IngestionCheckpoint.__table__
+
+# bytes hashed from each end of the file
+IDENTITY_SAMPLE = 64 * 1024
+
+
+def file_identity(path: str) -> str:
+    """
+    Size plus a hash of the first and last 64 KiB: cheap on multi-GB files,
+    and changes when the file is replaced, truncated or appended to.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(IDENTITY_SAMPLE))
+        if size > IDENTITY_SAMPLE:
+            f.seek(max(size - IDENTITY_SAMPLE, IDENTITY_SAMPLE))
+            digest.update(f.read(IDENTITY_SAMPLE))
+    return f"{size}:{digest.hexdigest()}"
+
+
+async def load_checkpoint(db: AsyncSession, source_type: str, identity: str) -> IngestionCheckpoint | None:
+    result = await db.execute(
+        select(IngestionCheckpoint).where(
+            IngestionCheckpoint.source_type == source_type,
+            IngestionCheckpoint.file_identity == identity,
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+async def find_completed(
+    db: AsyncSession, source_type: str, source_path: str, size: int, mtime: float
+) -> IngestionCheckpoint | None:
+    """The completed checkpoint of this exact path, size and mtime, if any."""
+    result = await db.execute(
+        select(IngestionCheckpoint).where(
+            IngestionCheckpoint.source_type == source_type,
+            IngestionCheckpoint.source_path == source_path,
+            IngestionCheckpoint.file_size == size,
+            IngestionCheckpoint.file_mtime == mtime,
+            IngestionCheckpoint.completed.is_(True),
+        ).limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def save_checkpoint(db: AsyncSession, checkpoint: dict) -> None:
+    """
+    Upserts a checkpoint within the caller's transaction. `checkpoint` holds
+    source_type, file_identity, source_path, byte_offset, line_number and
+    optionally completed, file_size and file_mtime.
+    """
+    values = {"completed": False, "file_size": None, "file_mtime": None, **checkpoint, "updated_at": datetime.now()}
+    stmt = upsert_insert(db, checkpoint_table).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[checkpoint_table.c.source_type, checkpoint_table.c.file_identity],
+        set_={
+            name: stmt.excluded[name]
+            for name in (
+                "source_path", "file_size", "file_mtime", "byte_offset", "line_number", "completed", "updated_at",
+            )
+        },
+    )
+    await db.execute(stmt)
@@ -0,0 +1,116 @@
+"""
+Compact raw payload storage
+---------------------------
+With RAW_STORAGE_MODE=compact, the raw payloads of a batch are written as
+one compressed block (RawBlock: a JSON array compressed with zlib, or zstd
+when the optional `zstandard` package is installed). Each RawData row then
+only carries (block_id, block_index) and a JSON null payload instead of
+its own JSON document, which removes most of the table's size and write I/O.
+
+`load_payloads` decodes both layouts, so audit and export code never needs
+to know how a row was stored.
+
+Example usage:
+    payloads = await load_payloads(db, [1, 2, 3])   # {raw_id: dict}
+"""
+import asyncio
+import json
+import logging
+import zlib
+from functools import lru_cache
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.models import RawBlock, RawData
+
+logger = logging.getLogger(__name__)
+
+raw_block_table = RawBlock.__table__
+raw_table = RawData.__table__
+
+COMPACT = "compact"
+
+
+def compact_enabled() -> bool:
+    return settings.RAW_STORAGE_MODE == COMPACT
+
+
+@lru_cache(maxsize=1)
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def block_codec() -> str:
+    """RAW_CODEC, falling back to zlib when zstd is asked for but unavailable."""
+    if settings.RAW_CODEC == "zstd" and _zstd() is None:
+        logger.warning("RAW_CODEC=zstd but the zstandard package is not installed; using zlib")
+        return "zlib"
+    return settings.RAW_CODEC
+
+
+# The one encoding of a raw payload, whichever path stores it (sequential,
+# parallel, Kafka, reprocessing; row or block layout): compact separators,
+# values JSON cannot represent as their str().
+encode_payload = json.JSONEncoder(separators=(",", ":"), default=str).encode
+
+
+def encode_block(payloads: list[dict] | list[str], codec: str) -> bytes:
+    """`payloads`: records, or records already encoded with `encode_payload`."""
+    if payloads and not isinstance(payloads[0], str):
+        payloads = [encode_payload(payload) for payload in payloads]
+    data = ("[" + ",".join(payloads) + "]").encode()
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decode_block(data: bytes, codec: str) -> list[dict]:
+    if codec == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("Decoding zstd raw blocks needs the zstandard package")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+async def insert_block(db: AsyncSession, source: str, payloads: list[dict] | list[str]) -> int:
+    """Compresses `payloads` off the event loop and stores them as one block."""
+    codec = block_codec()
+    data = await asyncio.to_thread(encode_block, payloads, codec)
+    result = await db.execute(
+        insert(raw_block_table).values(source=source, codec=codec, record_count=len(payloads), data=data)
+    )
+    return result.inserted_primary_key[0]
+
+
+async def load_payloads(db: AsyncSession, raw_ids: list[int]) -> dict[int, dict]:
+    """
+    Raw payloads by RawData id, whichever layout they were stored in.
+    Each referenced block is fetched and decompressed once.
+    """
+    rows = (await db.execute(
+        select(raw_table.c.id, raw_table.c.payload, raw_table.c.block_id, raw_table.c.block_index)
+        .where(raw_table.c.id.in_(raw_ids))
+    )).all()
+
+    payloads = {row.id: row.payload for row in rows if row.block_id is None}
+    block_ids = {row.block_id for row in rows if row.block_id is not None}
+    if block_ids:
+        blocks = {}
+        for block in (await db.execute(
+            select(raw_block_table.c.id, raw_block_table.c.codec, raw_block_table.c.data)
+            .where(raw_block_table.c.id.in_(block_ids))
+        )).all():
+            blocks[block.id] = await asyncio.to_thread(decode_block, block.data, block.codec)
+        for row in rows:
+            if row.block_id is not None:
+                payloads[row.id] = blocks[row.block_id][row.block_index]
+    return payloads
@@ -0,0 +1,270 @@
+"""
+Ingestion rollups
+-----------------
+Incrementally maintained success/failure counters (IngestionRollup) that
+make /summary O(1). Storage calls `add_counts` inside each batch
+transaction; `rebuild_rollups` recomputes everything from the base tables.
+
+HourlyRollup holds amount count/sum/min/max per hour, source type, currency
+and channel for /aggregate. Storage calls `add_hourly` with each batch's
+inserted columns; the batch is grouped with one vectorised pandas groupby.
+A watermark (the highest processed_data id folded in) lets startup catch up
+on records stored while HOURLY_ROLLUPS_ENABLED was off.
+
+Usage:
+    python -m app.crud.rollups rebuild
+"""
+import asyncio
+import sys
+from collections import Counter
+
+import pandas as pd
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.models import (
+    HourlyRollup, IngestionError, IngestionRollup, ProcessedData, RawData, RollupWatermark,
+)
+
+rollup_table = IngestionRollup.__table__
+hourly_table = HourlyRollup.__table__
+watermark_table = RollupWatermark.__table__
+HOURLY = "hourly"
+FAILURE_CURRENCY = ""
+# rows per partition when rebuilding hourly rollups from processed_data
+REBUILD_CHUNK_SIZE = 100_000
+
+
+def upsert_insert(db: AsyncSession, table):
+    """Dialect-specific INSERT that supports ON CONFLICT clauses."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def add_counts(
+    db: AsyncSession,
+    successes: Counter | None = None,
+    failures: Counter | None = None,
+) -> None:
+    """
+    Adds to the counters within the caller's transaction.
+    - successes: Counter keyed by (source_type, currency)
+    - failures: Counter keyed by source_type
+    """
+    params = [
+        {"source_type": source, "currency": currency, "success_count": count, "failure_count": 0}
+        for (source, currency), count in (successes or {}).items()
+    ] + [
+        {"source_type": source, "currency": FAILURE_CURRENCY, "success_count": 0, "failure_count": count}
+        for source, count in (failures or {}).items()
+    ]
+    if not params:
+        return
+
+    stmt = upsert_insert(db, rollup_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[rollup_table.c.source_type, rollup_table.c.currency],
+        set_={
+            "success_count": rollup_table.c.success_count + stmt.excluded.success_count,
+            "failure_count": rollup_table.c.failure_count + stmt.excluded.failure_count,
+        },
+    )
+    await db.execute(stmt, params)
+
+
+async def add_hourly(
+    db: AsyncSession,
+    source_types: list[str],
+    currencies: list[str],
+    channels: list[str],
+    timestamps: list,
+    amounts: list[float],
+) -> None:
+    """
+    Folds aligned columns of newly inserted records into hourly_rollups
+    within the caller's transaction and moves the watermark up to them.
+    No-op unless HOURLY_ROLLUPS_ENABLED.
+    """
+    if not settings.HOURLY_ROLLUPS_ENABLED:
+        return
+    await _advance_watermark(db)
+    if not amounts:
+        return
+
+    frame = pd.DataFrame({
+        "hour": pd.DatetimeIndex(timestamps).floor("h"),
+        "source_type": source_types,
+        "currency": currencies,
+        "source_channel": channels,
+        "amount": pd.to_numeric(pd.Series(amounts), errors="coerce"),
+    }).dropna(subset=["hour"])
+    grouped = frame.groupby(["hour", "source_type", "currency", "source_channel"], sort=False)["amount"].agg(
+        ["count", "sum", "min", "max"]
+    )
+    params = [
+        {
+            "hour": hour.to_pydatetime(),
+            "source_type": source,
+            "currency": currency,
+            "source_channel": channel,
+            "record_count": int(count),
+            "amount_sum": float(total),
+            "amount_min": float(low),
+            "amount_max": float(high),
+        }
+        for (hour, source, currency, channel), count, total, low, high in zip(
+            grouped.index, grouped["count"], grouped["sum"], grouped["min"], grouped["max"]
+        )
+    ]
+    if not params:
+        return
+
+    stmt = upsert_insert(db, hourly_table)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            hourly_table.c.hour, hourly_table.c.source_type, hourly_table.c.currency, hourly_table.c.source_channel,
+        ],
+        set_={
+            "record_count": hourly_table.c.record_count + excluded.record_count,
+            "amount_sum": hourly_table.c.amount_sum + excluded.amount_sum,
+            "amount_min": case(
+                (excluded.amount_min < hourly_table.c.amount_min, excluded.amount_min), else_=hourly_table.c.amount_min
+            ),
+            "amount_max": case(
+                (excluded.amount_max > hourly_table.c.amount_max, excluded.amount_max), else_=hourly_table.c.amount_max
+            ),
+        },
+    )
+    await db.execute(stmt, params)
+
+
+async def _advance_watermark(db: AsyncSession) -> None:
+    """Sets the hourly watermark to the highest processed_data id (an index lookup)."""
+    # pylint: disable=not-callable
+    stmt = upsert_insert(db, watermark_table).values(
+        rollup=HOURLY,
+        processed_id=select(func.coalesce(func.max(ProcessedData.id), 0)).scalar_subquery(),
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[watermark_table.c.rollup], set_={"processed_id": stmt.excluded.processed_id},
+    ))
+
+
+async def read_hourly_watermark(db: AsyncSession) -> int | None:
+    """The highest processed_data id folded into hourly_rollups; None if never built."""
+    return (await db.execute(
+        select(watermark_table.c.processed_id).where(watermark_table.c.rollup == HOURLY)
+    )).scalar()
+
+
+async def _fold_hourly(db: AsyncSession, after_id: int = 0) -> None:
+    """
+    Folds the timestamped processed_data rows above `after_id` into
+    hourly_rollups in REBUILD_CHUNK_SIZE-row partitions through `add_hourly`,
+    then commits with the watermark at the highest id.
+    """
+    result = await db.stream(
+        select(
+            RawData.source, ProcessedData.currency, ProcessedData.source_channel,
+            ProcessedData.timestamp, ProcessedData.amount,
+        )
+        .join(RawData, RawData.id == ProcessedData.raw_id)
+        .where(ProcessedData.id > after_id, ProcessedData.timestamp.is_not(None))
+        .execution_options(yield_per=REBUILD_CHUNK_SIZE)
+    )
+    async for rows in result.partitions():
+        sources, currencies, channels, timestamps, amounts = zip(*rows)
+        await add_hourly(db, list(sources), list(currencies), [channel or "" for channel in channels],
+                         list(timestamps), list(amounts))
+    await _advance_watermark(db)
+    await db.commit()
+
+
+async def rebuild_hourly_rollups(db: AsyncSession) -> None:
+    """
+    Recomputes hourly_rollups from processed_data in one transaction. Rows
+    without a timestamp (ingested before it was stored) are left out.
+    """
+    await db.execute(delete(hourly_table))
+    await _fold_hourly(db)
+
+
+async def rebuild_rollups(db: AsyncSession) -> None:
+    """
+    Recomputes every counter from processed_data / ingestion_errors in one
+    transaction. The DELETE runs first so the write lock is held while the
+    base tables are aggregated.
+    """
+    # pylint: disable=not-callable
+    await db.execute(delete(rollup_table))
+
+    successes = await db.execute(
+        select(RawData.source, ProcessedData.currency, func.count(ProcessedData.id))
+        .join(RawData, RawData.id == ProcessedData.raw_id)
+        .group_by(RawData.source, ProcessedData.currency)
+    )
+    failures = await db.execute(
+        select(IngestionError.source_type, func.count(IngestionError.id))
+        .group_by(IngestionError.source_type)
+    )
+    await add_counts(
+        db,
+        Counter({(source, currency): count for source, currency, count in successes}),
+        Counter({source or "": count for source, count in failures}),
+    )
+    await db.commit()
+
+
+async def ensure_rollups(db: AsyncSession) -> None:
+    """
+    Builds the rollups once for databases created before they existed
+    (empty rollup table, non-empty base tables), and folds the records
+    stored while HOURLY_ROLLUPS_ENABLED was off into hourly_rollups.
+    """
+    if settings.HOURLY_ROLLUPS_ENABLED:
+        watermark = await read_hourly_watermark(db)
+        # pylint: disable=not-callable
+        last_id = (await db.execute(select(func.max(ProcessedData.id)))).scalar() or 0
+        if watermark is None:
+            # built before the watermark existed, or never: start over
+            await rebuild_hourly_rollups(db)
+        elif watermark < last_id:
+            await _fold_hourly(db, after_id=watermark)
+
+    if (await db.execute(select(rollup_table.c.source_type).limit(1))).first():
+        return
+    has_data = (await db.execute(select(ProcessedData.id).limit(1))).first() or (
+        await db.execute(select(IngestionError.id).limit(1))
+    ).first()
+    if has_data:
+        await rebuild_rollups(db)
+
+
+async def read_rollups(db: AsyncSession) -> list:
+    return (await db.execute(select(rollup_table))).all()
+
+
+async def _main(command: str) -> None:
+    from app.models.database import async_session_factory, init_db
+
+    if command != "rebuild":
+        raise SystemExit(f"Unknown command {command!r}; expected 'rebuild'")
+    await init_db()
+    async with async_session_factory() as db:
+        await rebuild_rollups(db)
+        rows = await read_rollups(db)
+        if settings.HOURLY_ROLLUPS_ENABLED:
+            await rebuild_hourly_rollups(db)
+            # pylint: disable=not-callable
+            hourly = (await db.execute(select(func.count()).select_from(hourly_table))).scalar()
+    print(f"Rebuilt {len(rows)} rollup rows")
+    if settings.HOURLY_ROLLUPS_ENABLED:
+        print(f"Rebuilt {hourly} hourly rollup rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else "rebuild"))
@@ -1,59 +1,296 @@
+from collections import Counter
+from typing import Any
+from itertools import compress
+from sqlalchemy import Text, bindparam, cast, delete, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.models import ProcessedData, RawData, IngestionError
+from app.crud.rollups import add_counts, add_hourly, upsert_insert
+from app.crud.checkpoints import save_checkpoint
+from app.crud.raw_store import compact_enabled, encode_payload, insert_block
+from app.crud.write_coordinator import Work, write_coordinator
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+from app.core.staging import StagingBuffer
+
+# Core tables: batches are written with executemany, no ORM objects or
+# unit-of-work bookkeeping involved.
+raw_table = RawData.__table__
+processed_table = ProcessedData.__table__
+error_table = IngestionError.__table__
+
+
+async def _insert_error_rows(db: AsyncSession, error_data: list[dict]) -> None:
+    """
+    Adds a batch of validation failures to the current transaction.
+    In compact mode field-level failures keep only their error codes; the
+    export renders a message from them (see ReportExporter.error_query).
+    """
+    if not error_data:
+        return
+
+    compact = compact_enabled()
+    await db.execute(
+        insert(error_table),
+        [
+            {
+                "source_type": data["source_type"],
+                "source_path": data["source_path"],
+                "raw_content": data["raw_content"],
+                "error_message": None if compact and data.get("error_fields") else data["error_message"],
+                "error_code": data.get("error_code"),
+                "error_fields": data.get("error_fields"),
+            } for data in error_data
+        ],
+    )
+    await add_counts(db, failures=Counter(data["source_type"] or "" for data in error_data))
+
+
+async def _insert_ingestion_rows(db: AsyncSession, batch_data: list[dict]) -> int:
+    """
+    Adds RawData + ProcessedData for a batch to the current transaction.
+    Returns the number of records skipped as duplicate external_ids.
+    """
+    if not batch_data:
+        return 0
+
+    return await _insert_validated_columns(
+        db,
+        [item["type"] for item in batch_data],
+        [item["raw"] for item in batch_data],
+        {
+            name: [item["validated"][name] for item in batch_data]
+            for name in ("external_id", "amount", "currency", "source_channel", "timestamp")
+        },
+    )
+
+
+async def _insert_validated_columns(
+    db: AsyncSession,
+    sources: list[str],
+    raw_rows: list[dict] | list[str],
+    columns: dict[str, list],
+) -> int:
+    """
+    Columnar form of the 'Double Batch' insert: `raw_rows` and every list in
+    `columns` are aligned, one entry per valid record. `raw_rows` may hold
+    the records already encoded with raw_store.encode_payload (e.g. staged
+    chunks); dicts are encoded here, so every path stores the same text.
+
+    ProcessedData is inserted with ON CONFLICT DO NOTHING against the unique
+    external_id index; the RawData rows of records rejected there are removed
+    again. Returns the number of such duplicates.
+    """
+    if not raw_rows:
+        return 0
+
+    # 1. Insert Raw records and get their ids back without a flush
+    if not isinstance(raw_rows[0], str):
+        raw_rows = [encode_payload(raw) for raw in raw_rows]
+    if compact_enabled():
+        block_id = await insert_block(db, sources[0], raw_rows)
+        params = [
+            {"source": source, "payload_text": "null", "block_id": block_id, "block_index": i}
+            for i, source in enumerate(sources)
+        ]
+    else:
+        params = [{"source": source, "payload_text": raw} for source, raw in zip(sources, raw_rows)]
+    raw_ids = await _insert_raw_rows(db, params)
+
+    # 2. Insert Processed records linked to the new raw ids
+    result = await db.execute(
+        upsert_insert(db, processed_table).on_conflict_do_nothing(),
+        [
+            {
+                "raw_id": raw_id, "external_id": external_id, "amount": amount, "currency": currency,
+                "source_channel": source_channel, "timestamp": timestamp,
+            }
+            for raw_id, external_id, amount, currency, source_channel, timestamp in zip(
+                raw_ids, columns["external_id"], columns["amount"], columns["currency"],
+                columns["source_channel"], columns["timestamp"],
+            )
+        ],
+    )
+    inserted = [True] * len(raw_ids)
+    if result.rowcount != len(raw_ids):
+        inserted = await _drop_rejected_raw_rows(db, raw_ids)
+        sources = list(compress(sources, inserted))
+        columns = {name: list(compress(values, inserted)) for name, values in columns.items()}
+
+    await add_counts(db, successes=Counter(zip(sources, columns["currency"])))
+    await add_hourly(
+        db, sources, columns["currency"], columns["source_channel"], columns["timestamp"], columns["amount"]
+    )
+    return inserted.count(False)
+
+
+async def _drop_rejected_raw_rows(db: AsyncSession, raw_ids: list[int]) -> list[bool]:
+    """
+    Rare path (the dedup pre-filter missed a duplicate, e.g. two concurrent
+    jobs): finds the raw rows whose ProcessedData insert hit the unique
+    index, deletes them and returns the per-record inserted mask.
+    """
+    linked = processed_table.c.raw_id
+    if db.get_bind().dialect.name == "sqlite":
+        # raw_ids is a contiguous range there, see _insert_raw_rows
+        condition = linked.between(raw_ids[0], raw_ids[-1])
+    else:
+        condition = linked.in_(raw_ids)
+    found = set((await db.execute(select(linked).where(condition))).scalars())
+    inserted = [raw_id in found for raw_id in raw_ids]
+    await db.execute(
+        delete(raw_table).where(raw_table.c.id.in_([raw_id for raw_id in raw_ids if raw_id not in found]))
+    )
+    return inserted
+
+
+async def _insert_raw_rows(db: AsyncSession, params: list[dict]) -> list[int]:
+    """
+    Inserts RawData rows with one executemany and returns their ids in order.
+    Params carry the payload as "payload_text", JSON text bound as it is.
+
+    SQLite cannot order a batched RETURNING (SQLAlchemy would fall back to one
+    statement per row), so there the id range is read back instead: the first
+    INSERT takes the write lock until commit, and SQLite hands out rowids as
+    max(rowid) + 1, so the batch owns the contiguous range ending at max(id).
+    """
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    # the JSON type would encode the text once more
+    payload = bindparam("payload_text", type_=Text)
+    statement = insert(raw_table).values(payload=payload if sqlite else cast(payload, raw_table.c.payload.type))
+
+    if not sqlite:
+        result = await db.execute(
+            statement.returning(raw_table.c.id, sort_by_parameter_order=True),
+            params,
+        )
+        return result.scalars().all()
+
+    await db.execute(statement, params)
+    # pylint: disable=not-callable
+    last_id = (await db.execute(select(func.max(raw_table.c.id)))).scalar_one()
+    return list(range(last_id - len(params) + 1, last_id + 1))
+
+
+async def _commit(db: AsyncSession, source_type: str) -> None:
+    with STAGE_SECONDS.time(stage="commit", source_type=source_type):
+        await db.commit()
+
+
+async def _write(db: AsyncSession, source_type: str, work: Work) -> Any:
+    """
+    Runs `work(session)` (inserts only) in its own transaction and returns
+    its result once committed. While the write coordinator runs (the API
+    process) the batch goes through its single writer connection and may
+    share a commit with other batches; otherwise (scripts, CLI, benchmarks)
+    it runs on `db`.
+    """
+    if write_coordinator.running:
+        return await write_coordinator.submit(work, source_type)
+    with STAGE_SECONDS.time(stage="flush", source_type=source_type):
+        result = await work(db)
+    await _commit(db, source_type)
+    return result
+
 
 async def save_error_batch(db: AsyncSession, error_data: list[dict]):
     """
     Persists a batch of validation failures to the IngestionError table.
     """
+    source_type = error_data[0]["source_type"] if error_data else ""
+    await _write(db, source_type, lambda session: _insert_error_rows(session, error_data))
 
-    # Map the list of dictionaries to SQLAlchemy objects
-    objs = [
-        IngestionError(
-            source_type=data["source_type"],
-            source_path=data["source_path"],
-            raw_content=data["raw_content"],
-            error_message=data["error_message"]
-        ) for data in error_data
-    ]
-    
-    db.add_all(objs)
-    await db.commit()
-    # Important for your 100k test to prevent memory bloat
-    db.expunge_all()
 
-
-async def save_ingestion_batch(db: AsyncSession, batch_data: list[dict]):
+async def save_ingestion_batch(db: AsyncSession, batch_data: list[dict]) -> int:
     """
     Handles the 'Double Batch' insert:
-    1. Persist RawData to get IDs.
+    1. Persist RawData and get its IDs back (see `_insert_raw_rows`).
     2. Link IDs to ProcessedData and persist.
+    Both statements run in one transaction, committed once.
+    Returns the number of duplicate external_ids skipped.
+    """
+    source_type = batch_data[0]["type"] if batch_data else ""
+    return await _write(db, source_type, lambda session: _insert_ingestion_rows(session, batch_data))
+
+
+async def save_validated_batch(
+    db: AsyncSession,
+    source_type: str,
+    raw_rows: list[dict] | list[str],
+    columns: dict[str, list],
+    error_data: list[dict],
+    checkpoint: dict | None = None,
+) -> int:
+    """
+    Persists one validated chunk in a single transaction: the valid rows
+    (column-wise, see `_insert_validated_columns`), its validation failures
+    and, for file ingestion, the checkpoint just past the chunk.
+    Returns the number of duplicate external_ids skipped.
+    """
+    async def work(session: AsyncSession) -> int:
+        duplicates = await _insert_validated_columns(session, [source_type] * len(raw_rows), raw_rows, columns)
+        await _insert_error_rows(session, error_data)
+        if checkpoint is not None:
+            await save_checkpoint(session, checkpoint)
+        return duplicates
+
+    return await _write(db, source_type, work)
+
+
+async def save_staged_batch(
+    db: AsyncSession,
+    source_type: str,
+    staged: StagingBuffer,
+    checkpoint: dict | None = None,
+) -> int:
+    """
+    `save_validated_batch` for a staged chunk (app.core.staging). Its rows
+    are inserted INSERT_CHUNK_ROWS at a time, so statement parameters only
+    exist for one slice; the chunk is still one transaction.
+    Returns the number of duplicate external_ids skipped.
+    """
+    step = max(settings.INSERT_CHUNK_ROWS, 1)
+
+    async def work(session: AsyncSession) -> int:
+        duplicates = 0
+        for start in range(0, staged.size, step):
+            payloads = staged.payloads[start:min(start + step, staged.size)]
+            duplicates += await _insert_validated_columns(
+                session, [source_type] * len(payloads), payloads, staged.columns(start, start + step),
+            )
+        await _insert_error_rows(session, [error.as_dict() for error in staged.errors])
+        if checkpoint is not None:
+            await save_checkpoint(session, checkpoint)
+        return duplicates
+
+    return await _write(db, source_type, work)
+
+
+async def commit_checkpoint(db: AsyncSession, checkpoint: dict) -> None:
+    """Saves and commits a checkpoint on its own (e.g. marking a file completed)."""
+    await _write(db, checkpoint["source_type"], lambda session: save_checkpoint(session, checkpoint))
+
+
+async def promote_error_rows(
+    db: AsyncSession,
+    error_ids: list[int],
+    error_sources: list[str],
+    sources: list[str],
+    raw_rows: list[dict],
+    columns: dict[str, list],
+) -> int:
+    """
+    Reprocessing (app.core.reprocessor): in one transaction, persists the
+    records that now pass validation (column-wise, as `_insert_validated_columns`)
+    and deletes the error rows `error_ids` they came from, taking them off
+    the failure counters. `error_sources` aligns with `error_ids`; records
+    already stored are simply left out of `raw_rows` / `columns`.
+    Returns the number of duplicate external_ids skipped.
     """
+    async def work(session: AsyncSession) -> int:
+        duplicates = await _insert_validated_columns(session, sources, raw_rows, columns)
+        await session.execute(delete(error_table).where(error_table.c.id.in_(error_ids)))
+        cleared = Counter(source or "" for source in error_sources)
+        await add_counts(session, failures=Counter({source: -count for source, count in cleared.items()}))
+        return duplicates
 
-    # 1. Create and add Raw records
-    raw_objs = [
-        RawData(source=item["type"], payload=item["raw"])
-        for item in batch_data
-    ]
-    db.add_all(raw_objs)
-    
-    # 2. Flush to the database to populate raw_objs[i].id
-    # This does NOT end the transaction yet.
-    await db.flush()
-
-    # 3. Create Processed records using the newly generated IDs
-    processed_objs = []
-    for i, raw_item in enumerate(raw_objs):
-        # The 'validated' data was passed along in our list
-        validated = batch_data[i]["validated"]
-        processed_objs.append(ProcessedData(
-            raw_id=raw_item.id,
-            external_id=validated.external_id,
-            amount=validated.amount,
-            currency=validated.currency
-        ))
-
-    db.add_all(processed_objs)
-    
-    # 4. Finalize the whole unit of work
-    await db.commit()
-    db.expunge_all()
\ No newline at end of file
+    return await _write(db, error_sources[0] if error_sources else "", work)
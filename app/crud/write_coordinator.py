@@ -0,0 +1,209 @@
+"""
+Write Coordinator
+-----------------
+SQLite has one write lock. Concurrent ingestion jobs and the Kafka worker
+committing on their own connections queue up on it (busy_timeout stalls),
+so while the coordinator runs, storage hands every batch to it instead:
+one task owns the single writer connection (write_engine) and runs the
+submitted batches in arrival order, committing up to WRITE_GROUP_SIZE of
+them per transaction (group commit). The queue is bounded by
+WRITE_QUEUE_SIZE, so submitters wait when the writer falls behind.
+
+If a batch of a group fails, the group is rolled back and its batches are
+replayed one transaction each, so only that batch's caller sees the error.
+If the coordinator itself fails (e.g. the writer connection cannot be
+opened), every batch not yet committed fails with a RuntimeError instead of
+leaving its caller waiting.
+
+The writer connection has automatic WAL checkpoints off; the coordinator
+runs PRAGMA wal_checkpoint(PASSIVE) between groups every
+WAL_CHECKPOINT_SECONDS and whenever it goes idle. PASSIVE never waits for
+readers: pages still visible to a long report read are left for the next one.
+
+Example usage:
+    await write_coordinator.start()
+    duplicates = await write_coordinator.submit(work, source_type="csv")  # work(db) flushes, never commits
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS, WRITE_GROUP_BATCHES
+from app.models.database import write_session_factory
+
+logger = logging.getLogger(__name__)
+
+Work = Callable[[AsyncSession], Awaitable[Any]]
+
+
+@dataclass
+class _Write:
+    work: Work
+    source_type: str
+    future: asyncio.Future
+
+
+class WriteCoordinator:
+    """
+    Serialises all batch writes through one session. `submit` resolves once
+    the batch is committed, with whatever `work` returned.
+    """
+    def __init__(
+        self,
+        session_factory=write_session_factory,
+        group_size: int = settings.WRITE_GROUP_SIZE,
+        queue_size: int = settings.WRITE_QUEUE_SIZE,
+        checkpoint_seconds: float = settings.WAL_CHECKPOINT_SECONDS,
+    ):
+        self.group_size = max(group_size, 1)
+        self.queue_size = queue_size
+        self.checkpoint_seconds = checkpoint_seconds
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue[_Write | None] | None = None
+        self._task: asyncio.Task | None = None
+        self._error: Exception | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+        logger.info("Write coordinator started (group size %d)", self.group_size)
+
+    async def stop(self):
+        """Commits everything already queued, then stops."""
+        if self._task is None:
+            return
+        if self.running:
+            await self._queue.put(None)
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Write coordinator stopped")
+
+    async def submit(self, work: Work, source_type: str = "") -> Any:
+        if not self.running:
+            raise self._stopped_error()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Write(work, source_type, future))
+        if not self.running:
+            # the writer stopped while this batch waited for a queue slot
+            _resolve(future, exception=self._stopped_error())
+        return await future
+
+    async def _run(self):
+        dirty = False
+        last_checkpoint = time.monotonic()
+        getter = None
+        group: list[_Write] = []
+        try:
+            async with self._session_factory() as db:
+                while True:
+                    # the pending get survives an idle timeout, so no write is ever dropped
+                    getter = getter or asyncio.ensure_future(self._queue.get())
+                    done, _ = await asyncio.wait({getter}, timeout=self.checkpoint_seconds)
+                    if not done:
+                        if dirty:
+                            await self._checkpoint(db)
+                            dirty, last_checkpoint = False, time.monotonic()
+                        continue
+                    first, getter = getter.result(), None
+
+                    group, stopping = [], first is None
+                    if first is not None:
+                        group.append(first)
+                    while len(group) < self.group_size and not stopping and not self._queue.empty():
+                        write = self._queue.get_nowait()
+                        if write is None:
+                            stopping = True
+                        else:
+                            group.append(write)
+
+                    if group:
+                        WRITE_GROUP_BATCHES.observe(len(group))
+                        await self._commit_group(db, group)
+                        dirty = True
+                    if dirty and (stopping or time.monotonic() - last_checkpoint >= self.checkpoint_seconds):
+                        await self._checkpoint(db)
+                        dirty, last_checkpoint = False, time.monotonic()
+                    if stopping:
+                        return
+        except Exception as exc:
+            self._error = exc
+            logger.exception("Write coordinator failed; failing the batches not yet committed")
+        finally:
+            self._fail_pending(group, getter)
+
+    def _fail_pending(self, group: list[_Write], getter: asyncio.Future | None):
+        """Fails every batch this task will no longer commit: in flight, being fetched, or queued."""
+        pending = list(group)
+        if getter is not None:
+            if getter.done() and not getter.cancelled():
+                pending.append(getter.result())
+            else:
+                getter.cancel()
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for write in pending:
+            if write is not None:
+                _resolve(write.future, exception=self._stopped_error())
+
+    def _stopped_error(self) -> RuntimeError:
+        error = RuntimeError("Write coordinator is not running; the batch was not committed")
+        error.__cause__ = self._error
+        return error
+
+    async def _commit_group(self, db: AsyncSession, group: list[_Write]):
+        results = []
+        try:
+            for write in group:
+                with STAGE_SECONDS.time(stage="flush", source_type=write.source_type):
+                    results.append(await write.work(db))
+            source_types = {write.source_type for write in group}
+            with STAGE_SECONDS.time(stage="commit", source_type=source_types.pop() if len(source_types) == 1 else "mixed"):
+                await db.commit()
+        except Exception as exc:
+            await db.rollback()
+            if len(group) == 1:
+                _resolve(group[0].future, exception=exc)
+                return
+            logger.warning("Group commit of %d batches failed (%s); retrying them one by one", len(group), exc)
+            for write in group:
+                await self._commit_group(db, [write])
+            return
+
+        for write, result in zip(group, results):
+            _resolve(write.future, result=result)
+
+    async def _checkpoint(self, db: AsyncSession):
+        if db.get_bind().dialect.name != "sqlite":
+            return
+        with STAGE_SECONDS.time(stage="wal_checkpoint", source_type=""):
+            _, log_pages, checkpointed = (await db.execute(text("PRAGMA wal_checkpoint(PASSIVE)"))).one()
+            await db.commit()
+        if checkpointed < log_pages:
+            logger.debug("WAL checkpoint left %d of %d pages behind readers", log_pages - checkpointed, log_pages)
+
+
+def _resolve(future: asyncio.Future, result: Any = None, exception: Exception | None = None):
+    # the submitter may have been cancelled while waiting
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+write_coordinator = WriteCoordinator()
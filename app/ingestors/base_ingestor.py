@@ -2,8 +2,89 @@
     The 'Contract' for all data sources.
     Requirement #1: Modular and pluggable input types.
 """
+import asyncio
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator, Any
+from dataclasses import dataclass, field
+from itertools import compress
+from typing import AsyncGenerator, Any, Iterator, Sequence
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+# A field the record does not have, in ColumnBatch columns
+MISSING = _Missing()
+
+
+@dataclass(slots=True)
+class RecordChunk:
+    """
+    A chunk of parsed records.
+    - rows: records as dictionaries
+    - malformed: (raw_text, error_message) for records that could not be parsed
+    - offset / line: bytes and lines of the source consumed through the end of
+      this chunk, when the source is a file
+    """
+    rows: list[dict]
+    malformed: list[tuple[str, str]] = field(default_factory=list)
+    offset: int | None = None
+    line: int | None = None
+
+
+@dataclass(slots=True)
+class ColumnBatch:
+    """
+    A chunk of records, column-wise.
+    - columns: field name -> list (or NumPy object array) of `size` values,
+      MISSING where a record lacks the field
+    - sparse: some records lack some fields (False: every value is present)
+    - malformed / offset / line: as in RecordChunk
+    """
+    columns: dict[str, Sequence]
+    size: int
+    malformed: list[tuple[str, str]] = field(default_factory=list)
+    offset: int | None = None
+    line: int | None = None
+    sparse: bool = False
+
+    @classmethod
+    def from_rows(cls, rows: list[dict], **kwargs) -> "ColumnBatch":
+        names = dict.fromkeys(name for row in rows for name in row)
+        columns = {name: [row.get(name, MISSING) for row in rows] for name in names}
+        sparse = any(len(row) != len(names) for row in rows)
+        return cls(columns, len(rows), sparse=sparse, **kwargs)
+
+    @classmethod
+    def from_chunk(cls, chunk: RecordChunk) -> "ColumnBatch":
+        return cls.from_rows(chunk.rows, malformed=chunk.malformed, offset=chunk.offset, line=chunk.line)
+
+    def column(self, name: str) -> Sequence:
+        values = self.columns.get(name)
+        return [MISSING] * self.size if values is None else values
+
+    def record(self, index: int) -> dict:
+        return {name: values[index] for name, values in self.columns.items() if values[index] is not MISSING}
+
+    def rows(self, mask: Sequence[bool] | None = None) -> list[dict]:
+        """Records as dicts (only those where `mask` is true), e.g. for RawData payloads."""
+        return list(self.iter_rows(mask))
+
+    def iter_rows(self, mask: Sequence[bool] | None = None) -> Iterator[dict]:
+        """`rows`, one record at a time."""
+        names = list(self.columns)
+        values = zip(*self.columns.values()) if names else iter([()] * self.size)
+        if mask is not None:
+            values = compress(values, mask)
+        if not self.sparse:
+            return (dict(zip(names, record)) for record in values)
+        return (
+            {name: value for name, value in zip(names, record) if value is not MISSING} for record in values
+        )
+
 
 class BaseIngestor(ABC):
     """
@@ -20,4 +101,48 @@ class BaseIngestor(ABC):
         This ensures the Orchestrator can 'pull' data without 
         knowing if it's a file, a DB, or a stream.
         """
-        yield {}  # This is just a type hint for the interface
\ No newline at end of file
+        yield {}  # This is just a type hint for the interface
+
+    async def stream_chunks(
+        self,
+        source: Any,
+        chunk_size: int,
+        offset: int = 0,
+        line: int = 0,
+    ) -> AsyncGenerator[RecordChunk, None]:
+        """
+        Yields records in chunks of at most `chunk_size`. The default adapter
+        groups `stream_data`; block-reading ingestors override it to parse
+        whole chunks at once and report malformed records.
+
+        File ingestors resume from a checkpoint when given the byte `offset`
+        and `line` of a record boundary (as reported by an earlier chunk);
+        the default adapter cannot seek and rejects a non-zero offset.
+        """
+        if offset:
+            raise ValueError(f"{type(self).__name__} cannot resume from a byte offset")
+        rows = []
+        async for row in self.stream_data(source):
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield RecordChunk(rows=rows)
+                rows = []
+        if rows:
+            yield RecordChunk(rows=rows)
+
+    async def stream_batches(
+        self,
+        source: Any,
+        batch_size: int,
+        offset: int = 0,
+        line: int = 0,
+    ) -> AsyncGenerator[ColumnBatch, None]:
+        """
+        Yields records column-wise, in batches of at most `batch_size`; this
+        is what DataOrchestrator consumes. The default adapter transposes
+        `stream_chunks` (in a worker thread); ingestors that can produce
+        columns directly override it and never build per-record dicts.
+        Resuming works as in `stream_chunks`.
+        """
+        async for chunk in self.stream_chunks(source, batch_size, offset=offset, line=line):
+            yield await asyncio.to_thread(ColumnBatch.from_chunk, chunk)
@@ -0,0 +1,413 @@
+"""
+Block Reader
+------------
+Blocking helpers shared by the file ingestors: read a file in large blocks,
+cut each block into complete records and parse whole chunks of them at once
+(C `csv` module for CSV, one batched `json.loads` for NDJSON), either as
+row dicts (`iter_chunks`) or column-wise (`iter_batches`, see ColumnBatch).
+
+Ingestors drive these generators from a worker thread, so the event loop
+pays one thread hop per chunk instead of one per line. Records that cannot
+be parsed are reported as `malformed` instead of being dropped.
+
+`open_source` transparently decompresses gzip, bzip2 and zstd files
+(detected from the extension or the magic bytes), so compressed inputs are
+inflated block by block in that same worker thread, with no temp files.
+Byte offsets then count decompressed bytes.
+
+Streams that are not files (an HTTP upload body) go through the same
+parsers: `AsyncByteReader` turns an async byte iterator into a blocking file
+object for the worker thread, and `open_source` sniffs it for compression.
+Bytes are only pulled from the source as the parser asks for them.
+"""
+import asyncio
+import bz2
+import concurrent.futures
+import csv
+import gzip
+import io
+import json
+import os
+from itertools import chain
+from typing import AsyncIterator, BinaryIO, Iterator
+
+from app.ingestors.base_ingestor import ColumnBatch, RecordChunk
+
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# extension -> codec, and the magic bytes each codec starts with
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".bz2": "bz2", ".zst": "zstd", ".zstd": "zstd"}
+_MAGIC = {b"\x1f\x8b": "gzip", b"BZh": "bz2", b"\x28\xb5\x2f\xfd": "zstd"}
+
+
+def compression(path: str) -> str | None:
+    """Codec of `path` ("gzip", "bz2", "zstd") or None for a plain file."""
+    codec = COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1].lower())
+    if codec:
+        return codec
+    with open(path, "rb") as f:
+        head = f.read(4)
+    return next((codec for magic, codec in _MAGIC.items() if head.startswith(magic)), None)
+
+
+def strip_compression_suffix(name: str) -> str:
+    """'hour.csv.gz' -> 'hour.csv'."""
+    root, ext = os.path.splitext(name)
+    return root if ext.lower() in COMPRESSION_SUFFIXES else name
+
+
+def open_source(path: str | BinaryIO) -> BinaryIO:
+    """
+    Opens `path` for binary reading, decompressing on the fly when needed.
+    Compressed streams are buffered in BLOCK_SIZE reads; seek() only moves
+    forward on them (by decompressing and discarding).
+    An already open stream is passed through `open_stream` instead.
+    """
+    if not isinstance(path, str):
+        return open_stream(path)
+    codec = compression(path)
+    if codec is None:
+        return open(path, "rb", buffering=0)
+    if codec == "gzip":
+        return gzip.open(path, "rb")
+    if codec == "bz2":
+        return bz2.open(path, "rb")
+    return _zstd_reader(open(path, "rb"), path)
+
+
+def open_stream(raw: BinaryIO) -> BinaryIO:
+    """
+    Wraps a forward-only binary stream, decompressing it when it starts with
+    gzip, bzip2 or zstd magic bytes. Blocks until the first bytes arrive.
+    """
+    if not isinstance(raw, io.BufferedReader):
+        raw = io.BufferedReader(raw, BLOCK_SIZE)
+    head = raw.peek(4)[:4]
+    codec = next((codec for magic, codec in _MAGIC.items() if head.startswith(magic)), None)
+    if codec is None:
+        return raw
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if codec == "bz2":
+        return bz2.BZ2File(raw, "rb")
+    return _zstd_reader(raw, "stream")
+
+
+def _zstd_reader(raw: BinaryIO, name: str) -> BinaryIO:
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise ValueError(f"Reading zstd-compressed {name} needs the zstandard package") from exc
+    return io.BufferedReader(
+        zstandard.ZstdDecompressor().stream_reader(raw, read_size=BLOCK_SIZE, closefd=True), BLOCK_SIZE
+    )
+
+
+class AsyncByteReader(io.RawIOBase):
+    """
+    Blocking, read-only file object over an async byte iterator (e.g.
+    Starlette's request.stream()), for use from a worker thread only. A read
+    that runs out of data waits for the iterator's next piece on `loop`, so
+    the source is never read ahead of the parser: when the writer falls
+    behind, the parser stops asking and the socket stops being drained.
+
+    A wait longer than `timeout` seconds raises TimeoutError; `close()`
+    (from the loop, e.g. once the request is gone) releases a waiting
+    read with an OSError, so the worker thread never stays blocked.
+    """
+    def __init__(self, pieces: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop, timeout: float | None = None):
+        self._pieces = aiter(pieces)
+        self._loop = loop
+        self._timeout = timeout
+        self._view = memoryview(b"")
+        self._done = False
+        self._pending: concurrent.futures.Future | None = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._view:
+            if self._done:
+                return 0
+            piece = self._wait_for_piece()
+            if piece is None:
+                self._done = True
+                return 0
+            self._view = memoryview(piece)
+        size = min(len(buffer), len(self._view))
+        buffer[:size] = self._view[:size]
+        self._view = self._view[size:]
+        return size
+
+    def close(self):
+        pending = self._pending
+        if pending is not None:
+            pending.cancel()
+        super().close()
+
+    def _wait_for_piece(self) -> bytes | None:
+        if self.closed:
+            raise ValueError("I/O operation on closed AsyncByteReader")
+        future = self._pending = asyncio.run_coroutine_threadsafe(self._next_piece(), self._loop)
+        try:
+            return future.result(self._timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"No data received for {self._timeout:g} s") from None
+        except concurrent.futures.CancelledError:
+            raise OSError("The stream was closed while waiting for data") from None
+        finally:
+            self._pending = None
+
+    async def _next_piece(self) -> bytes | None:
+        return await anext(self._pieces, None)
+
+
+def read_records(fh: BinaryIO, quoted: bool = False, block_size: int = BLOCK_SIZE) -> Iterator[tuple[list[bytes], bool]]:
+    """
+    Yields (records, terminated) per block. Records exclude their trailing
+    newline; `terminated` is False only for a final record without one.
+    With `quoted`, lines inside a double-quoted CSV field are joined back
+    into one record (an unterminated quoted field runs to end of file).
+    """
+    tail = b""
+    pending: list[bytes] = []
+
+    while True:
+        block = fh.read(block_size)
+        if not block:
+            if tail or pending:
+                yield [b"\n".join(pending + [tail] if tail else pending)], not tail
+            return
+
+        block = tail + block
+        cut = block.rfind(b"\n")
+        if cut < 0:
+            tail = block
+            continue
+        tail = block[cut + 1:]
+        lines = block[:cut].split(b"\n")
+
+        if not quoted or (not pending and b'"' not in block):
+            if lines:
+                yield lines, True
+            continue
+
+        records = []
+        for line in lines:
+            # Only a line with an odd number of quotes can open or close a quoted field
+            odd = line.count(b'"') % 2
+            if pending:
+                pending.append(line)
+                if odd and not _ends_in_quoted_field(b"\n".join(pending)):
+                    records.append(b"\n".join(pending))
+                    pending = []
+            elif odd and _ends_in_quoted_field(line):
+                pending = [line]
+            else:
+                records.append(line)
+        if records:
+            yield records, True
+
+
+def read_after_header(
+    fh: BinaryIO, offset: int = 0, line: int = 0, quoted: bool = False, block_size: int = BLOCK_SIZE,
+) -> tuple[bytes, Iterator[tuple[list[bytes], bool]], int, int]:
+    """
+    `read_records` for a file whose first record is a header, which is
+    taken off the first block. Returns (header, blocks, offset, line) with
+    `blocks` starting right after the header, or at `offset` when that is a
+    later record boundary (resume): a plain file seeks there, a compressed
+    or forward-only stream is read up to it.
+    """
+    blocks = read_records(fh, quoted=quoted, block_size=block_size)
+    records, terminated = next(blocks, ([], True))
+    header = records[0] if records else b""
+    start = len(header) + (1 if terminated or len(records) > 1 else 0)
+    if offset <= start:
+        return header, chain([(records[1:], terminated)], blocks), start, header.count(b"\n") + 1
+    if isinstance(fh, io.FileIO):
+        fh.seek(offset)
+        return header, read_records(fh, quoted=quoted, block_size=block_size), offset, line
+    return header, _skip_to(chain([(records[1:], terminated)], blocks), start, offset), offset, line
+
+
+def _skip_to(blocks, position: int, offset: int) -> Iterator[tuple[list[bytes], bool]]:
+    """Drops the records of `blocks` (starting at byte `position`) that lie before `offset`."""
+    for records, terminated in blocks:
+        skip = 0
+        while skip < len(records) and position < offset:
+            position += len(records[skip]) + 1
+            skip += 1
+        if skip < len(records):
+            yield records[skip:], terminated
+
+
+def _ends_in_quoted_field(record: bytes) -> bool:
+    """True when `record` stops inside an open double-quoted CSV field."""
+    try:
+        next(csv.reader([record.decode("utf-8", "replace")], strict=True), None)
+    except csv.Error as exc:
+        return "unexpected end of data" in str(exc)
+    return False
+
+
+def iter_chunks(
+    blocks: Iterator[tuple[list[bytes], bool]],
+    parse,
+    chunk_size: int,
+    offset: int = 0,
+    line: int = 0,
+) -> Iterator[RecordChunk]:
+    """
+    Slices record blocks into chunks of at most `chunk_size` records and
+    parses each chunk with `parse(records) -> (rows, malformed)`. `offset`
+    and `line` are the byte offset / line count where `blocks` starts.
+    """
+    for piece, offset, line in _pieces(blocks, chunk_size, offset, line):
+        rows, malformed = parse(piece)
+        yield RecordChunk(rows=rows, malformed=malformed, offset=offset, line=line)
+
+
+def iter_batches(
+    blocks: Iterator[tuple[list[bytes], bool]],
+    parse,
+    batch_size: int,
+    offset: int = 0,
+    line: int = 0,
+) -> Iterator[ColumnBatch]:
+    """
+    Column-wise `iter_chunks`: `parse(records)` returns a ColumnBatch, which
+    is yielded with the offset / line at its end.
+    """
+    for piece, offset, line in _pieces(blocks, batch_size, offset, line):
+        batch = parse(piece)
+        batch.offset, batch.line = offset, line
+        yield batch
+
+
+def _pieces(blocks, size: int, offset: int, line: int) -> Iterator[tuple[list[bytes], int, int]]:
+    """(records, offset, line) slices of at most `size` records, positions taken at their end."""
+    for records, terminated in blocks:
+        for start in range(0, len(records), size):
+            piece = records[start:start + size]
+            offset += sum(map(len, piece)) + len(piece)
+            line += b"\n".join(piece).count(b"\n") + 1
+            if not terminated and start + size >= len(records):
+                offset -= 1
+            yield piece, offset, line
+
+
+async def stream_in_thread(chunks: Iterator[RecordChunk]) -> AsyncIterator[RecordChunk]:
+    """Advances a blocking chunk generator one chunk per thread hop."""
+    try:
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            yield chunk
+    finally:
+        try:
+            chunks.close()
+        except ValueError:
+            # cancelled while the worker thread is still inside next()
+            pass
+
+
+def decode_records(records: list[bytes]) -> tuple[list[str], list[tuple[str, str]]]:
+    """UTF-8 decode; undecodable records are returned as malformed."""
+    if not records:
+        return [], []
+    try:
+        joined = b"\n".join(records)
+        if joined.count(b"\n") == len(records) - 1:
+            return joined.decode("utf-8").split("\n"), []
+        # multi-line CSV records: keep record boundaries
+        return [record.decode("utf-8") for record in records], []
+    except UnicodeDecodeError:
+        texts, malformed = [], []
+        for record in records:
+            try:
+                texts.append(record.decode("utf-8"))
+            except UnicodeDecodeError as exc:
+                malformed.append((repr(record), f"Invalid UTF-8: {exc}"))
+        return texts, malformed
+
+
+def parse_csv(records: list[bytes], fieldnames: list[str]) -> tuple[list[dict], list[tuple[str, str]]]:
+    """
+    Parses complete CSV records into dicts keyed by `fieldnames`. Blank
+    records are skipped; bad quoting or a wrong field count is malformed.
+    """
+    values, malformed = _parse_csv_values(records, len(fieldnames))
+    return [dict(zip(fieldnames, record)) for record in values], malformed
+
+
+def parse_csv_columns(records: list[bytes], fieldnames: list[str]) -> ColumnBatch:
+    """`parse_csv` straight into columns: the parsed records are transposed, no dict per record."""
+    values, malformed = _parse_csv_values(records, len(fieldnames))
+    columns = zip(*values) if values else ([] for _ in fieldnames)
+    return ColumnBatch(dict(zip(fieldnames, map(list, columns))), len(values), malformed)
+
+
+def parse_ndjson_batch(records: list[bytes]) -> ColumnBatch:
+    """`parse_ndjson` as a ColumnBatch (objects may differ in their keys, see ColumnBatch.sparse)."""
+    rows, malformed = parse_ndjson(records)
+    return ColumnBatch.from_rows(rows, malformed=malformed)
+
+
+def _parse_csv_values(records: list[bytes], width: int) -> tuple[list[list[str]], list[tuple[str, str]]]:
+    """Well-formed records as value lists of `width`, plus the malformed ones."""
+    texts, malformed = decode_records(records)
+
+    try:
+        parsed = list(csv.reader(texts, strict=True))
+    except csv.Error:
+        parsed = None
+    if parsed is None or len(parsed) != len(texts):
+        # Slow path: isolate every record so one bad quote cannot swallow the next
+        parsed = []
+        for text in texts:
+            try:
+                parsed.append(next(csv.reader([text], strict=True), []))
+            except csv.Error as exc:
+                parsed.append(exc)
+
+    rows = []
+    for text, values in zip(texts, parsed):
+        if isinstance(values, csv.Error):
+            malformed.append((text, f"Malformed CSV record: {values}"))
+        elif len(values) == width:
+            rows.append(values)
+        elif values:
+            malformed.append((text, f"Malformed CSV record: expected {width} fields, got {len(values)}"))
+    return rows, malformed
+
+
+def parse_ndjson(records: list[bytes]) -> tuple[list[dict], list[tuple[str, str]]]:
+    """
+    Parses NDJSON records with one json.loads per chunk, falling back to
+    per-line parsing to pinpoint bad lines. Non-object values are malformed.
+    """
+    texts, malformed = decode_records(records)
+    texts = [text for text in texts if text.strip()]
+
+    try:
+        values = json.loads("[" + ",".join(texts) + "]")
+        if len(values) != len(texts):
+            raise ValueError("record count mismatch")
+    except ValueError:
+        values = []
+        for text in texts:
+            try:
+                values.append(json.loads(text))
+            except ValueError as exc:
+                values.append(exc)
+
+    rows = []
+    for text, value in zip(texts, values):
+        if isinstance(value, dict):
+            rows.append(value)
+        elif isinstance(value, ValueError):
+            malformed.append((text, f"Malformed JSON record: {value}"))
+        else:
+            malformed.append((text, f"Malformed JSON record: expected an object, got {type(value).__name__}"))
+    return rows, malformed
@@ -5,10 +5,14 @@ Kafka Ingestor Module
  Current implementation is a mock for architectural demonstration. Production requires aiokafka and a background worker.
 The Refactor: move the Kafka logic out of your v1/reporting_router.py and v1/ingestion_router.py and into the FastAPI Lifespan
 
-
+LocalKafkaConsumer wraps any ingestor stream behind the subset of the
+AIOKafkaConsumer API used by KafkaWorker, so the micro-batch path can be
+load-tested without a broker.
 """
 import asyncio
-from typing import AsyncIterator, Dict, Any
+import itertools
+from collections import deque
+from typing import AsyncIterator, Dict, Any, NamedTuple
 import logging
 from app.ingestors.base_ingestor import BaseIngestor
 
@@ -16,25 +20,102 @@ from app.ingestors.base_ingestor import BaseIngestor
 class KafkaIngestor(BaseIngestor):
     """
     Ingestor for Kafka topics. Implements the BaseIngestor contract.
-    
+
     Usage:
         kafka_ingestor = KafkaIngestor()
         async for message in kafka_ingestor.stream_data('my_kafka_topic'):
             print(message)
     """
+    def __init__(self, interval: float = 1.0):
+        # Seconds between mock events; 0 produces events as fast as they are consumed
+        self.interval = interval
+
     async def stream_data(self, source: str) -> AsyncIterator[Dict[str, Any]]:
         """
         Mocking a Kafka Consumer. In production, this would wrap aiokafka.
         """
         logging.info('Subscribing to Kafka Topic %s:', source)
-        
+
         # Simulate an infinite stream of real-time events
-        while True:
-            await asyncio.sleep(1) # Simulate network lag
+        for sequence in itertools.count(1):
+            await asyncio.sleep(self.interval) # Simulate network lag
             # Mock data coming off the wire
             yield {
-                "external_id": "KAFKA-123",
+                "external_id": f"KAFKA-{sequence}",
                 "amount": 99.99,
                 "currency": "USD",
                 "source_channel": "KAFKA_PROD"
-            }
\ No newline at end of file
+            }
+
+
+class LocalMessage(NamedTuple):
+    topic: str
+    partition: int
+    offset: int
+    value: dict
+
+
+class LocalKafkaConsumer:
+    """
+    In-process stand-in for AIOKafkaConsumer (start/stop/getmany/commit).
+    Messages are read from `ingestor.stream_data(topic)` into a bounded
+    buffer, playing the role of the broker; `committed` tracks the last
+    acknowledged offset so load tests can verify at-least-once delivery.
+
+    Usage:
+        consumer = LocalKafkaConsumer(KafkaIngestor(interval=0), limit=100_000)
+        worker = KafkaWorker(consumer=consumer)
+    """
+    def __init__(self, ingestor: BaseIngestor, topic: str = "local", limit: int | None = None, buffer: int = 10_000):
+        self.ingestor = ingestor
+        self.topic = topic
+        self.limit = limit
+        self.committed = -1
+        self._buffer: deque[LocalMessage] = deque()
+        self._capacity = buffer
+        self._available = asyncio.Event()
+        self._position = -1
+        self._produced = 0
+        self._producer = None
+
+    async def start(self):
+        self._producer = asyncio.create_task(self._produce())
+
+    async def stop(self):
+        if self._producer:
+            self._producer.cancel()
+            await asyncio.gather(self._producer, return_exceptions=True)
+
+    async def _produce(self):
+        offset = 0
+        async for value in self.ingestor.stream_data(self.topic):
+            while len(self._buffer) >= self._capacity:
+                await asyncio.sleep(0.001)
+            self._buffer.append(LocalMessage(self.topic, 0, offset, value))
+            self._available.set()
+            offset += 1
+            self._produced = offset
+            if self.limit is not None and offset >= self.limit:
+                break
+            if offset % 1000 == 0:
+                await asyncio.sleep(0)
+
+    async def getmany(self, timeout_ms: int = 0, max_records: int | None = None) -> dict:
+        if not self._buffer:
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                return {}
+
+        count = len(self._buffer) if max_records is None else min(max_records, len(self._buffer))
+        messages = [self._buffer.popleft() for _ in range(count)]
+        self._position = messages[-1].offset
+        return {(self.topic, 0): messages}
+
+    async def commit(self):
+        self.committed = self._position
+
+    def highwater(self, partition) -> int:
+        """Offset the next produced message will get, like AIOKafkaConsumer.highwater."""
+        return self._produced
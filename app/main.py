@@ -1,7 +1,15 @@
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.models.database import init_db
+from fastapi.responses import PlainTextResponse
+from app.models.database import init_db, async_session_factory
+from app.crud.rollups import ensure_rollups
+from app.crud.write_coordinator import write_coordinator
+from app.core.config import settings
+from app.core.job_scheduler import job_scheduler
+from app.core.kafka_worker import KafkaWorker
+from app.core.dedup import seen_external_ids
+from app.core.metrics import REGISTRY
 from app.api.v1.ingestion_router import router as ingestion_router
 from app.api.v1.reporting_router import router as reporting_router
 
@@ -13,18 +21,25 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # --- STARTUP ---
     await init_db()
+    async with async_session_factory() as db:
+        await ensure_rollups(db)
+        await seen_external_ids.warm(db)
+    await write_coordinator.start()
+    await job_scheduler.start()
+    # Kafka micro-batch consumer, opt-in: it needs a reachable broker
+    kafka_worker = KafkaWorker() if settings.KAFKA_ENABLED else None
+    if kafka_worker:
+        await kafka_worker.start()
     logger.info("🚀 System Online: Database initialized and tables created.")
-    
-    # Optional: If you decide to add the Kafka background worker later, 
-    # you would launch the task here.
-    ### # Start Kafka worker
-    ## kafka_worker = KafkaWorker()
-    ##await kafka_worker.start()
-    
+
     yield  # App is running...
 
     # --- SHUTDOWN ---
-    ##await kafka_worker.stop()
+    # the consumer goes first: its last batch still needs the write coordinator
+    if kafka_worker:
+        await kafka_worker.stop()
+    await job_scheduler.stop()
+    await write_coordinator.stop()
     ##await engine.dispose()
     logger.info("🛑 System Offline: Database connections closed safely.")
 
@@ -37,4 +52,10 @@ app = FastAPI(
 
 # Registering versioned routers
 app.include_router(ingestion_router, prefix="/api/v1", tags=["Ingestion"])
-app.include_router(reporting_router, prefix="/api/v1", tags=["Reporting"])
\ No newline at end of file
+app.include_router(reporting_router, prefix="/api/v1", tags=["Reporting"])
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of the pipeline metrics (app.core.metrics)."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,7 +1,25 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.models.models import Base  # Crucial: Import the Base where your tables are defined
 from app.core.config import settings
-from sqlalchemy import event
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _sqlite_file(url: URL) -> bool:
+    """A SQLite database in a plain file (not :memory:, not already a URI)."""
+    database = url.database or ""
+    return url.get_backend_name() == "sqlite" and database not in ("", ":memory:") and not database.startswith("file:")
+
+
+def _read_only_url(url: URL) -> URL:
+    return url.set(database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"})
+
+
+_url = make_url(settings.DATABASE_URL)
 
 engine = create_async_engine(settings.DATABASE_URL)
 SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
@@ -12,6 +30,24 @@ async_session_factory = async_sessionmaker(
     class_=AsyncSession,
 )
 
+if _sqlite_file(_url):
+    # The one connection the write coordinator (app.crud.write_coordinator)
+    # commits through, and a read-only pool for reporting: readers never
+    # take the write lock and never wait for it. Both are pooled (aiosqlite
+    # defaults to NullPool) so connections keep their page cache.
+    write_engine = create_async_engine(
+        settings.DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+    )
+    read_engine = create_async_engine(
+        _read_only_url(_url), poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.READ_POOL_SIZE, max_overflow=settings.READ_POOL_SIZE,
+    )
+else:
+    write_engine = read_engine = engine
+
+write_session_factory = async_sessionmaker(bind=write_engine, expire_on_commit=False, class_=AsyncSession)
+read_session_factory = async_sessionmaker(bind=read_engine, expire_on_commit=False, class_=AsyncSession)
+
 
 # This event listener turns on WAL mode every time a connection is made
 @event.listens_for(engine.sync_engine, "connect")
@@ -21,7 +57,27 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor.execute("PRAGMA synchronous=NORMAL")
     cursor.execute("PRAGMA busy_timeout=30000") # 30 seconds
     cursor.close()
-    
+
+
+if write_engine is not engine:
+    @event.listens_for(write_engine.sync_engine, "connect")
+    def set_writer_pragma(dbapi_connection, connection_record):
+        set_sqlite_pragma(dbapi_connection, connection_record)
+        cursor = dbapi_connection.cursor()
+        # the write coordinator checkpoints between commit groups instead
+        cursor.execute("PRAGMA wal_autocheckpoint=0")
+        cursor.execute(f"PRAGMA journal_size_limit={settings.WAL_SIZE_LIMIT_BYTES}")
+        cursor.close()
+
+    @event.listens_for(read_engine.sync_engine, "connect")
+    def set_reader_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.execute(f"PRAGMA cache_size=-{settings.READ_CACHE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={settings.READ_MMAP_BYTES}")
+        cursor.close()
+
 async def init_db():
     """
     Creates all tables in the database.
@@ -30,7 +86,72 @@ async def init_db():
     async with engine.begin() as conn:
         # This looks at every class inheriting from 'Base' and creates the table
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips existing tables, so add columns and indexes introduced since
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_upgrade_unique_indexes)
+        await conn.run_sync(_create_missing_indexes)
+
+
+def _add_missing_columns(sync_conn):
+    """
+    ALTER TABLE ... ADD COLUMN for model columns an existing table lacks.
+    Only nullable columns without server defaults can be added this way,
+    which is how new columns are declared.
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            logger.info("Adding column %s.%s", table.name, column.name)
+            sync_conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}')
+
+
+def _create_missing_indexes(sync_conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _upgrade_unique_indexes(sync_conn):
+    """
+    Drops existing non-unique indexes the models now declare unique (e.g.
+    processed_data.external_id) so _create_missing_indexes rebuilds them.
+    Startup fails if the table already holds duplicates: the unique index is
+    the authoritative duplicate check (ON CONFLICT DO NOTHING), so running
+    without it would leave the in-memory filter as the only one.
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"]: index for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if not index.unique or index.name not in existing or existing[index.name]["unique"]:
+                continue
+            columns = list(index.columns)
+            # pylint: disable=not-callable
+            duplicate = sync_conn.execute(
+                select(*columns).group_by(*columns).having(func.count() > 1).limit(1)
+            ).first()
+            if duplicate is not None:
+                raise RuntimeError(
+                    f"Cannot make {index.name} unique: {table.name} already holds duplicates such as "
+                    f"{tuple(duplicate)}. Remove them (keep one row per "
+                    f"{', '.join(column.name for column in columns)}) and restart."
+                )
+            index.drop(sync_conn)
 
 async def get_db():
     async with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_read_db():
+    """Session on the read-only pool, for reporting endpoints."""
+    async with read_session_factory() as session:
+        yield session
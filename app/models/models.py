@@ -7,7 +7,10 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Float,
-    Text
+    Index,
+    Boolean,
+    Text,
+    LargeBinary
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -27,9 +30,29 @@ class RawData(Base):
     payload = Column(JSON, nullable=False)
     received_at = Column(DateTime(timezone=True), default=datetime.now)
 
+    # compact storage: payload is JSON null, the record is entry block_index of RawBlock block_id
+    block_id = Column(Integer, ForeignKey("raw_blocks.id"), nullable=True)
+    block_index = Column(Integer, nullable=True)
+
     processed_records = relationship("ProcessedData", back_populates="raw")
 
 
+class RawBlock(Base):
+    """
+    Compressed raw payloads of one ingested batch (RAW_STORAGE_MODE=compact):
+    a JSON array, one entry per RawData row referencing the block.
+    Decoded by app.crud.raw_store.load_payloads.
+    """
+    __tablename__ = "raw_blocks"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String, nullable=False)
+    codec = Column(String(10), nullable=False)     # 'zlib' or 'zstd'
+    record_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=datetime.now)
+
+
 class ProcessedData(Base):
     """
     Stores validated and normalized data derived from RawData.
@@ -40,15 +63,29 @@ class ProcessedData(Base):
     id = Column(Integer, primary_key=True)
     raw_id = Column(Integer, ForeignKey("raw_data.id"), nullable=False)
 
-    external_id = Column(String, index=True, nullable=False)
+    # unique: re-ingested / redelivered records are skipped (see app.core.dedup)
+    external_id = Column(String, index=True, unique=True, nullable=False)
     amount = Column(Float, nullable=False)
     currency = Column(String, nullable=False)
+    # NULL for rows ingested before these were stored
+    source_channel = Column(String, nullable=True)
+    timestamp = Column(DateTime, nullable=True)
 
     status = Column(String, default="PROCESSED")
     processed_at = Column(DateTime(timezone=True), default=datetime.now)
 
     raw = relationship("RawData", back_populates="processed_records")
 
+    # Keyset pagination (id order) within the common report filters
+    __table_args__ = (
+        Index("ix_processed_data_currency_id", "currency", "id"),
+        Index("ix_processed_data_status_id", "status", "id"),
+        Index("ix_processed_data_processed_at_id", "processed_at", "id"),
+        # time-bucketed aggregates, overall and per channel
+        Index("ix_processed_data_timestamp", "timestamp"),
+        Index("ix_processed_data_source_channel_timestamp", "source_channel", "timestamp"),
+    )
+
 class IngestionError(Base):
     """
     Requirement #2 & #3: Persistence of validation failures for auditing.
@@ -59,5 +96,82 @@ class IngestionError(Base):
     source_type = Column(String(50))     # e.g., 'csv' or 'json'
     source_path = Column(String(255))    # The filename
     raw_content = Column(Text)           # The actual bad row/object string
-    error_message = Column(Text)         # The Pydantic validation error
-    created_at = Column(DateTime, default=datetime.now)
\ No newline at end of file
+    error_message = Column(Text)         # The Pydantic validation error (NULL in compact mode)
+    error_code = Column(String(255))     # Pydantic error types, comma separated, e.g. 'missing,greater_than'
+    error_fields = Column(String(255))   # The fields they apply to, aligned with error_code
+    created_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_ingestion_errors_source_type_id", "source_type", "id"),
+        Index("ix_ingestion_errors_created_at_id", "created_at", "id"),
+    )
+
+class IngestionRollup(Base):
+    """
+    Running success/failure counters per source type and currency, updated in
+    the same transaction as every batch insert so /summary never scans the
+    base tables. Failures have no validated currency and use currency "".
+    Rebuild from the base tables with: python -m app.crud.rollups rebuild
+    """
+    __tablename__ = "ingestion_rollups"
+
+    source_type = Column(String(50), primary_key=True)
+    currency = Column(String, primary_key=True)
+    success_count = Column(Integer, nullable=False, default=0)
+    failure_count = Column(Integer, nullable=False, default=0)
+
+
+class HourlyRollup(Base):
+    """
+    Amount aggregates per hour of the record timestamp, source type,
+    currency and channel, maintained with every batch insert like
+    IngestionRollup (HOURLY_ROLLUPS_ENABLED). /aggregate answers
+    hour-aligned queries from here instead of scanning processed_data.
+    """
+    __tablename__ = "hourly_rollups"
+
+    hour = Column(DateTime, primary_key=True)
+    source_type = Column(String(50), primary_key=True)
+    currency = Column(String, primary_key=True)
+    source_channel = Column(String, primary_key=True)
+    record_count = Column(Integer, nullable=False, default=0)
+    amount_sum = Column(Float, nullable=False, default=0)
+    amount_min = Column(Float, nullable=False)
+    amount_max = Column(Float, nullable=False)
+
+
+class RollupWatermark(Base):
+    """
+    The highest processed_data id folded into a rollup table ("hourly").
+    Rows above it were stored while that rollup was switched off and are
+    caught up at startup.
+    """
+    __tablename__ = "rollup_watermarks"
+
+    rollup = Column(String(50), primary_key=True)
+    processed_id = Column(Integer, nullable=False, default=0)
+
+
+class IngestionCheckpoint(Base):
+    """
+    How far the ingestion of one file got: the byte offset / line of the
+    last committed chunk, written in the same transaction as that chunk.
+    A file is identified by its content fingerprint, not just its path.
+    Completed rows double as the ingestion manifest: a file whose path,
+    size and mtime match one is skipped without being hashed.
+    """
+    __tablename__ = "ingestion_checkpoints"
+
+    source_type = Column(String(50), primary_key=True)
+    file_identity = Column(String(100), primary_key=True)
+    source_path = Column(String(255), nullable=False)
+    file_size = Column(Integer, nullable=True)
+    file_mtime = Column(Float, nullable=True)
+    byte_offset = Column(Integer, nullable=False, default=0)
+    line_number = Column(Integer, nullable=False, default=0)
+    completed = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        Index("ix_ingestion_checkpoints_source_path", "source_type", "source_path"),
+    )
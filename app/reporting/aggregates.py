@@ -0,0 +1,163 @@
+"""
+Aggregates
+----------
+sum / count / min / max / avg of `amount`, grouped by any of currency,
+channel, source and one time bucket (hour or day of the record timestamp),
+computed by the database with a single GROUP BY.
+
+Queries whose grouping, filters and time range line up with whole hours
+are answered from hourly_rollups (see app.crud.rollups) and never touch
+processed_data; anything else, e.g. since=10:30, scans processed_data
+through its (source_channel, timestamp) / timestamp indexes. Rows
+ingested before timestamps were stored have no hour, so they are not in
+hourly_rollups: while any exist, queries without since / until (which
+count them) scan processed_data too.
+
+Example usage:
+    query = AggregateQuery(group_by=("channel", "hour"), since=datetime(2024, 1, 1))
+    rows, origin = await aggregate(db, query)   # origin: "rollups" or "table"
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.rollups import hourly_table
+from app.models.models import ProcessedData, RawData
+
+DIMENSIONS = ("currency", "channel", "source")
+BUCKETS = {"hour": "%Y-%m-%dT%H:00:00", "day": "%Y-%m-%d"}
+
+
+@dataclass(frozen=True)
+class AggregateQuery:
+    """
+    group_by: names from DIMENSIONS plus at most one of BUCKETS.
+    since / until filter on the record timestamp (since <= t < until).
+    """
+    group_by: tuple[str, ...] = ()
+    currency: str | None = None
+    channel: str | None = None
+    source: str | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+
+    def __post_init__(self):
+        unknown = [name for name in self.group_by if name not in DIMENSIONS and name not in BUCKETS]
+        if unknown:
+            raise ValueError(
+                f"Cannot group by {', '.join(unknown)}; use {', '.join(DIMENSIONS + tuple(BUCKETS))}"
+            )
+        if len([name for name in self.group_by if name in BUCKETS]) > 1:
+            raise ValueError("Group by at most one time bucket (hour or day)")
+
+    @property
+    def bucket(self) -> str | None:
+        return next((name for name in self.group_by if name in BUCKETS), None)
+
+    @property
+    def bounded(self) -> bool:
+        """A since / until filter leaves out records without a timestamp."""
+        return self.since is not None or self.until is not None
+
+    def hour_aligned(self) -> bool:
+        return all(
+            bound is None or bound == bound.replace(minute=0, second=0, microsecond=0)
+            for bound in (self.since, self.until)
+        )
+
+
+def time_bucket(column, bucket: str, dialect: str):
+    """Bucket label expression: ISO hour / day string on SQLite, date_trunc elsewhere."""
+    if dialect == "sqlite":
+        return func.strftime(BUCKETS[bucket], column)
+    return func.date_trunc(bucket, column)
+
+
+async def aggregate(db: AsyncSession, query: AggregateQuery) -> tuple[list[dict], str]:
+    """Returns (one dict per group, "rollups" | "table")."""
+    use_rollups = settings.HOURLY_ROLLUPS_ENABLED and query.hour_aligned()
+    if use_rollups and not query.bounded:
+        use_rollups = not await _has_untimed_rows(db)
+    if use_rollups:
+        stmt = _rollup_select(query, db.get_bind().dialect.name)
+    else:
+        stmt = _table_select(query, db.get_bind().dialect.name)
+
+    keys = ["bucket" if name in BUCKETS else name for name in query.group_by]
+    rows = []
+    for found in (await db.execute(stmt)).mappings():
+        row = {key: found[key] for key in keys}
+        if isinstance(row.get("bucket"), datetime):
+            row["bucket"] = row["bucket"].isoformat()
+        count = found["count"] or 0
+        row.update(count=count, sum=found["sum"], min=found["min"], max=found["max"])
+        row["avg"] = found["sum"] / count if count else None
+        rows.append(row)
+    return rows, "rollups" if use_rollups else "table"
+
+
+async def _has_untimed_rows(db: AsyncSession) -> bool:
+    # one probe of ix_processed_data_timestamp
+    stmt = select(ProcessedData.id).where(ProcessedData.timestamp.is_(None)).limit(1)
+    return (await db.execute(stmt)).first() is not None
+
+
+def _table_select(query: AggregateQuery, dialect: str):
+    # pylint: disable=not-callable
+    columns = {
+        "currency": ProcessedData.currency,
+        "channel": ProcessedData.source_channel,
+        "source": RawData.source,
+    }
+    stmt = select(
+        func.count(ProcessedData.id).label("count"),
+        func.sum(ProcessedData.amount).label("sum"),
+        func.min(ProcessedData.amount).label("min"),
+        func.max(ProcessedData.amount).label("max"),
+    )
+    if "source" in query.group_by or query.source:
+        stmt = stmt.join(RawData, RawData.id == ProcessedData.raw_id)
+    return _grouped(stmt, query, columns, ProcessedData.timestamp, dialect)
+
+
+def _rollup_select(query: AggregateQuery, dialect: str):
+    columns = {
+        "currency": hourly_table.c.currency,
+        "channel": hourly_table.c.source_channel,
+        "source": hourly_table.c.source_type,
+    }
+    stmt = select(
+        func.sum(hourly_table.c.record_count).label("count"),
+        func.sum(hourly_table.c.amount_sum).label("sum"),
+        func.min(hourly_table.c.amount_min).label("min"),
+        func.max(hourly_table.c.amount_max).label("max"),
+    )
+    return _grouped(stmt, query, columns, hourly_table.c.hour, dialect)
+
+
+def _grouped(stmt, query: AggregateQuery, columns: dict, time_column, dialect: str):
+    groups = []
+    for name in query.group_by:
+        if name in BUCKETS:
+            groups.append(time_bucket(time_column, name, dialect).label("bucket"))
+        else:
+            groups.append(columns[name].label(name))
+
+    if query.currency:
+        stmt = stmt.where(columns["currency"] == query.currency.upper())
+    if query.channel:
+        stmt = stmt.where(columns["channel"] == query.channel)
+    if query.source:
+        stmt = stmt.where(columns["source"] == query.source)
+    if query.since:
+        stmt = stmt.where(time_column >= query.since)
+    if query.until:
+        stmt = stmt.where(time_column < query.until)
+
+    if not groups:
+        return stmt
+    keys = [group.element for group in groups]
+    return stmt.add_columns(*groups).group_by(*keys).order_by(*keys)
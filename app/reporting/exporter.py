@@ -1,17 +1,60 @@
 """
     ReportExporter is responsible for generating reports of processed data and validation failures.
-    It supports multiple formats (CSV, JSON, XLSX) and ensures efficient data retrieval and formatting.
+    It supports multiple formats (CSV, JSON, NDJSON, XLSX) and ensures efficient data retrieval and formatting.
     This class abstracts the reporting logic away from the API layer, allowing for clean separation of concerns.
+
+    CSV, JSON and NDJSON are streamed: rows are pulled from a server-side cursor in
+    EXPORT_CHUNK_SIZE partitions and encoded chunk by chunk, so memory stays flat
+    regardless of table size. XLSX is streamed from the same cursor into an openpyxl
+    write_only workbook spooled to a temp file (a new sheet every 1,048,575 rows,
+    Excel's limit), which is then sent in chunks.
+
+    Every export can be bounded by `upto` (a row id watermark, see `watermark`),
+    so a cached body and its ETag always describe exactly the same rows.
+
+    ReportFilters narrow an export and page through it by keyset: rows with
+    id > after_id, in id order, at most `limit` of them. Pass the last id of
+    a page as the next after_id to pull incremental slices.
 """
+import csv
 import io
+import json
+import tempfile
+from dataclasses import astuple, dataclass
+from datetime import datetime
+from typing import AsyncIterator
 import pandas as pd
-from sqlalchemy import select
+from openpyxl import Workbook
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.models import ProcessedData
+from sqlalchemy.sql import Select
 from app.core.config import settings
-from app.models.models import ProcessedData, IngestionError # Import both models
+from app.models.database import read_session_factory
+from app.models.models import ProcessedData, IngestionError, RawData # Import both models
+from app.crud.rollups import rollup_table
+from app.core.metrics import EXPORT_SECONDS
 import asyncio
 
+
+@dataclass(frozen=True)
+class ReportFilters:
+    """
+    Optional export filters. `since` / `until` bound processed_at for the
+    report and created_at for errors; currency and status only apply to the
+    report. after_id / limit form the keyset cursor.
+    """
+    currency: str | None = None
+    source: str | None = None
+    status: str | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+    after_id: int | None = None
+    limit: int | None = None
+
+    def key(self) -> tuple:
+        return astuple(self)
+
+
 class ReportExporter:
     """
     Requirement #4: Multi-format Reporting System.
@@ -19,47 +62,185 @@ class ReportExporter:
     """
 
     @staticmethod
-    async def get_report_data(db: AsyncSession):
-        result = await db.execute(select(ProcessedData))
-        records = result.scalars().all()
-        data = [
-            {
-                "id": r.id,
-                "external_id": r.external_id,
-                "amount": r.amount,
-                "currency": r.currency,
-                "status": r.status,
-                "processed_at": r.processed_at
-            } for r in records
-        ]
-        return await asyncio.to_thread(pd.DataFrame, data)
+    def report_query(upto: int | None = None, filters: ReportFilters | None = None) -> Select:
+        query = select(
+            ProcessedData.id,
+            ProcessedData.external_id,
+            ProcessedData.amount,
+            ProcessedData.currency,
+            ProcessedData.source_channel,
+            ProcessedData.timestamp,
+            ProcessedData.status,
+            ProcessedData.processed_at,
+        ).order_by(ProcessedData.id)
+        if upto is not None:
+            query = query.where(ProcessedData.id <= upto)
+        if filters is None:
+            return query
+
+        if filters.currency:
+            query = query.where(ProcessedData.currency == filters.currency.upper())
+        if filters.status:
+            query = query.where(ProcessedData.status == filters.status)
+        if filters.source:
+            query = query.join(RawData, RawData.id == ProcessedData.raw_id).where(RawData.source == filters.source)
+        if filters.since:
+            query = query.where(ProcessedData.processed_at >= filters.since)
+        if filters.until:
+            query = query.where(ProcessedData.processed_at < filters.until)
+        return _page(query, ProcessedData.id, filters)
+
+    @staticmethod
+    def error_query(upto: int | None = None, filters: ReportFilters | None = None) -> Select:
+        query = select(
+            IngestionError.id,
+            IngestionError.source_path.label("source"),
+            # compact storage keeps codes only: render "<fields>: <codes>" instead
+            func.coalesce(
+                IngestionError.error_message,
+                IngestionError.error_fields + ": " + IngestionError.error_code,
+            ).label("error"),
+            IngestionError.raw_content.label("raw_payload"),
+            IngestionError.created_at.label("failed_at"),
+        ).order_by(IngestionError.id)
+        if upto is not None:
+            query = query.where(IngestionError.id <= upto)
+        if filters is None:
+            return query
+
+        if filters.source:
+            query = query.where(IngestionError.source_type == filters.source)
+        if filters.since:
+            query = query.where(IngestionError.created_at >= filters.since)
+        if filters.until:
+            query = query.where(IngestionError.created_at < filters.until)
+        return _page(query, IngestionError.id, filters)
+
+    @staticmethod
+    async def next_cursor(db: AsyncSession, query: Select) -> int | None:
+        """Id of the last row of a paged query (the next `after_id`)."""
+        page = query.subquery()
+        # pylint: disable=not-callable
+        return (await db.execute(select(func.max(page.c.id)))).scalar()
+
+    @staticmethod
+    async def watermark(db: AsyncSession, kind: str) -> tuple[int | None, int]:
+        """
+        (max id, row count) of the table behind a report kind ("report" or
+        "errors"). Both are index/rollup lookups; the count catches deletions
+        that leave the max id unchanged. A max id of None means no rows.
+        """
+        # pylint: disable=not-callable
+        if kind == "report":
+            model_id, counter = ProcessedData.id, rollup_table.c.success_count
+        else:
+            model_id, counter = IngestionError.id, rollup_table.c.failure_count
+        max_id = (await db.execute(select(func.max(model_id)))).scalar()
+        count = (await db.execute(select(func.coalesce(func.sum(counter), 0)))).scalar()
+        return max_id, count
+
+    @staticmethod
+    async def has_rows(db: AsyncSession, query: Select) -> bool:
+        """Cheap emptiness probe, so empty tables never open a stream."""
+        return (await db.execute(query.limit(1))).first() is not None
+
+    @staticmethod
+    async def get_report_data(db: AsyncSession, upto: int | None = None, filters: ReportFilters | None = None):
+        result = await db.execute(ReportExporter.report_query(upto, filters))
+        return await asyncio.to_thread(pd.DataFrame, result.mappings().all())
 
     @staticmethod
-    async def get_error_data(db: AsyncSession):
+    async def get_error_data(db: AsyncSession, upto: int | None = None, filters: ReportFilters | None = None):
         """Helper to fetch validation failures"""
-        result = await db.execute(select(IngestionError))
-        records = result.scalars().all()
-        data = [
-            {
-                "id": r.id,
-                "source": r.source_path,
-                "error": r.error_message,
-                "raw_payload": r.raw_content,
-                "failed_at": r.created_at
-            } for r in records
-        ]
-        return await asyncio.to_thread(pd.DataFrame,data)
+        result = await db.execute(ReportExporter.error_query(upto, filters))
+        return await asyncio.to_thread(pd.DataFrame, result.mappings().all())
 
     @classmethod
-    async def export(cls, db: AsyncSession, format: str):
-        df = await cls.get_report_data(db)
-        return await cls._generate_bytes(df, format)
+    async def export(cls, db: AsyncSession, format: str, upto: int | None = None, filters: ReportFilters | None = None):
+        with EXPORT_SECONDS.time(stage="query", format=format.lower()):
+            df = await cls.get_report_data(db, upto, filters)
+        with EXPORT_SECONDS.time(stage="serialise", format=format.lower()):
+            return await cls._generate_bytes(df, format)
 
     @classmethod
-    async def export_errors(cls, db: AsyncSession, format: str):
+    async def export_errors(
+        cls, db: AsyncSession, format: str, upto: int | None = None, filters: ReportFilters | None = None
+    ):
         """New: Export logic for the Dead Letter table"""
-        df = await cls.get_error_data(db)        
-        return await cls._generate_bytes(df, format)
+        with EXPORT_SECONDS.time(stage="query", format=format.lower()):
+            df = await cls.get_error_data(db, upto, filters)
+        with EXPORT_SECONDS.time(stage="serialise", format=format.lower()):
+            return await cls._generate_bytes(df, format)
+
+    @classmethod
+    def stream_report(
+        cls, format: str, upto: int | None = None, filters: ReportFilters | None = None
+    ) -> AsyncIterator[bytes]:
+        return cls._streamer(format)(cls.report_query(upto, filters), format)
+
+    @classmethod
+    def stream_errors(
+        cls, format: str, upto: int | None = None, filters: ReportFilters | None = None
+    ) -> AsyncIterator[bytes]:
+        return cls._streamer(format)(cls.error_query(upto, filters), format)
+
+    @staticmethod
+    def is_streamable(format: str) -> bool:
+        return format.lower() in _ENCODERS or format.lower() == settings.FILE_XLSX
+
+    @classmethod
+    def _streamer(cls, format: str):
+        return cls._stream_xlsx if format.lower() == settings.FILE_XLSX else cls._stream
+
+    @staticmethod
+    async def _stream(query: Select, format: str) -> AsyncIterator[bytes]:
+        """
+        Streams `query` as encoded chunks. The generator owns its session: the
+        request-scoped one is closed before a StreamingResponse body is sent.
+        """
+        fmt = format.lower()
+        encode = _ENCODERS.get(fmt)
+        if encode is None:
+            raise ValueError(f"Format {fmt} not supported for streaming.")
+
+        async with read_session_factory() as db:
+            result = await db.stream(query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE))
+            columns = list(result.keys())
+            first = True
+            async for rows in EXPORT_SECONDS.time_iter(result.partitions(), stage="query", format=fmt):
+                with EXPORT_SECONDS.time(stage="serialise", format=fmt):
+                    encoded = await asyncio.to_thread(encode, columns, rows, first)
+                yield encoded
+                first = False
+
+        if fmt == settings.FILE_JSON:
+            yield b"[]" if first else b"]"
+        elif fmt == settings.FILE_CSV and first:
+            # empty slice: still a well-formed CSV
+            yield encode(columns, [], True)
+
+    @staticmethod
+    async def _stream_xlsx(query: Select, format: str = settings.FILE_XLSX) -> AsyncIterator[bytes]:
+        """
+        Streams `query` as an xlsx workbook. A zip cannot be sent before it is
+        complete, so rows go from the cursor into a write_only workbook (which
+        keeps nothing in memory), the workbook is saved to a temp file and the
+        file is then streamed in XLSX_READ_BYTES chunks.
+        """
+        fmt = settings.FILE_XLSX
+        with tempfile.TemporaryFile(dir=settings.REPORT_CACHE_DIR or None) as spool:
+            async with read_session_factory() as db:
+                result = await db.stream(query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE))
+                book = _XlsxBook(list(result.keys()))
+                async for rows in EXPORT_SECONDS.time_iter(result.partitions(), stage="query", format=fmt):
+                    with EXPORT_SECONDS.time(stage="serialise", format=fmt):
+                        await asyncio.to_thread(book.append, rows)
+
+            with EXPORT_SECONDS.time(stage="serialise", format=fmt):
+                await asyncio.to_thread(book.save, spool)
+            spool.seek(0)
+            while chunk := await asyncio.to_thread(spool.read, XLSX_READ_BYTES):
+                yield chunk
 
     @staticmethod
     async def _generate_bytes(df: pd.DataFrame, format: str):
@@ -76,21 +257,102 @@ class ReportExporter:
         if fmt == settings.FILE_CSV:
             content = await asyncio.to_thread(lambda: df.to_csv(index=False).encode())
             return content, content_type
-        
+
         # JSON conversion
         if fmt == settings.FILE_JSON:
             content = await asyncio.to_thread(lambda: df.to_json(orient="records").encode())
             return content, content_type
-        
+
         # Excel is the heaviest - definitely needs a thread
         if fmt == settings.FILE_XLSX:
             def to_excel():
                 output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False)
+                book = _XlsxBook([str(column) for column in df.columns])
+                book.append(df.itertuples(index=False, name=None))
+                book.save(output)
                 return output.getvalue()
-                
+
             content = await asyncio.to_thread(to_excel)
             return content, content_type
 
-        raise ValueError(f"Logic error: {fmt} registered but not implemented.")
\ No newline at end of file
+        raise ValueError(f"Logic error: {fmt} registered but not implemented.")
+
+
+def _page(query: Select, id_column, filters: ReportFilters) -> Select:
+    if filters.after_id is not None:
+        query = query.where(id_column > filters.after_id)
+    if filters.limit is not None:
+        query = query.limit(filters.limit)
+    return query
+
+
+def _dumps(columns: list[str], row) -> str:
+    return json.dumps(dict(zip(columns, row)), default=_json_default, separators=(",", ":"))
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_csv(columns: list[str], rows: list, first: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if first:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(columns: list[str], rows: list, first: bool) -> bytes:
+    return "".join(
+        _dumps(columns, row) + "\n" for row in rows
+    ).encode()
+
+
+def _encode_json(columns: list[str], rows: list, first: bool) -> bytes:
+    body = ",".join(_dumps(columns, row) for row in rows)
+    return (("[" if first else ",") + body).encode()
+
+
+# Excel's row limit per sheet, header row included
+XLSX_MAX_ROWS = 1_048_576
+XLSX_READ_BYTES = 1024 * 1024
+
+
+class _XlsxBook:
+    """
+    openpyxl write_only workbook: rows are serialised to the sheet's temp
+    file as they are appended. Starts a new sheet (with the header repeated)
+    whenever the current one reaches XLSX_MAX_ROWS.
+    """
+    def __init__(self, columns: list[str]):
+        self.columns = columns
+        self.workbook = Workbook(write_only=True)
+        self._sheet = None
+        self._sheet_rows = 0
+
+    def append(self, rows) -> None:
+        for row in rows:
+            if self._sheet is None or self._sheet_rows >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            self._sheet.append(tuple(row))
+            self._sheet_rows += 1
+
+    def save(self, target) -> None:
+        if self._sheet is None:
+            self._new_sheet()
+        self.workbook.save(target)
+
+    def _new_sheet(self) -> None:
+        self._sheet = self.workbook.create_sheet(f"Sheet{len(self.workbook.worksheets) + 1}")
+        self._sheet.append(self.columns)
+        self._sheet_rows = 1
+
+
+_ENCODERS = {
+    settings.FILE_CSV: _encode_csv,
+    settings.FILE_JSON: _encode_json,
+    settings.FILE_NDJSON: _encode_ndjson,
+}
@@ -0,0 +1,227 @@
+"""
+Report Cache
+------------
+Keeps rendered reports keyed by (kind, format, filters, watermark). The
+watermark is the highest row id plus the rollup row count of the exported
+table, so any ingestion produces a new key and old entries simply age out;
+nothing has to be invalidated explicitly.
+
+Entries live in an in-memory LRU bounded by REPORT_CACHE_BYTES. With
+REPORT_CACHE_DIR set, entries evicted from memory (or too large for it) are
+spilled to disk, itself bounded by REPORT_CACHE_DISK_BYTES. A streamed
+export is only buffered in memory up to `memory_limit` (a share of
+REPORT_CACHE_BYTES); beyond that it is written to the spill directory chunk
+by chunk as it streams, or not cached at all without one.
+
+Example usage:
+    key = ReportKey("report", "csv", (), await ReportExporter.watermark(db, "report"))
+    cached = await report_cache.get(key)
+    etag = report_cache.etag(key)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import AsyncIterator, BinaryIO, Iterator, NamedTuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SPILL_CHUNK_SIZE = 1024 * 1024
+# a streamed body is buffered in memory only up to 1/MEMORY_ENTRY_SHARE of the memory budget
+MEMORY_ENTRY_SHARE = 16
+
+
+class ReportKey(NamedTuple):
+    kind: str
+    format: str
+    filters: tuple
+    watermark: tuple
+
+
+class ReportCache:
+    """
+    LRU byte-budgeted cache of rendered report bodies with optional disk spill.
+
+    `get` returns bytes for in-memory hits, an iterator over an already
+    opened spill file for disk hits, or None.
+    """
+    def __init__(self, max_bytes: int, spill_dir: str = "", spill_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_bytes = spill_bytes
+        self._entries: OrderedDict[ReportKey, bytes] = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def etag(key: ReportKey) -> str:
+        return f'"{_digest(key)}"'
+
+    @property
+    def memory_limit(self) -> int:
+        """Largest streamed body buffered in memory; larger ones go to the spill directory as they stream."""
+        return self.max_bytes // MEMORY_ENTRY_SHARE
+
+    async def get(self, key: ReportKey) -> bytes | Iterator[bytes] | None:
+        content = self._entries.get(key)
+        if content is not None:
+            self._entries.move_to_end(key)
+            return content
+        if not self.spill_dir:
+            return None
+        try:
+            handle = await asyncio.to_thread(open, self._spill_path(key), "rb")
+        except FileNotFoundError:
+            return None
+        return _read_file(handle)
+
+    async def put(self, key: ReportKey, content: bytes) -> None:
+        if len(content) <= self.max_bytes:
+            if key in self._entries:
+                return
+            self._entries[key] = content
+            self._size += len(content)
+            evicted = []
+            while self._size > self.max_bytes:
+                old_key, old_content = self._entries.popitem(last=False)
+                self._size -= len(old_content)
+                evicted.append((old_key, old_content))
+            for old_key, old_content in evicted:
+                await self._spill(old_key, old_content)
+        else:
+            await self._spill(key, content)
+
+    async def tee(self, key: ReportKey, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Passes `chunks` through to the client and caches the body once the
+        stream completes. Up to `memory_limit` bytes are buffered in memory;
+        past that the body is written to a temp file in the spill directory
+        chunk by chunk and renamed into place at the end. Not kept: larger
+        bodies when there is no spill directory, bodies over the spill
+        budget, and streams the client abandoned.
+        """
+        parts: list[bytes] = []
+        spill: BinaryIO | None = None
+        caching = True
+        size = 0
+        try:
+            async for chunk in chunks:
+                if caching:
+                    size += len(chunk)
+                    parts.append(chunk)
+                    if spill is not None or size > self.memory_limit:
+                        caching, spill = await self._spill_parts(spill, parts, size)
+                        parts = []
+                yield chunk
+            if caching and spill is None:
+                await self.put(key, b"".join(parts))
+            elif caching:
+                finished, spill = spill, None
+                try:
+                    await asyncio.to_thread(self._finish_spill, finished, self._spill_path(key))
+                except OSError as exc:
+                    logger.warning("Report cache spill failed: %s", exc)
+                    _discard(finished)
+        finally:
+            if spill is not None:
+                _discard(spill)
+
+    async def _spill_parts(self, spill: BinaryIO | None, parts: list[bytes], size: int) -> tuple[bool, BinaryIO | None]:
+        """
+        Appends `parts` to the body's spill file (opened on first use).
+        Returns (still caching, spill file); a body without a spill directory
+        or over its budget stops being cached.
+        """
+        try:
+            if self.spill_dir and size <= self.spill_bytes:
+                if spill is None:
+                    spill = await asyncio.to_thread(self._open_spill)
+                await asyncio.to_thread(spill.writelines, parts)
+                return True, spill
+        except OSError as exc:
+            logger.warning("Report cache spill failed: %s", exc)
+        if spill is not None:
+            _discard(spill)
+        return False, None
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def _spill_path(self, key: ReportKey) -> str:
+        return os.path.join(self.spill_dir, f"{_digest(key)}.{key.format}")
+
+    async def _spill(self, key: ReportKey, content: bytes) -> None:
+        if not self.spill_dir or len(content) > self.spill_bytes:
+            return
+        try:
+            await asyncio.to_thread(self._write_spill, self._spill_path(key), content)
+        except OSError as exc:
+            logger.warning("Report cache spill failed: %s", exc)
+
+    def _write_spill(self, path: str, content: bytes) -> None:
+        spill = self._open_spill()
+        try:
+            spill.write(content)
+        except OSError:
+            _discard(spill)
+            raise
+        self._finish_spill(spill, path)
+
+    def _open_spill(self) -> BinaryIO:
+        """A temp file in the spill directory, unique so concurrent writers of one key never share it."""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.spill_dir, suffix=".tmp", delete=False)
+
+    def _finish_spill(self, spill: BinaryIO, path: str) -> None:
+        # write-then-rename so readers never see a partial file
+        spill.close()
+        os.replace(spill.name, path)
+
+        # Trim the oldest files until the directory fits its budget
+        files = []
+        for entry in os.scandir(self.spill_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, file_path in sorted(files):
+            if total <= self.spill_bytes:
+                break
+            if file_path == path:
+                continue
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _digest(key: ReportKey) -> str:
+    return hashlib.sha1(repr(tuple(key)).encode()).hexdigest()[:24]
+
+
+def _discard(spill: BinaryIO) -> None:
+    spill.close()
+    try:
+        os.remove(spill.name)
+    except FileNotFoundError:
+        pass
+
+
+def _read_file(handle) -> Iterator[bytes]:
+    # The handle was opened before returning, so a concurrent eviction
+    # (unlink) cannot pull the file out from under the response.
+    with handle:
+        while chunk := handle.read(SPILL_CHUNK_SIZE):
+            yield chunk
+
+
+report_cache = ReportCache(
+    settings.REPORT_CACHE_BYTES,
+    settings.REPORT_CACHE_DIR,
+    settings.REPORT_CACHE_DISK_BYTES,
+)
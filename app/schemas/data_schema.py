@@ -14,9 +14,12 @@ Example usage:
         print(record)
     except ValidationError as e:
         print("Validation error:", e)
+
+    # validate against another currency list than settings.ALLOWED_CURRENCIES
+    DataRecord.model_validate(data, context={"allowed_currencies": {"USD", "JPY"}})
 """
 from datetime import datetime
-from pydantic import Field, BaseModel, field_validator
+from pydantic import Field, BaseModel, ValidationInfo, field_validator
 from app.core.config import settings
 
 
@@ -38,11 +41,13 @@ class DataRecord(BaseModel):
 
     @field_validator('currency')
     @classmethod
-    def validate_currency(cls, value: str) -> str:
+    def validate_currency(cls, value: str, info: ValidationInfo) -> str:
         """
-        check for validate currencies
+        check for validate currencies (the "allowed_currencies" validation
+        context, if given, else settings.ALLOWED_CURRENCIES)
         """
-        if value.upper() not in settings.ALLOWED_CURRENCIES:
+        allowed = (info.context or {}).get("allowed_currencies", settings.ALLOWED_CURRENCIES)
+        if value.upper() not in allowed:
             raise ValueError(f"Currency {value} is not supported by our system")
         return value.upper()
     
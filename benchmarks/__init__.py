@@ -0,0 +1,8 @@
+"""
+Reproducible benchmarks for ingestion, storage and export.
+
+    python -m benchmarks.data_generator large.csv --rows 1000000
+    python -m benchmarks.run --rows 1000000 --compare benchmarks/results/<previous>.json
+
+See benchmarks/run.py for the result format.
+"""
@@ -0,0 +1,135 @@
+"""
+Benchmark Data Generator
+------------------------
+Writes reproducible transaction files (same seed -> same bytes) in CSV or
+NDJSON, optionally compressed, with a configurable share of invalid rows.
+Invalid rows rotate through the failures the validator has to catch:
+non-positive amounts, unsupported currencies, non-numeric amounts, empty
+amounts and future timestamps.
+
+Usage:
+    python -m benchmarks.data_generator out.csv --rows 1000000 --error-rate 0.1
+    python -m benchmarks.data_generator out.ndjson.gz --rows 5000000 --format ndjson --compression gzip
+"""
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import json
+import random
+from datetime import datetime, timedelta
+from typing import BinaryIO
+
+FIELDNAMES = ["external_id", "amount", "currency", "source_channel", "timestamp"]
+VALID_CURRENCIES = ["USD", "EUR", "GBP", "AUD"]
+CHANNELS = ["CHANNEL1", "CHANNEL2", "CHANNEL3", "CHANNEL4"]
+FORMATS = ("csv", "ndjson")
+COMPRESSIONS = ("none", "gzip", "bz2", "zstd")
+# rows generated per write call
+BLOCK_ROWS = 50_000
+
+
+def open_output(path: str, compression: str = "none") -> BinaryIO:
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "bz2":
+        return bz2.open(path, "wb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise SystemExit("zstd compression needs the 'zstandard' package") from exc
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+    if compression != "none":
+        raise ValueError(f"Unknown compression {compression!r}; expected one of {COMPRESSIONS}")
+    return open(path, "wb")
+
+
+def generate_rows(rows: int, error_rate: float = 0.1, seed: int = 42, start_id: int = 0):
+    """Yields row dicts; external ids are TXN-<n> and unique within a run."""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    future = "2999-01-01T00:00:00"
+
+    for i in range(start_id, start_id + rows):
+        row = {
+            "external_id": f"TXN-{i}",
+            "amount": round(rng.uniform(1.0, 5000.0), 2),
+            "currency": rng.choice(VALID_CURRENCIES),
+            "source_channel": rng.choice(CHANNELS),
+            "timestamp": (base + timedelta(seconds=i)).isoformat(),
+        }
+        if rng.random() < error_rate:
+            kind = i % 5
+            if kind == 0:
+                row["amount"] = -abs(row["amount"])
+            elif kind == 1:
+                row["currency"] = rng.choice(["JPY", "CAD", "XXX"])
+            elif kind == 2:
+                row["amount"] = "n/a"
+            elif kind == 3:
+                row["amount"] = ""
+            else:
+                row["timestamp"] = future
+        yield row
+
+
+def write_csv(out: BinaryIO, rows) -> None:
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.DictWriter(text, fieldnames=FIELDNAMES, lineterminator="\n")
+    writer.writeheader()
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) >= BLOCK_ROWS:
+            writer.writerows(block)
+            block = []
+    writer.writerows(block)
+    text.flush()
+    text.detach()
+
+
+def write_ndjson(out: BinaryIO, rows) -> None:
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    block = []
+    for row in rows:
+        block.append(dumps(row))
+        if len(block) >= BLOCK_ROWS:
+            out.write(("\n".join(block) + "\n").encode())
+            block = []
+    if block:
+        out.write(("\n".join(block) + "\n").encode())
+
+
+def generate(
+    path: str,
+    rows: int,
+    error_rate: float = 0.1,
+    fmt: str = "csv",
+    compression: str = "none",
+    seed: int = 42,
+) -> str:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+    with open_output(path, compression) as out:
+        (write_csv if fmt == "csv" else write_ndjson)(out, generate_rows(rows, error_rate, seed))
+    return path
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    generate(args.path, args.rows, args.error_rate, args.format, args.compression, args.seed)
+    print(f"Generated {args.path}: {args.rows:,} rows, {args.error_rate:.0%} invalid, {args.format}/{args.compression}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark Harness
+-----------------
+Measurement helpers shared by the suites. Every benchmark runs in a fresh
+spawned process (see `run_isolated`) so peak RSS belongs to that benchmark
+alone and module-level singletons (settings, engine, caches) start clean.
+"""
+import multiprocessing
+import os
+import queue as queue_module
+import resource
+import time
+from dataclasses import asdict, dataclass, field
+
+# how often run_isolated checks that the benchmark process is still alive
+POLL_SECONDS = 1.0
+
+
+@dataclass
+class BenchResult:
+    name: str
+    rows: int = 0
+    seconds: float = 0.0
+    batches: int = 0
+    rows_per_sec: float = 0.0
+    peak_rss_mb: float = 0.0
+    batch_p50_ms: float | None = None
+    batch_p99_ms: float | None = None
+    extra: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class BatchTimer:
+    """
+    Collects per-batch latencies plus the total wall time of a benchmark.
+
+        timer = BatchTimer()
+        for batch in batches:
+            with timer.batch():
+                work(batch)
+        result = timer.result("name", rows)
+    """
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.started = time.perf_counter()
+        self._batch_started: float | None = None
+
+    def batch(self):
+        return _BatchContext(self)
+
+    def mark(self) -> None:
+        """Closes the batch that started at the previous mark (or at start)."""
+        now = time.perf_counter()
+        self.latencies.append(now - (self._batch_started or self.started))
+        self._batch_started = now
+
+    def result(self, name: str, rows: int, **extra) -> BenchResult:
+        seconds = time.perf_counter() - self.started
+        return BenchResult(
+            name=name,
+            rows=rows,
+            seconds=round(seconds, 4),
+            batches=len(self.latencies),
+            rows_per_sec=round(rows / seconds, 1) if seconds > 0 else 0.0,
+            peak_rss_mb=peak_rss_mb(),
+            batch_p50_ms=_percentile_ms(self.latencies, 50),
+            batch_p99_ms=_percentile_ms(self.latencies, 99),
+            extra=extra,
+        )
+
+
+class _BatchContext:
+    def __init__(self, timer: BatchTimer):
+        self.timer = timer
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.latencies.append(time.perf_counter() - self.start)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _percentile_ms(values: list[float], percentile: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[index] * 1000, 3)
+
+
+def _child(target, args, env, queue):
+    os.environ.update(env)
+    try:
+        queue.put(("ok", target(*args).as_dict()))
+    except BaseException as exc:  # reported to the parent, which decides what to do
+        queue.put(("error", f"{type(exc).__name__}: {exc}"))
+
+
+def run_isolated(target, args: tuple = (), env: dict | None = None) -> dict:
+    """
+    Runs `target(*args) -> BenchResult` in a spawned process with `env`
+    applied before any app module is imported. Returns the result dict.
+    Raises RuntimeError if the benchmark fails, or if its process dies
+    (killed, segfault, os._exit) without reporting.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(target, args, env or {}, queue))
+    process.start()
+    try:
+        status, payload = _result(process, queue)
+    except BaseException:  # e.g. Ctrl-C: do not leave the benchmark running
+        process.terminate()
+        raise
+    finally:
+        process.join()
+    if status != "ok":
+        raise RuntimeError(payload)
+    return payload
+
+
+def _result(process, queue) -> tuple[str, object]:
+    """Waits for the child's report, checking every POLL_SECONDS that it is still running."""
+    while True:
+        try:
+            return queue.get(timeout=POLL_SECONDS)
+        except queue_module.Empty:
+            if process.is_alive():
+                continue
+        # it exited: a report put just before may still be in the pipe
+        try:
+            return queue.get(timeout=POLL_SECONDS)
+        except queue_module.Empty:
+            return "error", f"Benchmark process exited with code {process.exitcode} without reporting a result"
@@ -0,0 +1,170 @@
+"""
+Benchmark Runner
+----------------
+Generates (or reuses) the input files, runs each selected benchmark in its
+own process against its own SQLite database, and writes one JSON file per
+run to the results directory, named <UTC time>-<git sha>.json. Pass
+--compare with an earlier results file to print the rows/sec change and
+flag regressions.
+
+Usage:
+    python -m benchmarks.run --rows 1000000
+    python -m benchmarks.run --rows 5000000 --only execute_csv,export_csv --compare benchmarks/results/<old>.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.data_generator import COMPRESSIONS, generate
+from benchmarks.harness import run_isolated
+from benchmarks.suites import BENCHMARKS, bench_execute_csv
+
+EXPORT_DB = "export.db"
+COMPRESSION_SUFFIX = {"none": "", "gzip": ".gz", "bz2": ".bz2", "zstd": ".zst"}
+
+
+def _git_sha() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _input_file(workdir: str, fmt: str, args) -> str:
+    """Generated inputs are cached by their parameters."""
+    name = f"bench-{args.rows}-{args.error_rate}-{args.seed}.{fmt}{COMPRESSION_SUFFIX[args.compression]}"
+    path = os.path.join(workdir, name)
+    if not os.path.exists(path):
+        print(f"Generating {path} ...", flush=True)
+        generate(path, args.rows, args.error_rate, fmt, args.compression, args.seed)
+    return path
+
+
+def _env(db_path: str) -> dict:
+    return {"DATABASE_URL": f"sqlite+aiosqlite:///{os.path.abspath(db_path)}?timeout=30"}
+
+
+def _reset(db_path: str) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Lines describing rows/sec changes; regressions beyond `threshold` are flagged."""
+    lines = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before.get("rows_per_sec"):
+            continue
+        change = result["rows_per_sec"] / before["rows_per_sec"] - 1
+        flag = "  REGRESSION" if change < -threshold else ""
+        lines.append(
+            f"{name:<24} {before['rows_per_sec']:>12,.0f} -> {result['rows_per_sec']:>12,.0f} rows/s "
+            f"({change:+.1%}){flag}"
+        )
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows per generated input file")
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--kafka-rows", type=int, default=100_000)
+    parser.add_argument("--xlsx-rows", type=int, default=100_000)
+    parser.add_argument("--only", default="", help=f"comma separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--workdir", default=os.path.join("benchmarks", ".data"))
+    parser.add_argument("--out", default=os.path.join("benchmarks", "results"))
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="rows/sec drop reported as a regression")
+    args = parser.parse_args(argv)
+
+    chosen = [name for name in args.only.split(",") if name] or list(BENCHMARKS)
+    unknown = [name for name in chosen if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    # registration order, whatever order --only lists them in: the exports
+    # read the database execute_csv fills
+    selected = [name for name in BENCHMARKS if name in chosen]
+
+    if args.compression != "none" and "execute_csv_parallel" in selected:
+        # byte-range sharding needs an uncompressed file
+        print("Skipping execute_csv_parallel: input is compressed", flush=True)
+        selected.remove("execute_csv_parallel")
+
+    os.makedirs(args.workdir, exist_ok=True)
+    os.makedirs(args.out, exist_ok=True)
+    ctx = {
+        "csv_path": _input_file(args.workdir, "csv", args),
+        "ndjson_path": _input_file(args.workdir, "ndjson", args),
+        "rows": args.rows,
+        "kafka_rows": args.kafka_rows,
+        "xlsx_rows": args.xlsx_rows,
+    }
+
+    export_db = os.path.join(args.workdir, EXPORT_DB)
+    if any(BENCHMARKS[name][1] for name in selected) and "execute_csv" not in selected:
+        # Exports read the database the csv execute benchmark leaves behind
+        print("Populating the export database ...", flush=True)
+        _reset(export_db)
+        run_isolated(bench_execute_csv, (ctx,), _env(export_db))
+
+    results = {}
+    for name in selected:
+        bench, uses_export_db = BENCHMARKS[name]
+        db_path = export_db if uses_export_db or name == "execute_csv" else os.path.join(args.workdir, f"{name}.db")
+        if not uses_export_db:
+            _reset(db_path)
+        print(f"Running {name} ...", flush=True)
+        result = run_isolated(bench, (ctx,), _env(db_path))
+        results[name] = result
+        print(
+            f"  {result['rows']:,} rows in {result['seconds']:.2f}s = {result['rows_per_sec']:,.0f} rows/s, "
+            f"peak RSS {result['peak_rss_mb']} MB, batch p50 {result['batch_p50_ms']} ms / p99 {result['batch_p99_ms']} ms",
+            flush=True,
+        )
+        if not uses_export_db and name != "execute_csv":
+            _reset(db_path)
+
+    sha = _git_sha()
+    report = {
+        "commit": sha,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {
+            "rows": args.rows,
+            "error_rate": args.error_rate,
+            "compression": args.compression,
+            "seed": args.seed,
+            "kafka_rows": args.kafka_rows,
+            "xlsx_rows": args.xlsx_rows,
+        },
+        "results": results,
+    }
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(args.out, f"{stamp}-{sha}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            lines = compare(report, json.load(f), args.threshold)
+        print("\n".join(lines))
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Benchmark Suites
+----------------
+One function per benchmark, each `bench_<name>(ctx) -> BenchResult`. They
+run inside `run_isolated`, so app modules are imported lazily: DATABASE_URL
+and friends must be in the environment before app.core.config loads.
+
+`ctx` keys: csv_path, ndjson_path, rows, kafka_rows, xlsx_rows.
+"""
+import asyncio
+
+from benchmarks.data_generator import generate_rows
+from benchmarks.harness import BatchTimer, BenchResult
+
+
+def _timed_orchestrator(timer: BatchTimer):
+    from app.core.orchestrator import DataOrchestrator
+
+    class TimedOrchestrator(DataOrchestrator):
+        """Marks a batch every time a chunk has been persisted."""
+        async def save_chunk(self, *args, **kwargs):
+            saved = await super().save_chunk(*args, **kwargs)
+            timer.mark()
+            return saved
+
+        async def save_staged(self, *args, **kwargs):
+            saved = await super().save_staged(*args, **kwargs)
+            timer.mark()
+            return saved
+
+    return TimedOrchestrator()
+
+
+async def _fresh_db():
+    from app.models.database import init_db
+    await init_db()
+
+
+def _ingestor_bench(name: str, ingestor, path: str) -> BenchResult:
+    from app.core.config import settings
+
+    async def run():
+        timer = BatchTimer()
+        rows = malformed = 0
+        async for batch in ingestor.stream_batches(path, settings.BATCH_SIZE):
+            rows += batch.size
+            malformed += len(batch.malformed)
+            timer.mark()
+        return timer.result(name, rows + malformed, malformed=malformed)
+
+    return asyncio.run(run())
+
+
+def bench_ingest_csv(ctx: dict) -> BenchResult:
+    from app.ingestors.csv_ingestor import CSVIngestor
+    return _ingestor_bench("ingest_csv", CSVIngestor(), ctx["csv_path"])
+
+
+def bench_ingest_ndjson(ctx: dict) -> BenchResult:
+    from app.ingestors.json_ingestor import JSONIngestor
+    return _ingestor_bench("ingest_ndjson", JSONIngestor(), ctx["ndjson_path"])
+
+
+def _execute_bench(name: str, source_type: str, path: str, parallel: bool = False) -> BenchResult:
+    from app.models.database import async_session_factory
+
+    async def run():
+        await _fresh_db()
+        timer = BatchTimer()
+        orchestrator = _timed_orchestrator(timer)
+        async with async_session_factory() as db:
+            stats = await orchestrator.execute(db, source_type, path, parallel=parallel)
+        return timer.result(
+            name, stats.rows,
+            valid=stats.valid_count, errors=stats.error_count, duplicates=stats.duplicate_count,
+        )
+
+    return asyncio.run(run())
+
+
+def bench_execute_csv(ctx: dict) -> BenchResult:
+    return _execute_bench("execute_csv", "csv", ctx["csv_path"])
+
+
+def bench_execute_ndjson(ctx: dict) -> BenchResult:
+    return _execute_bench("execute_ndjson", "json", ctx["ndjson_path"])
+
+
+def bench_execute_csv_parallel(ctx: dict) -> BenchResult:
+    return _execute_bench("execute_csv_parallel", "csv", ctx["csv_path"], parallel=True)
+
+
+def bench_execute_csv_unstaged(ctx: dict) -> BenchResult:
+    """execute_csv with INGEST_STAGING off: compare its peak RSS with execute_csv's."""
+    from app.core.config import settings
+    settings.INGEST_STAGING = False
+    return _execute_bench("execute_csv_unstaged", "csv", ctx["csv_path"])
+
+
+def bench_save_ingestion_batch(ctx: dict) -> BenchResult:
+    """Storage alone: pre-validated batches straight into save_ingestion_batch."""
+    from datetime import datetime
+    from app.core.config import settings
+    from app.crud.storage import save_ingestion_batch
+    from app.models.database import async_session_factory
+
+    def batches():
+        batch = []
+        for row in generate_rows(ctx["rows"], error_rate=0.0):
+            validated = {**row, "timestamp": datetime.fromisoformat(row["timestamp"])}
+            batch.append({"type": "csv", "raw": row, "validated": validated})
+            if len(batch) >= settings.BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def run():
+        await _fresh_db()
+        timer = BatchTimer()
+        rows = 0
+        async with async_session_factory() as db:
+            for batch in batches():
+                with timer.batch():
+                    await save_ingestion_batch(db, batch)
+                rows += len(batch)
+        return timer.result("save_ingestion_batch", rows)
+
+    return asyncio.run(run())
+
+
+def _export_bench(fmt: str, ctx: dict) -> BenchResult:
+    from app.reporting.exporter import ReportExporter, ReportFilters
+    from app.models.database import async_session_factory
+
+    async def run():
+        timer = BatchTimer()
+        size = 0
+        # xlsx is far slower per row: bounded to xlsx_rows
+        limit = ctx["xlsx_rows"] if fmt == "xlsx" else None
+        async for chunk in ReportExporter.stream_report(fmt, filters=ReportFilters(limit=limit)):
+            size += len(chunk)
+            timer.mark()
+        async with async_session_factory() as db:
+            _, count = await ReportExporter.watermark(db, "report")
+        rows = min(limit, count) if limit is not None else count
+        return timer.result(f"export_{fmt}", rows, bytes=size)
+
+    return asyncio.run(run())
+
+
+def bench_export_csv(ctx: dict) -> BenchResult:
+    return _export_bench("csv", ctx)
+
+
+def bench_export_json(ctx: dict) -> BenchResult:
+    return _export_bench("json", ctx)
+
+
+def bench_export_ndjson(ctx: dict) -> BenchResult:
+    return _export_bench("ndjson", ctx)
+
+
+def bench_export_xlsx(ctx: dict) -> BenchResult:
+    return _export_bench("xlsx", ctx)
+
+
+def bench_kafka(ctx: dict) -> BenchResult:
+    """Micro-batch consumer against LocalKafkaConsumer (no broker)."""
+    from app.core.kafka_worker import KafkaWorker
+    from app.ingestors.kakfa_ingestor import KafkaIngestor, LocalKafkaConsumer
+
+    async def run():
+        await _fresh_db()
+        limit = ctx["kafka_rows"]
+        consumer = LocalKafkaConsumer(KafkaIngestor(interval=0), limit=limit)
+        worker = KafkaWorker(consumer=consumer)
+        timer = BatchTimer()
+        worker.orchestrator = _timed_orchestrator(timer)
+        await worker.start()
+        while consumer.committed < limit - 1:
+            if worker._task.done():
+                raise RuntimeError("Kafka worker stopped before consuming every message")
+            await asyncio.sleep(0.01)
+        result = timer.result("kafka", limit)
+        await worker.stop()
+        return result
+
+    return asyncio.run(run())
+
+
+# name -> (benchmark, needs the populated export database)
+BENCHMARKS = {
+    "ingest_csv": (bench_ingest_csv, False),
+    "ingest_ndjson": (bench_ingest_ndjson, False),
+    "execute_csv": (bench_execute_csv, False),
+    "execute_ndjson": (bench_execute_ndjson, False),
+    "execute_csv_parallel": (bench_execute_csv_parallel, False),
+    "execute_csv_unstaged": (bench_execute_csv_unstaged, False),
+    "save_ingestion_batch": (bench_save_ingestion_batch, False),
+    "export_csv": (bench_export_csv, True),
+    "export_json": (bench_export_json, True),
+    "export_ndjson": (bench_export_ndjson, True),
+    "export_xlsx": (bench_export_xlsx, True),
+    "kafka": (bench_kafka, False),
+}
@@ -25,4 +25,7 @@ def generate_10k_test(filename="large_data.csv"):
             ])
     print(f"✅ Generated {filename} with 10,000 rows.")
 
-generate_10k_test()
+
+if __name__ == "__main__":
+    # Larger / NDJSON / compressed inputs: python -m benchmarks.data_generator --help
+    generate_10k_test()
@@ -0,0 +1,51 @@
+"""
+Test configuration: the app binds its engines when app.models.database is
+first imported, so the database URL is pointed at a per-session temp file
+before any app module loads.
+"""
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="reporting-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_DIR}/reporting.db?timeout=30"
+
+
+async def _reset_db():
+    from app.core.dedup import seen_external_ids
+    from app.models.database import engine, init_db
+    from app.models.models import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await init_db()
+    seen_external_ids.clear()
+
+
+async def _dispose_engines():
+    from app.models.database import engine, read_engine, write_engine
+
+    for bind in {engine, read_engine, write_engine}:
+        await bind.dispose()
+
+
+@pytest.fixture
+def run():
+    """
+    `run(coroutine)` runs it on a fresh event loop against empty tables.
+    Pooled connections belong to the loop that opened them, so they are
+    disposed before the loop closes.
+    """
+    def run_test(coroutine):
+        async def main():
+            try:
+                await _reset_db()
+                return await coroutine
+            finally:
+                await _dispose_engines()
+
+        return asyncio.run(main())
+
+    return run_test
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.batch_validator import BatchValidator
+from app.ingestors.base_ingestor import ColumnBatch
+from benchmarks.data_generator import generate_rows
+
+NOW = datetime.now()
+
+EDGE_CASES = [
+    # amounts
+    {"external_id": "a1", "amount": 10, "currency": "USD", "source_channel": "web"},
+    {"external_id": "a2", "amount": 10.5, "currency": "USD", "source_channel": "web"},
+    {"external_id": "a3", "amount": "10.50", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a4", "amount": " 12 ", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a5", "amount": "1e3", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a6", "amount": ".5", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a7", "amount": "+3", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a8", "amount": "0", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a9", "amount": "-0", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a10", "amount": -4, "currency": "USD", "source_channel": "web"},
+    {"external_id": "a11", "amount": "nan", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a12", "amount": "inf", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a13", "amount": "1e400", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a14", "amount": 10**400, "currency": "USD", "source_channel": "web"},
+    {"external_id": "a15", "amount": "", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a16", "amount": "n/a", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a17", "amount": None, "currency": "USD", "source_channel": "web"},
+    {"external_id": "a18", "amount": True, "currency": "USD", "source_channel": "web"},
+    {"external_id": "a19", "amount": [1], "currency": "USD", "source_channel": "web"},
+    {"external_id": "a20", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a21", "amount": "1_000", "currency": "USD", "source_channel": "web"},
+    # non-ASCII digits: Arabic-Indic and mathematical bold
+    {"external_id": "a22", "amount": "١٢٣", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a23", "amount": "٣.٥", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a24", "amount": "𝟙", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a25", "amount": "1.", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a26", "amount": "007", "currency": "USD", "source_channel": "web"},
+    {"external_id": "a27", "amount": "1E-3", "currency": "USD", "source_channel": "web"},
+    # currencies
+    {"external_id": "c1", "amount": 1, "currency": "usd", "source_channel": "web"},
+    {"external_id": "c2", "amount": 1, "currency": "eUr", "source_channel": "web"},
+    {"external_id": "c3", "amount": 1, "currency": "JPY", "source_channel": "web"},
+    {"external_id": "c4", "amount": 1, "currency": "", "source_channel": "web"},
+    {"external_id": "c5", "amount": 1, "currency": None, "source_channel": "web"},
+    {"external_id": "c6", "amount": 1, "currency": 840, "source_channel": "web"},
+    {"external_id": "c7", "amount": 1, "source_channel": "web"},
+    {"external_id": "c8", "amount": 1, "currency": " USD", "source_channel": "web"},
+    {"external_id": "c9", "amount": 1, "currency": "ß", "source_channel": "web"},
+    # identifiers and channels
+    {"external_id": 42, "amount": 1, "currency": "USD", "source_channel": "web"},
+    {"external_id": None, "amount": 1, "currency": "USD", "source_channel": "web"},
+    {"amount": 1, "currency": "USD", "source_channel": "web"},
+    {"external_id": "", "amount": 1, "currency": "USD", "source_channel": ""},
+    {"external_id": "i1", "amount": 1, "currency": "USD", "source_channel": 7},
+    {"external_id": "i2", "amount": 1, "currency": "USD"},
+    {"external_id": "ünï\n", "amount": 1, "currency": "USD", "source_channel": "pos\n"},
+    # timestamps
+    {"external_id": "t1", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "2024-01-01T10:00:00"},
+    {"external_id": "t2", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "2024-01-01 10:00"},
+    {"external_id": "t3", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "2024-01-01T10:00:00.5"},
+    {"external_id": "t4", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "2024-01-01"},
+    {"external_id": "t5", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "2999-01-01T00:00:00"},
+    {"external_id": "t6", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "2024-02-30T00:00:00"},
+    {"external_id": "t7", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": ""},
+    {"external_id": "t8", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "yesterday"},
+    {"external_id": "t9", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": None},
+    {"external_id": "t10", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": datetime(2024, 5, 1)},
+    {"external_id": "t11", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": NOW + timedelta(days=1)},
+    {"external_id": "t13", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "2024-01-01T24:00:00"},
+    {"external_id": "t14", "amount": 1, "currency": "USD", "source_channel": "web", "timestamp": "٢٠٢٤-01-01T10:00:00"},
+    # several failures at once, extra fields
+    {"external_id": None, "amount": "x", "currency": "XXX", "source_channel": None, "timestamp": "never"},
+    {"external_id": "x1", "amount": 1, "currency": "USD", "source_channel": "web", "note": {"nested": [1, 2]}},
+]
+
+
+@pytest.fixture
+def validator():
+    return BatchValidator()
+
+
+def _generated(rows: int) -> list[dict]:
+    return list(generate_rows(rows, error_rate=0.3, seed=7))
+
+
+@pytest.mark.parametrize("rows", [_generated(5000), EDGE_CASES, EDGE_CASES * 3 + _generated(200)])
+def test_vectorised_engine_matches_data_record(validator, rows):
+    assert validator.parity_mismatches(rows) == []
+
+
+@pytest.mark.parametrize("rows", [_generated(5000), EDGE_CASES])
+def test_errors_match_row_path(validator, rows):
+    fast = validator.validate(rows, "csv", "data.csv")
+    reference = validator.validate_rows(rows, "csv", "data.csv")
+
+    assert fast.valid_mask.tolist() == reference.valid_mask.tolist()
+    assert fast.errors == reference.errors
+    assert all(error["error_code"] and error["error_message"] for error in fast.errors)
+
+
+def test_column_batch_matches_row_dicts(validator):
+    rows = EDGE_CASES + _generated(500)
+    batch = ColumnBatch.from_rows(rows)
+    by_rows = validator.validate(rows, "csv", "data.csv")
+    by_batch = validator.validate_batch(batch, "csv", "data.csv")
+
+    assert by_batch.valid_mask.tolist() == by_rows.valid_mask.tolist()
+    assert by_batch.errors == by_rows.errors
+    assert {name: values for name, values in by_batch.columns.items() if name != "timestamp"} == {
+        name: values for name, values in by_rows.columns.items() if name != "timestamp"
+    }
+
+
+def test_empty_chunk(validator):
+    result = validator.validate([], "csv", None)
+    assert result.valid_count == 0 and result.errors == []
+
+
+def test_explicit_allowed_currencies():
+    validator = BatchValidator(allowed_currencies=["JPY", "USD"])
+    fast = validator.validate(EDGE_CASES, "csv", None)
+    reference = validator.validate_rows(EDGE_CASES, "csv", None)
+
+    assert fast.valid_mask.tolist() == reference.valid_mask.tolist()
+    assert fast.errors == reference.errors
+    assert "JPY" in fast.columns["currency"]
+    assert "EUR" not in fast.columns["currency"]
+    assert validator.parity_mismatches(EDGE_CASES) == []
@@ -0,0 +1,79 @@
+import bz2
+import gzip
+import io
+import sys
+
+import pytest
+
+from app.ingestors.block_reader import _pieces, open_source, open_stream, read_after_header
+
+BLOCK = 256
+HEADER = b"id,amount,note"
+RECORDS = [
+    b'%d,%d.5,"line one\nline two"' % (i, i) if i % 7 == 0 else b"%d,%d.5,plain note %d" % (i, i, i)
+    for i in range(400)
+]
+CONTENT = HEADER + b"\n" + b"\n".join(RECORDS) + b"\n"
+
+
+def _compress(codec: str) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(CONTENT)
+    if codec == "bz2":
+        return bz2.compress(CONTENT)
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdCompressor().compress(CONTENT)
+
+
+SUFFIXES = {None: ".csv", "gzip": ".csv.gz", "bz2": ".csv.bz2", "zstd": ".csv.zst"}
+
+
+@pytest.fixture(params=list(SUFFIXES))
+def source(request, tmp_path):
+    """(codec, path) of CONTENT written plain or compressed."""
+    codec = request.param
+    path = tmp_path / f"data{SUFFIXES[codec]}"
+    path.write_bytes(CONTENT if codec is None else _compress(codec))
+    return codec, str(path)
+
+
+def _read(fh, offset: int = 0, line: int = 0) -> tuple[bytes, list[bytes]]:
+    header, blocks, _, _ = read_after_header(fh, offset, line, quoted=True, block_size=BLOCK)
+    return header, [record for records, _ in blocks for record in records]
+
+
+def test_round_trip(source):
+    _, path = source
+    with open_source(path) as fh:
+        assert _read(fh) == (HEADER, RECORDS)
+
+
+def test_round_trip_from_stream(source):
+    _, path = source
+    with open(path, "rb") as raw, open_stream(raw) as fh:
+        assert _read(fh) == (HEADER, RECORDS)
+
+
+def test_resume_at_offset(source):
+    _, path = source
+    # the checkpoint a run that stopped after its 100th record would have committed
+    with open_source(path) as fh:
+        _, blocks, start, first_line = read_after_header(fh, quoted=True, block_size=BLOCK)
+        _, offset, line = list(_pieces(blocks, 1, start, first_line))[99]
+    assert CONTENT[:offset].endswith(RECORDS[99] + b"\n")
+
+    with open_source(path) as fh:
+        header, blocks, resumed_offset, resumed_line = read_after_header(fh, offset, line, quoted=True, block_size=BLOCK)
+        assert (header, resumed_offset, resumed_line) == (HEADER, offset, line)
+        assert [record for records, _ in blocks for record in records] == RECORDS[100:]
+
+
+def test_zstd_without_zstandard(tmp_path, monkeypatch):
+    path = tmp_path / "data.csv.zst"
+    path.write_bytes(b"\x28\xb5\x2f\xfd" + bytes(16))
+    # a None entry makes `import zstandard` raise ImportError
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    with pytest.raises(ValueError, match="needs the zstandard package"):
+        open_source(str(path))
+    with pytest.raises(ValueError, match="needs the zstandard package"):
+        open_stream(io.BytesIO(path.read_bytes()))
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import func, select
+
+import app.core.orchestrator as orchestrator_module
+from app.core.config import settings
+from app.core.orchestrator import DataOrchestrator
+from app.crud.storage import error_table, processed_table
+from app.models.database import async_session_factory
+from benchmarks.data_generator import generate
+
+CRASH_AFTER = 3
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_SIZE", 400)
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 1)
+    monkeypatch.setattr(settings, "PARALLEL_RANGE_BYTES", 16 * 1024)
+
+
+def _crash_on_fourth_chunk(monkeypatch):
+    """Lets CRASH_AFTER chunks commit, then fails the next chunk's write."""
+    calls = {"count": 0}
+
+    def failing(save):
+        async def save_or_crash(*args, **kwargs):
+            calls["count"] += 1
+            if calls["count"] > CRASH_AFTER:
+                raise Crash()
+            return await save(*args, **kwargs)
+        return save_or_crash
+
+    # the sequential path writes staged chunks, the parallel one validated columns
+    for name in ("save_staged_batch", "save_validated_batch"):
+        monkeypatch.setattr(orchestrator_module, name, failing(getattr(orchestrator_module, name)))
+    return calls
+
+
+async def _counts(db) -> tuple[int, int]:
+    # pylint: disable=not-callable
+    processed = (await db.execute(select(func.count()).select_from(processed_table))).scalar_one()
+    errors = (await db.execute(select(func.count()).select_from(error_table))).scalar_one()
+    return processed, errors
+
+
+async def _clean_run(source_type: str, path: str, parallel: bool) -> tuple[int, int]:
+    async with async_session_factory() as db:
+        await DataOrchestrator().execute(db, source_type, path, parallel=parallel)
+        return await _counts(db)
+
+
+async def _crash_and_resume(monkeypatch, source_type: str, path: str, parallel: bool):
+    async with async_session_factory() as db:
+        with monkeypatch.context() as patch:
+            _crash_on_fourth_chunk(patch)
+            with pytest.raises(Crash):
+                await DataOrchestrator().execute(db, source_type, path, parallel=parallel)
+        partial = await _counts(db)
+
+        resumed = await DataOrchestrator().execute(db, source_type, path, parallel=parallel)
+        counts = await _counts(db)
+        again = await DataOrchestrator().execute(db, source_type, path, parallel=parallel)
+        return partial, resumed, counts, again
+
+
+@pytest.mark.parametrize("source_type, fmt, compression, parallel", [
+    ("csv", "csv", "none", False),
+    ("csv", "csv", "none", True),
+    ("json", "ndjson", "gzip", False),
+])
+def test_resume_after_crash_matches_clean_run(
+    run, tmp_path, monkeypatch, small_chunks, source_type, fmt, compression, parallel,
+):
+    suffix = ".gz" if compression == "gzip" else ""
+    path = generate(str(tmp_path / f"data.{fmt}{suffix}"), rows=4000, error_rate=0.2, fmt=fmt, compression=compression)
+
+    expected = run(_clean_run(source_type, path, parallel))
+    partial, resumed, counts, again = run(_crash_and_resume(monkeypatch, source_type, path, parallel))
+
+    assert 0 < sum(partial) < sum(expected)
+    assert resumed.resumed_from > 0 and not resumed.skipped
+    assert resumed.duplicate_count == 0
+    assert counts == expected
+    assert again.skipped
+    assert again.rows == 0
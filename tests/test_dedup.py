@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import func, insert, select, text
+
+from app.core.dedup import seen_external_ids
+from app.core.orchestrator import DataOrchestrator
+from app.crud.rollups import read_rollups
+from app.models.database import async_session_factory, engine, init_db
+from app.models.models import IngestionError, ProcessedData, RawData
+from benchmarks.data_generator import generate
+
+
+async def _counts(db) -> dict:
+    # pylint: disable=not-callable
+    counts = {
+        name: (await db.execute(select(func.count()).select_from(model))).scalar()
+        for name, model in (("raw", RawData), ("processed", ProcessedData), ("errors", IngestionError))
+    }
+    counts["distinct_ids"] = (await db.execute(select(func.count(ProcessedData.external_id.distinct())))).scalar()
+    rollups = await read_rollups(db)
+    counts["rollup_success"] = sum(row.success_count for row in rollups)
+    counts["rollup_failure"] = sum(row.failure_count for row in rollups)
+    return counts
+
+
+@pytest.mark.parametrize("warm_filter", [True, False], ids=["in-memory filter", "unique index only"])
+def test_reingesting_a_file_stores_nothing_twice(run, tmp_path, warm_filter):
+    path = generate(str(tmp_path / "data.csv"), rows=2000, error_rate=0.1)
+
+    async def scenario():
+        async with async_session_factory() as db:
+            first = await DataOrchestrator().execute(db, "csv", path)
+            before = await _counts(db)
+            if not warm_filter:
+                seen_external_ids.clear()
+            # resume=False: read the file again instead of skipping it as completed
+            second = await DataOrchestrator().execute(db, "csv", path, resume=False)
+            after = await _counts(db)
+        return first, second, before, after
+
+    first, second, before, after = run(scenario())
+    assert first.duplicate_count == 0
+    assert (second.valid_count, second.duplicate_count) == (0, first.valid_count)
+    assert before["processed"] == before["raw"] == before["distinct_ids"] == first.valid_count
+    assert before["rollup_success"] == first.valid_count
+    # valid rows are not stored again; the second read's validation failures are logged again
+    assert after["processed"] == after["raw"] == after["distinct_ids"] == first.valid_count
+    assert after["rollup_success"] == first.valid_count
+    assert after["errors"] == after["rollup_failure"] == 2 * first.error_count
+
+
+def test_startup_refuses_duplicate_external_ids(run):
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP INDEX ix_processed_data_external_id"))
+            await conn.execute(text("CREATE INDEX ix_processed_data_external_id ON processed_data (external_id)"))
+            await conn.execute(insert(ProcessedData), [
+                {"raw_id": 1, "external_id": "TXN-1", "amount": 1.0, "currency": "USD"},
+                {"raw_id": 2, "external_id": "TXN-1", "amount": 2.0, "currency": "USD"},
+            ])
+        with pytest.raises(RuntimeError, match="already holds duplicates"):
+            await init_db()
+
+    run(scenario())
@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from sqlalchemy import select
+
+from app.api.v1 import reporting_router
+from app.core.config import settings
+from app.core.orchestrator import DataOrchestrator
+from app.main import app
+from app.models.database import async_session_factory
+from app.models.models import IngestionError, ProcessedData, RawData
+from app.reporting import exporter
+from app.reporting.exporter import ReportExporter
+from app.reporting.report_cache import ReportCache
+from benchmarks.data_generator import generate, generate_rows, write_ndjson
+
+
+async def _body(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+def _parse(fmt: str, body: bytes) -> list[dict]:
+    text = body.decode()
+    if fmt == "csv":
+        return list(csv.DictReader(io.StringIO(text)))
+    if fmt == "json":
+        return json.loads(text)
+    assert not text or text.endswith("\n")
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def _expected(fmt: str, row) -> dict:
+    """A stored row as the format writes it: text in CSV, ISO datetimes in JSON."""
+    if fmt == "csv":
+        return {column: "" if value is None else str(value) for column, value in row._mapping.items()}
+    return {
+        column: value.isoformat() if isinstance(value, datetime) else value
+        for column, value in row._mapping.items()
+    }
+
+
+@pytest.mark.parametrize("fmt", ["csv", "json", "ndjson"])
+def test_streamed_exports_match_stored_rows(run, tmp_path, monkeypatch, fmt):
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_SIZE", 128)  # several partitions per export
+    path = generate(str(tmp_path / "data.csv"), rows=1000, error_rate=0.2)
+
+    async def scenario():
+        async with async_session_factory() as db:
+            empty = [await _body(ReportExporter.stream_report(fmt)), await _body(ReportExporter.stream_errors(fmt))]
+            await DataOrchestrator().execute(db, "csv", path)
+            stored = (await db.execute(ReportExporter.report_query())).all()
+            errors = (await db.execute(ReportExporter.error_query())).all()
+        report = await _body(ReportExporter.stream_report(fmt))
+        error_report = await _body(ReportExporter.stream_errors(fmt))
+        return empty, stored, errors, report, error_report
+
+    empty, stored, errors, report, error_report = run(scenario())
+    assert len(stored) > 500 and len(errors) > 100
+    assert _parse(fmt, report) == [_expected(fmt, row) for row in stored]
+    assert _parse(fmt, error_report) == [_expected(fmt, row) for row in errors]
+    # no rows is still a well-formed document
+    assert [_parse(fmt, body) for body in empty] == [[], []]
+
+
+def _pages(client: TestClient, url: str, params: dict, limit: int) -> list[int]:
+    """Ids of every row, following X-Next-After-Id until a page comes back without one."""
+    ids, after_id = [], None
+    while True:
+        cursor = {} if after_id is None else {"after_id": after_id}
+        response = client.get(url, params={**params, **cursor, "limit": limit})
+        assert response.status_code == 200, response.text
+        page = [row["id"] for row in _parse("ndjson", response.content)]
+        assert len(page) <= limit
+        if "X-Next-After-Id" not in response.headers:
+            assert not page
+            return ids
+        assert page and response.headers["X-Next-After-Id"] == str(page[-1])
+        assert after_id is None or page[0] > after_id  # a repeated row would page forever
+        ids += page
+        after_id = page[-1]
+
+
+def test_keyset_pages_cover_every_row_once(run, tmp_path, monkeypatch):
+    monkeypatch.setattr(reporting_router, "report_cache", ReportCache(settings.REPORT_CACHE_BYTES))
+    first = generate(str(tmp_path / "first.csv"), rows=1500, error_rate=0.2)
+    second = str(tmp_path / "second.ndjson")
+    with open(second, "wb") as out:
+        write_ndjson(out, generate_rows(1500, error_rate=0.2, seed=7, start_id=1500))
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await DataOrchestrator().execute(db, "csv", first)
+            mark = datetime.now()
+            await DataOrchestrator().execute(db, "json", second)
+            stored = (await db.execute(
+                select(ProcessedData.id, ProcessedData.currency, RawData.source, ProcessedData.processed_at)
+                .join(RawData, RawData.id == ProcessedData.raw_id)
+                .order_by(ProcessedData.id)
+            )).all()
+            errors = (await db.execute(
+                select(IngestionError.id, IngestionError.source_type).order_by(IngestionError.id)
+            )).all()
+        return mark, stored, errors
+
+    mark, stored, errors = run(scenario())
+    client = TestClient(app)
+    cases = [
+        ({}, lambda row: True),
+        ({"currency": "usd"}, lambda row: row.currency == "USD"),
+        ({"source": "json"}, lambda row: row.source == "json"),
+        ({"currency": "EUR", "source": "csv"}, lambda row: row.currency == "EUR" and row.source == "csv"),
+        ({"since": mark.isoformat()}, lambda row: row.processed_at >= mark),
+        ({"status": "PROCESSED", "until": mark.isoformat()}, lambda row: row.processed_at < mark),
+    ]
+    for params, keep in cases:
+        expected = [row.id for row in stored if keep(row)]
+        assert expected, params
+        assert _pages(client, "/api/v1/report/ndjson", params, limit=97) == expected, params
+
+    for source in ("csv", "json"):
+        expected = [row.id for row in errors if row.source_type == source]
+        assert _pages(client, "/api/v1/errors/ndjson", {"source": source}, limit=50) == expected
+
+
+def test_xlsx_export_splits_sheets_at_the_row_limit(run, tmp_path, monkeypatch):
+    monkeypatch.setattr(exporter, "XLSX_MAX_ROWS", 100)  # header + 99 records per sheet
+    path = generate(str(tmp_path / "data.csv"), rows=1000, error_rate=0.2)
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await DataOrchestrator().execute(db, "csv", path)
+            stored = (await db.execute(ReportExporter.report_query())).all()
+        return stored, await _body(ReportExporter.stream_report("xlsx"))
+
+    stored, body = run(scenario())
+    workbook = load_workbook(io.BytesIO(body), read_only=True)
+    sheets = [list(sheet.values) for sheet in workbook.worksheets]
+    assert len(sheets) == -(-len(stored) // 99)
+    assert all(len(rows) == 100 for rows in sheets[:-1])
+    columns = tuple(stored[0]._mapping)
+    assert all(rows[0] == columns for rows in sheets)
+    assert [row[0] for rows in sheets for row in rows[1:]] == [row.id for row in stored]
+
+    # no rows: a single sheet with just the header
+    book = exporter._XlsxBook(list(columns))
+    output = io.BytesIO()
+    book.save(output)
+    assert [list(sheet.values) for sheet in load_workbook(output, read_only=True).worksheets] == [[columns]]
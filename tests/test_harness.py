@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from benchmarks.harness import BenchResult, run_isolated
+
+
+def _report(rows: int) -> BenchResult:
+    return BenchResult(name="report", rows=rows, seconds=1.0)
+
+
+def _fail() -> BenchResult:
+    raise ValueError("bad input")
+
+
+def _die() -> BenchResult:
+    os._exit(3)
+
+
+def test_result_comes_back_from_the_child():
+    assert run_isolated(_report, (42,))["rows"] == 42
+
+
+def test_child_errors_are_raised():
+    with pytest.raises(RuntimeError, match="ValueError: bad input"):
+        run_isolated(_fail)
+
+
+def test_child_that_dies_without_reporting():
+    with pytest.raises(RuntimeError, match="exited with code 3 without reporting"):
+        run_isolated(_die)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1 import ingestion_router
+from app.core import parallel_ingest
+from app.core.config import settings
+from app.core.job_scheduler import JobScheduler, JobStatus, expand_sources, is_pattern
+from app.main import app
+from benchmarks.data_generator import generate
+
+
+async def _finished(scheduler: JobScheduler, *jobs):
+    """Runs the scheduler until every job has succeeded or failed."""
+    await scheduler.start()
+    try:
+        while any(job.status in (JobStatus.QUEUED, JobStatus.RUNNING) for job in jobs):
+            await asyncio.sleep(0.01)
+    finally:
+        await scheduler.stop()
+
+
+def test_jobs_succeed_and_fail(run, tmp_path):
+    path = generate(str(tmp_path / "data.csv"), rows=1000, error_rate=0.1)
+    scheduler = JobScheduler(concurrency=2, queue_size=4)
+
+    async def scenario():
+        good = scheduler.submit("csv", path)
+        missing = scheduler.submit("csv", str(tmp_path / "missing.csv"))
+        unsupported = scheduler.submit("xml", path)
+        assert good.status == missing.status == JobStatus.QUEUED
+        await _finished(scheduler, good, missing, unsupported)
+        return good, missing, unsupported
+
+    good, missing, unsupported = run(scenario())
+    summary = good.as_dict()
+    assert summary["status"] == "succeeded" and summary["error"] is None
+    assert summary["progress"]["valid_count"] + summary["progress"]["error_count"] == 1000
+    assert summary["progress"]["byte_offset"] == summary["progress"]["total_bytes"]
+    assert all(job.stats.finished_at is not None for job in (good, missing, unsupported))
+    assert missing.status == JobStatus.FAILED and "missing.csv" in missing.error
+    assert unsupported.status == JobStatus.FAILED and "Unsupported source type" in unsupported.error
+    assert [job.id for job in scheduler.jobs()] == [good.id, missing.id, unsupported.id]
+
+
+def test_full_queue():
+    scheduler = JobScheduler(concurrency=1, queue_size=2)
+    scheduler.submit("csv", "a.csv")
+    scheduler.submit("csv", "b.csv")
+    with pytest.raises(asyncio.QueueFull):
+        scheduler.submit("csv", "c.csv")
+    assert len(scheduler.jobs()) == 2
+
+
+def test_ingest_endpoint_queues_polls_and_pushes_back(tmp_path, monkeypatch):
+    path = generate(str(tmp_path / "data.csv"), rows=10, error_rate=0)
+    # not started: jobs stay queued, so the queue fills up
+    scheduler = JobScheduler(concurrency=1, queue_size=1)
+    monkeypatch.setattr(ingestion_router, "job_scheduler", scheduler)
+    client = TestClient(app)
+
+    response = client.post("/api/v1/ingest", params={"file_path": path})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert client.get(f"/api/v1/jobs/{job_id}").json()["status"] == "queued"
+
+    assert client.post("/api/v1/ingest", params={"file_path": path}).status_code == 429
+    assert client.get("/api/v1/jobs/unknown").status_code == 404
+    assert client.post("/api/v1/ingest", params={"file_path": str(tmp_path / "missing.csv")}).status_code == 400
+
+
+def test_expand_sources(tmp_path):
+    (tmp_path / "hourly").mkdir()
+    for name in ("b.csv", "a.csv.gz", "c.ndjson", "notes.txt"):
+        (tmp_path / "hourly" / name).write_bytes(b"")
+    (tmp_path / "hourly" / "nested").mkdir()
+    (tmp_path / "hourly" / "nested" / "d.csv").write_bytes(b"")
+    directory = str(tmp_path / "hourly")
+
+    assert is_pattern(directory)
+    assert [os.path.basename(path) for path in expand_sources(directory, "csv")] == ["a.csv.gz", "b.csv"]
+    assert [os.path.basename(path) for path in expand_sources(directory, "json")] == ["c.ndjson"]
+    assert [os.path.basename(path) for path in expand_sources(f"{directory}/**/*.csv", "csv")] == ["b.csv", "d.csv"]
+
+
+def test_file_named_like_a_glob_is_a_file(run, tmp_path):
+    path = generate(str(tmp_path / "report[1].csv"), rows=100, error_rate=0)
+    assert not is_pattern(path)
+    assert is_pattern(str(tmp_path / "report[12].csv"))
+
+    scheduler = JobScheduler(concurrency=1, queue_size=1)
+
+    async def scenario():
+        job = scheduler.submit("csv", path)
+        await _finished(scheduler, job)
+        return job
+
+    job = run(scenario())
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.stats.valid_count == 100
+
+
+def test_directory_job_shares_one_pool_and_skips_ingested_files(run, tmp_path, monkeypatch):
+    (tmp_path / "hourly").mkdir()
+    for hour in range(3):
+        generate(str(tmp_path / "hourly" / f"hour-{hour}.csv"), rows=300, error_rate=0.1, seed=hour)
+    paths = expand_sources(str(tmp_path / "hourly"), "csv")
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 1)
+    monkeypatch.setattr(settings, "PARALLEL_RANGE_BYTES", 4096)
+    pools = []
+    create_pool = parallel_ingest.create_pool
+    monkeypatch.setattr(parallel_ingest, "create_pool", lambda workers: pools.append(workers) or create_pool(workers))
+    scheduler = JobScheduler(concurrency=1, queue_size=2)
+
+    async def scenario():
+        first = scheduler.submit("csv", str(tmp_path / "hourly"), parallel=True, paths=paths, fan_out=3)
+        again = scheduler.submit("csv", str(tmp_path / "hourly"), parallel=True, paths=paths, fan_out=3)
+        await _finished(scheduler, first, again)
+        return first.as_dict(), again.as_dict()
+
+    first, again = run(scenario())
+    # one pool per job, not one per file
+    assert pools == [1, 1]
+    assert first["status"] == again["status"] == "succeeded"
+    assert first["progress"]["files"] == first["progress"]["finished"] == 3
+    assert first["progress"]["skipped"] == 0
+    assert first["progress"]["rows"] == 900
+    assert again["progress"]["skipped"] == 3
+    assert again["progress"]["rows"] == 0
+    assert sorted(entry["source_path"] for entry in again["files"]) == paths
@@ -0,0 +1,68 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.kafka_worker import KafkaWorker
+from app.ingestors.base_ingestor import BaseIngestor
+from app.ingestors.kakfa_ingestor import LocalKafkaConsumer
+from app.models.database import async_session_factory
+from app.models.models import IngestionError, ProcessedData
+
+MESSAGES = 2500
+
+
+class _Topic(BaseIngestor):
+    """MESSAGES records; every 10th has a negative amount."""
+    async def stream_data(self, source):
+        for i in range(MESSAGES):
+            yield {"external_id": f"K-{i}", "amount": -1 if i % 10 == 0 else 5.0, "currency": "USD",
+                   "source_channel": "KAFKA"}
+
+
+async def _count(model) -> int:
+    async with async_session_factory() as db:
+        # pylint: disable=not-callable
+        return (await db.execute(select(func.count()).select_from(model))).scalar()
+
+
+def test_one_transaction_and_one_commit_per_micro_batch(run, monkeypatch):
+    monkeypatch.setattr(settings, "KAFKA_BATCH_SIZE", 400)
+    monkeypatch.setattr(settings, "KAFKA_BATCH_LATENCY_MS", 100)
+
+    async def scenario():
+        consumer = LocalKafkaConsumer(_Topic(), limit=MESSAGES, buffer=1000)
+        worker = KafkaWorker(consumer=consumer)
+        batches, commits = [], []
+
+        process_batch = worker.orchestrator.process_batch
+
+        async def recorded_batch(db, records, source_type, source_ref=None):
+            batches.append(len(records))
+            return await process_batch(db, records, source_type, source_ref)
+
+        commit = consumer.commit
+
+        async def recorded_commit():
+            # offsets are acknowledged only once the batch's rows are stored
+            commits.append((consumer._position, await _count(ProcessedData) + await _count(IngestionError)))
+            await commit()
+
+        worker.orchestrator.process_batch = recorded_batch
+        consumer.commit = recorded_commit
+        await worker.start()
+        while consumer.committed < MESSAGES - 1:
+            assert not worker._task.done(), "the worker stopped early"
+            await asyncio.sleep(0.01)
+        await worker.stop()
+        return batches, commits, await _count(ProcessedData), await _count(IngestionError)
+
+    batches, commits, processed, errors = run(scenario())
+    assert sum(batches) == MESSAGES
+    assert max(batches) <= 400
+    assert len(commits) == len(batches)
+    stored = 0
+    for size, (position, rows) in zip(batches, commits):
+        stored += size
+        assert (position, rows) == (stored - 1, stored)
+    assert (processed, errors) == (MESSAGES - MESSAGES // 10, MESSAGES // 10)
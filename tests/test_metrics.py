@@ -0,0 +1,67 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.metrics import _Metric
+from app.core.orchestrator import DataOrchestrator
+from app.main import app
+from app.models.database import async_session_factory
+from benchmarks.data_generator import generate
+
+SAMPLE = re.compile(r'^(\w+)(\{[^}]*\})? (\S+)$')
+
+
+def _scrape(client: TestClient) -> dict[str, float]:
+    """{"name{labels}": value} of every sample in the /metrics exposition."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) \w+ ", line), line
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        samples[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+    return samples
+
+
+def test_metrics_after_ingestion(run, tmp_path):
+    client = TestClient(app)
+    path = generate(str(tmp_path / "data.csv"), rows=1000, error_rate=0.1)
+    # the registry is process-wide, so compare against what earlier tests left behind
+    before = _scrape(client)
+
+    async def ingest():
+        async with async_session_factory() as db:
+            return await DataOrchestrator().execute(db, "csv", path)
+
+    stats = run(ingest())
+    after = _scrape(client)
+
+    def delta(sample: str) -> float:
+        return after.get(sample, 0) - before.get(sample, 0)
+
+    assert delta('ingest_rows_total{source_type="csv",outcome="valid"}') == stats.valid_count
+    assert delta('ingest_rows_total{source_type="csv",outcome="error"}') == stats.error_count
+    assert delta('ingest_rows_total{source_type="csv",outcome="duplicate"}') == stats.duplicate_count
+    assert stats.valid_count + stats.error_count + stats.duplicate_count == 1000
+
+    labels = 'stage="validate",source_type="csv"'
+    count = delta(f"ingest_stage_seconds_count{{{labels}}}")
+    assert count >= 1
+    assert delta(f'ingest_stage_seconds_bucket{{{labels},le="+Inf"}}') == count
+    assert after[f"ingest_stage_seconds_sum{{{labels}}}"] > 0
+    buckets = [value for sample, value in after.items() if sample.startswith(f"ingest_stage_seconds_bucket{{{labels},")]
+    assert buckets == sorted(buckets)  # cumulative
+    assert after['ingest_rows_per_second{source_type="csv"}'] > 0
+
+
+def test_metric_without_samples_is_abstract():
+    class Incomplete(_Metric):
+        kind = "counter"
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "never registered")
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.orchestrator import DataOrchestrator
+from app.crud.storage import raw_table
+from app.models.database import async_session_factory
+from benchmarks.data_generator import generate
+
+
+def test_parallel_and_sequential_store_identical_payloads(run, tmp_path, monkeypatch):
+    path = generate(str(tmp_path / "data.csv"), rows=3000, error_rate=0.2)
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 2)
+    monkeypatch.setattr(settings, "PARALLEL_RANGE_BYTES", 32 * 1024)
+    monkeypatch.setattr(settings, "BATCH_SIZE", 700)
+
+    async def payloads(parallel: bool) -> list[str]:
+        async with async_session_factory() as db:
+            await DataOrchestrator().execute(db, "csv", path, parallel=parallel)
+            # the stored text itself, not the JSON type's decoded value
+            rows = await db.execute(select(raw_table.c.payload.cast(raw_table.c.source.type)).order_by(raw_table.c.id))
+            return rows.scalars().all()
+
+    sequential = run(payloads(parallel=False))
+    parallel = run(payloads(parallel=True))
+    assert len(sequential) > 2000
+    assert parallel == sequential
+
+
+def test_staging_off_stores_the_same_rows(run, tmp_path, monkeypatch):
+    path = generate(str(tmp_path / "data.csv"), rows=3000, error_rate=0.2)
+    monkeypatch.setattr(settings, "BATCH_SIZE", 700)
+
+    async def stored(staging: bool) -> tuple[list, int]:
+        monkeypatch.setattr(settings, "INGEST_STAGING", staging)
+        async with async_session_factory() as db:
+            stats = await DataOrchestrator().execute(db, "csv", path)
+            rows = await db.execute(select(raw_table.c.payload.cast(raw_table.c.source.type)).order_by(raw_table.c.id))
+            return rows.scalars().all(), stats.error_count
+
+    assert run(stored(staging=False)) == run(stored(staging=True))
+
+
+@pytest.mark.parametrize("mode", ["batch", "row"])
+def test_parallel_workers_use_the_callers_validation_rules(run, tmp_path, monkeypatch, mode):
+    path = tmp_path / "jpy.csv"
+    path.write_text(
+        "external_id,amount,currency,source_channel,timestamp\n"
+        + "".join(f"J-{i},{i + 1},{'JPY' if i % 2 else 'USD'},web,2024-01-01T10:00:00\n" for i in range(400))
+    )
+    # spawned workers import settings afresh, without these overrides
+    monkeypatch.setattr(settings, "ALLOWED_CURRENCIES", ["USD", "JPY"])
+    monkeypatch.setattr(settings, "VALIDATION_MODE", mode)
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 1)
+    monkeypatch.setattr(settings, "PARALLEL_RANGE_BYTES", 4096)
+
+    async def ingest():
+        async with async_session_factory() as db:
+            return await DataOrchestrator().execute(db, "csv", str(path), parallel=True)
+
+    stats = run(ingest())
+    assert (stats.valid_count, stats.error_count) == (400, 0)
@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+from app.reporting.report_cache import ReportCache, ReportKey
+
+KEY = ReportKey("report", "csv", (), (10, 10))
+
+
+async def _chunks(count: int, size: int = 1000):
+    for i in range(count):
+        yield bytes([65 + i % 26]) * size
+
+
+async def _drain(cache: ReportCache, count: int) -> bytes:
+    return b"".join([chunk async for chunk in cache.tee(KEY, _chunks(count))])
+
+
+async def _cached(cache: ReportCache) -> bytes | None:
+    cached = await cache.get(KEY)
+    return cached if cached is None or isinstance(cached, bytes) else b"".join(cached)
+
+
+def test_small_body_is_cached_in_memory():
+    cache = ReportCache(max_bytes=64_000)
+    body = asyncio.run(_drain(cache, 3))
+    assert asyncio.run(_cached(cache)) == body
+
+
+def test_large_body_without_spill_dir_is_not_buffered():
+    cache = ReportCache(max_bytes=64_000)
+    body = asyncio.run(_drain(cache, 20))
+    assert len(body) == 20_000
+    assert asyncio.run(_cached(cache)) is None
+
+
+def test_large_body_streams_to_spill_file(tmp_path):
+    cache = ReportCache(max_bytes=64_000, spill_dir=str(tmp_path), spill_bytes=1_000_000)
+    body = asyncio.run(_drain(cache, 50))
+    assert not cache._entries
+    assert asyncio.run(_cached(cache)) == body
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_body_over_spill_budget_is_dropped(tmp_path):
+    cache = ReportCache(max_bytes=64_000, spill_dir=str(tmp_path), spill_bytes=30_000)
+    body = asyncio.run(_drain(cache, 50))
+    assert len(body) == 50_000
+    assert asyncio.run(_cached(cache)) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_abandoned_stream_leaves_nothing_behind(tmp_path):
+    cache = ReportCache(max_bytes=64_000, spill_dir=str(tmp_path), spill_bytes=1_000_000)
+
+    async def abandon():
+        stream = cache.tee(KEY, _chunks(50))
+        async for _ in stream:
+            if len(os.listdir(tmp_path)):
+                break
+        await stream.aclose()
+
+    asyncio.run(abandon())
+    assert asyncio.run(_cached(cache)) is None
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,38 @@
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.reprocessor import ReprocessFilter, Reprocessor, revalidate_page
+from app.crud.storage import error_table
+from app.models.database import async_session_factory
+
+
+def _record(external_id: str, currency: str) -> str:
+    return repr({"external_id": external_id, "amount": "10", "currency": currency, "source_channel": "web"})
+
+
+def test_revalidate_page_leaves_settings_alone():
+    allowed = list(settings.ALLOWED_CURRENCIES)
+    rows = [(1, "csv", _record("r1", "JPY")), (2, "csv", _record("r2", "XXX")), (3, "csv", "not a record")]
+
+    page = revalidate_page(rows, None, allowed + ["JPY"])
+    assert page["ids"] == [1]
+    assert page["columns"]["currency"] == ["JPY"]
+    assert (page["still_failing"], page["skipped"]) == (1, 1)
+    assert settings.ALLOWED_CURRENCIES == allowed
+
+
+def test_currency_filter_is_a_literal_match(run):
+    async def matched(currency: str) -> list[int]:
+        async with async_session_factory() as db:
+            await db.execute(insert(error_table), [
+                {"source_type": "csv", "raw_content": _record("r1", "jpy"), "error_message": "bad currency"},
+                {"source_type": "csv", "raw_content": _record("r2", "EUR"), "error_message": "bad currency"},
+            ])
+            await db.commit()
+        rows = await Reprocessor()._page(ReprocessFilter(currency=currency), 0)
+        return [error_id for error_id, _, _ in rows]
+
+    assert run(matched("JPY")) == [1]
+    # LIKE wildcards in the filter match themselves, not every row
+    assert run(matched("%")) == []
+    assert run(matched("_PY")) == []
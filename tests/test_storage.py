@@ -0,0 +1,63 @@
+import csv
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.dedup import seen_external_ids
+from app.core.orchestrator import DataOrchestrator
+from app.models.database import async_session_factory
+from app.models.models import ProcessedData, RawData
+from benchmarks.data_generator import FIELDNAMES
+
+
+def _write_csv(path, ids: range) -> str:
+    """Rows for `ids`; every 5th has a negative amount and is rejected."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        for i in ids:
+            amount = -1 if i % 5 == 0 else i + 0.25
+            writer.writerow([f"TXN-{i}", amount, "USD", "CHANNEL1", "2024-01-01T10:00:00"])
+    return str(path)
+
+
+async def _links(db) -> tuple[list[tuple], int]:
+    """(processed external_id, its raw row's external_id, amount, raw amount) per row, and the raw row count."""
+    rows = await db.execute(
+        select(
+            ProcessedData.external_id, func.json_extract(RawData.payload, "$.external_id"),
+            ProcessedData.amount, func.json_extract(RawData.payload, "$.amount"),
+        ).join(RawData, RawData.id == ProcessedData.raw_id)
+    )
+    # pylint: disable=not-callable
+    raw_count = (await db.execute(select(func.count()).select_from(RawData))).scalar()
+    return rows.all(), raw_count
+
+
+@pytest.mark.parametrize("parallel", [False, True], ids=["staged", "parallel"])
+def test_processed_rows_link_to_their_raw_rows(run, tmp_path, monkeypatch, parallel):
+    monkeypatch.setattr(settings, "BATCH_SIZE", 64)
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 1)
+    monkeypatch.setattr(settings, "PARALLEL_RANGE_BYTES", 4096)
+    first = _write_csv(tmp_path / "first.csv", range(0, 500))
+    # overlaps the first file by 200 ids
+    second = _write_csv(tmp_path / "second.csv", range(300, 800))
+
+    async def scenario():
+        async with async_session_factory() as db:
+            await DataOrchestrator().execute(db, "csv", first, parallel=parallel)
+            # a cold filter: the overlapping ids reach the unique index, whose
+            # rejected raw rows are deleted again (_drop_rejected_raw_rows)
+            seen_external_ids.clear()
+            stats = await DataOrchestrator().execute(db, "csv", second, parallel=parallel)
+            return stats, *await _links(db)
+
+    stats, links, raw_count = run(scenario())
+    valid = {f"TXN-{i}" for i in range(800) if i % 5}
+    assert stats.duplicate_count == len([i for i in range(300, 500) if i % 5])
+    assert sorted(external_id for external_id, *_ in links) == sorted(valid)
+    assert raw_count == len(valid)
+    for external_id, raw_external_id, amount, raw_amount in links:
+        assert raw_external_id == external_id
+        assert float(raw_amount) == amount
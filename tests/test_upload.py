@@ -0,0 +1,95 @@
+import asyncio
+import gzip
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.api.v1 import ingestion_router
+from app.ingestors.block_reader import AsyncByteReader
+from app.main import app
+from app.models.database import async_session_factory
+from app.models.models import ProcessedData
+from benchmarks.data_generator import generate
+
+
+def _pieces(data: bytes, size: int = 7919):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _processed_count() -> int:
+    async with async_session_factory() as db:
+        # pylint: disable=not-callable
+        return (await db.execute(select(func.count()).select_from(ProcessedData))).scalar()
+
+
+@pytest.mark.parametrize("compress", [False, True], ids=["plain", "gzip"])
+def test_chunked_upload(run, tmp_path, compress):
+    run(asyncio.sleep(0))  # empty tables
+    data = open(generate(str(tmp_path / "data.csv"), rows=2000, error_rate=0.1), "rb").read()
+    body = gzip.compress(data) if compress else data
+
+    # a generator body is sent with Transfer-Encoding: chunked
+    response = TestClient(app).post("/api/v1/upload?source_type=csv&name=data.csv", content=_pieces(body))
+    assert response.status_code == 200, response.text
+    progress = response.json()["progress"]
+    assert progress["valid_count"] + progress["error_count"] == 2000
+    assert progress["valid_count"] > 1500
+    assert ingestion_router.upload_slots.active == 0
+    # the NullPool engine: no connection outlives this loop
+    assert asyncio.run(_processed_count()) == progress["valid_count"]
+
+
+def test_upload_slots_answer_429_when_full(monkeypatch):
+    slots = ingestion_router.UploadSlots(1)
+    assert slots.try_acquire()
+    assert not slots.try_acquire()
+    slots.release()
+    assert slots.try_acquire()
+
+    monkeypatch.setattr(ingestion_router, "upload_slots", slots)
+    response = TestClient(app).post("/api/v1/upload?source_type=csv", content=b"external_id\n")
+    assert response.status_code == 429
+    assert slots.active == 1
+
+
+async def _stalled():
+    await asyncio.Event().wait()
+    yield b""
+
+
+def test_reader_times_out_on_a_stalled_body():
+    async def scenario():
+        reader = AsyncByteReader(_stalled(), asyncio.get_running_loop(), timeout=0.2)
+        with pytest.raises(TimeoutError):
+            await asyncio.to_thread(reader.read, 10)
+
+    asyncio.run(scenario())
+
+
+def test_close_releases_a_waiting_reader():
+    async def scenario():
+        reader = AsyncByteReader(_stalled(), asyncio.get_running_loop())
+        outcome = []
+        thread = threading.Thread(target=lambda: outcome.append(_read(reader)))
+        thread.start()
+        while reader._pending is None:
+            await asyncio.sleep(0.01)
+        started = time.monotonic()
+        reader.close()
+        while thread.is_alive():
+            await asyncio.sleep(0.01)
+        assert time.monotonic() - started < 1
+        assert isinstance(outcome[0], OSError)
+
+    asyncio.run(scenario())
+
+
+def _read(reader):
+    try:
+        return reader.read(10)
+    except OSError as exc:
+        return exc
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.crud.write_coordinator import WriteCoordinator
+from app.models.database import write_session_factory
+
+
+async def _select_one(db):
+    return (await db.execute(text("SELECT 1"))).scalar()
+
+
+class _FailingCheckpoint(WriteCoordinator):
+    async def _checkpoint(self, db):
+        raise OSError("disk I/O error")
+
+
+def test_queued_writes_fail_when_the_coordinator_dies(run):
+    async def scenario():
+        coordinator = _FailingCheckpoint(write_session_factory, group_size=1, queue_size=8, checkpoint_seconds=0)
+        await coordinator.start()
+        # the first group commits, then its checkpoint kills the task before the rest are taken
+        writes = [asyncio.ensure_future(coordinator.submit(_select_one)) for _ in range(4)]
+        results = await asyncio.wait_for(asyncio.gather(*writes, return_exceptions=True), timeout=5)
+        assert results[0] == 1
+        assert all(isinstance(result, RuntimeError) for result in results[1:])
+        assert isinstance(results[1].__cause__, OSError)
+
+        assert not coordinator.running
+        with pytest.raises(RuntimeError):
+            await coordinator.submit(_select_one)
+        await asyncio.wait_for(coordinator.stop(), timeout=5)
+
+    run(scenario())
+
+
+def test_stop_commits_queued_writes(run):
+    async def scenario():
+        coordinator = WriteCoordinator(write_session_factory, group_size=2, queue_size=8)
+        await coordinator.start()
+        writes = [asyncio.ensure_future(coordinator.submit(_select_one)) for _ in range(5)]
+        await asyncio.sleep(0)
+        await coordinator.stop()
+        assert await asyncio.gather(*writes) == [1] * 5
+        with pytest.raises(RuntimeError):
+            await coordinator.submit(_select_one)
+
+    run(scenario())